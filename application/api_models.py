@@ -18,6 +18,21 @@ class URLItem(BaseModel):
 
 class URLwithBG(URLItem):
     background: Optional[bool] = True
+    # Analysis stages wanted now, default all; the others are computed when first asked for
+    analyses: Optional[List[str]] = Field(
+        None,
+        example=["sentiment", "summary"]
+    )
+
+class BatchQuery(BaseModel):
+    urls: List[str] = Field(
+        ...,
+        example=["https://www.example.com/a", "https://www.example.com/b"]
+    )
+    analyses: Optional[List[str]] = Field(
+        None,
+        example=["sentiment"]
+    )
 
 # class inherited from URLItem
 class NewsItem(URLItem):
@@ -1,18 +1,34 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import vars as vars
 
+from typing import Dict, Iterable, List, Optional
+
 import threading
 import time
+from datetime import datetime, timedelta, timezone
 import json
 import asyncio
 import logging
 
-from api_models import URLInput, NewsItem, URLwithBG
+from api_models import URLInput, NewsItem, URLwithBG, BatchQuery
 import methods as methods
+import pipeline as pipeline
+import job_queue as job_queue
+import inflight as inflight
+import prescrape as prescrape
+import http_client as http_client
+import canonical as canonical
+import news_cache as news_cache
+import fingerprint as fingerprint
+import stream_hub as stream_hub_module
+import stage_events as stage_events
+import metrics as metrics
 
 logging.basicConfig(
     level=logging.INFO,  # or DEBUG
@@ -21,44 +37,148 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+jobs = job_queue.JobQueue(
+    vars.job_db_path,
+    workers=vars.job_workers,
+    max_depth=vars.job_queue_depth,
+    lease_seconds=vars.job_lease_seconds,
+    background_limit=vars.job_background_limit
+)
+
+# Concurrent process_url calls for the same URL share one analysis
+inflight_requests = inflight.InFlightRegistry()
+
+# Read-through cache of news documents, by id and canonical URL
+news_store = news_cache.NewsCache(
+    max_size=vars.news_cache_size,
+    ttl=vars.news_cache_ttl,
+    partial_ttl=vars.news_cache_partial_ttl,
+    is_pending=lambda news_id: analysis_pending(news_id)
+)
+
+# Shared by every batch request, so concurrent batches together never analyse
+# more than `vars.batch_concurrency` new articles at a time
+batch_pool = ThreadPoolExecutor(max_workers=vars.batch_concurrency, thread_name_prefix="batch")
+
+def read_news(url: str):
+    return news_store.get_by_url(url, methods.get_news)
+
+def read_news_by_id(news_id: str):
+    return news_store.get_by_id(news_id, methods.get_news_by_id)
+
+def load_news_for_stream(news_id: str):
+    news = methods.get_news_by_id(news_id)
+    news_store.put(news)
+    return news
+
+# One subscription per news id, shared by every SSE client watching it
+stream_hub = stream_hub_module.StreamHub(
+    load_news_for_stream,
+    poll_interval=vars.stream_poll_interval,
+    history_size=vars.stream_history_size,
+    resume_window=vars.stream_resume_window
+)
+
+# Gauges read their current value from the objects above on every scrape
+metrics.queue_depth.set_function(jobs.depth)
+metrics.queue_running.set_function(jobs.running)
+metrics.inflight_urls.set_function(inflight_requests.active)
+metrics.sse_streams.set_function(lambda: stream_hub.stats()["subscribers"])
+metrics.sse_topics.set_function(lambda: stream_hub.stats()["topics"])
+metrics.cache_hit_ratio.labels("news").set_function(lambda: news_store.stats()["hit_ratio"])
+metrics.cache_hit_ratio.labels("redirects").set_function(canonical.redirects.hit_ratio)
+
+# Stage results pushed across worker processes, see relay_stage_events
+stage_event_log = stage_events.StageEventLog(vars.job_db_path, retention=vars.stage_event_retention)
+
+def relay_stage_events():
+    """
+    Tails the stage event log and publishes results computed by other worker
+    processes to this process's stream hub, a fraction of a second after the
+    stage completed.
+    """
+    last_id = stage_event_log.latest_id()
+    last_prune = time.monotonic()
+    while True:
+        time.sleep(vars.stage_event_poll_interval)
+        try:
+            for event in stage_event_log.read_since(last_id):
+                last_id = event["id"]
+                if event["origin"] != stage_event_log.origin:
+                    stream_hub.publish(event["news_id"], event["fields"], stage=event["stage"])
+            if time.monotonic() - last_prune > vars.stage_event_retention:
+                stage_event_log.prune()
+                last_prune = time.monotonic()
+        except Exception as e:
+            logger.error(f"Failed to relay stage events: {e}")
+
+def warm_news_cache():
+    """
+    Loads the most recent articles into the cache so the first visitors of a
+    freshly started worker do not all go to the database.
+    """
+    try:
+        recent = methods.get_recent_news(vars.news_cache_warm_num)
+        for news in recent:
+            news_store.put(news)
+        logger.info(f"Warmed news cache with {len(recent)} articles")
+    except Exception as e:
+        logger.error(f"Failed to warm news cache: {e}")
+
 # ------------------------ BACKGROUND THREAD TO PRE-SCRAPE AND ANALYSE ----------------------- #
+def prescrape_url(url: str) -> Optional[str]:
+    """
+    `prescrape.CREATED` if this call saved `url`, `prescrape.EXISTING` if it
+    was already stored (or another caller is saving it), None if it failed.
+    """
+    result = process_url(url, return_news=False, priority=job_queue.PRIORITY_BACKGROUND,
+                         analyses=vars.prescrape_analyses)
+    if result is None:
+        return None
+    return prescrape.EXISTING if result.get("exists") else prescrape.CREATED
+
+prescraper = prescrape.PrescrapeScheduler(
+    fetch_latest=lambda num: methods.get_latest_urls(num),
+    process=prescrape_url,
+    canonicalize=canonical.canonicalize,
+    lock_path=vars.prescrape_lock_path,
+    seen_path=vars.prescrape_seen_path,
+    num_articles=vars.prescrape_num,
+    parallelism=vars.prescrape_parallelism,
+    interval=vars.prescrape_interval * 60,
+    min_interval=vars.prescrape_min_interval * 60,
+    max_interval=vars.prescrape_max_interval * 60,
+    seen_capacity=vars.prescrape_seen_capacity,
+    leader_retry=vars.prescrape_leader_retry,
+)
+
 def periodic_query():
     """
-    Runs every `vars.prescrape_interval` minutes, fetches latest URLs, 
-    and processes them without returning data.
+    Fetches the latest URLs and processes the unseen ones without returning
+    data. Only one worker process (the lock holder) does this at a time.
     """
     if not vars.prescrape_feature_toggle:
         logger.info("Prescrape feature disabled. Background thread not started.")
         return
 
-    while True:
-        try:
-            logger.info("Fetching latest URLs from CNA and Straits Times...")
-            article_dict = methods.get_latest_urls(vars.prescrape_num)
-
-            for provider, url_list in article_dict.items():
-                logger.info(f"Processing {len(url_list)} URLs from provider: {provider}...")
-                for url in url_list:
-                    try:
-                        process_url(url, return_news=False)
-                    except Exception as e:
-                        logger.error(f"Failed to process URL {url}: {e}")
-        except Exception as e:
-            logger.error(f"Failed to process latest articles: {e}")
-
-        time.sleep(vars.prescrape_interval * 60)
+    prescraper.run_forever()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
+    jobs.start()
+    threading.Thread(target=warm_news_cache, daemon=True).start()
+    threading.Thread(target=relay_stage_events, daemon=True).start()
+    threading.Thread(target=resume_on_startup, daemon=True).start()
     thread = threading.Thread(target=periodic_query, daemon=True)
     thread.start()
     
     yield
     
     # Shutdown logic
-    # If needed, you can add code here to stop or clean up resources.
-    # However, since your thread is daemon, it will stop when the main application exits.
+    # The prescrape thread is a daemon and stops with the application.
+    # Queued jobs stay in the job database and are picked up on the next start.
+    jobs.stop()
     
 # ------------------------ BACKGROUND THREAD TO PRE-SCRAPE AND ANALYSE ----------------------- #
 
@@ -112,36 +232,166 @@ async def check_query():
 def new_query(input: URLwithBG):
     """
     Processes a news article URL, retrieving or extracting news data.
+    Only the stages in `analyses` (default all) and those they depend on are
+    run; a stage left out stays empty until a later query asks for it.
     """
-    return process_url(input.url, return_news=True, background=input.background)
+    check_analyses(input.analyses)
+    return process_url(input.url, return_news=True, background=input.background, analyses=input.analyses)
+
+@app.post("/application/batch_query", responses={
+    200: {
+        "description": "One JSON object per line for each distinct URL, in the order they finish",
+        "content": {
+            "application/x-ndjson": {
+                "example": '{"url": "https://www.example.com/a", "status": "exists", "news": {"id": "..."}}\n'
+                           '{"url": "https://www.example.com/b", "status": "error", "error": "Invalid URL"}\n'
+            }
+        }
+    },
+    400: {
+        "description": "No URLs given, or unknown analyses"
+    },
+    413: {
+        "description": "Too many URLs"
+    }
+    })
+def batch_query(input: BatchQuery):
+    """
+    Processes a list of news article URLs and streams each result as NDJSON.
+    Articles already analysed are looked up in one database call and returned
+    first; the rest are analysed with bounded concurrency.
+    """
+    if not input.urls:
+        raise HTTPException(status_code=400, detail="No URLs given")
+    if len(input.urls) > vars.batch_max_urls:
+        raise HTTPException(status_code=413, detail=f"At most {vars.batch_max_urls} URLs per batch")
+    check_analyses(input.analyses)
+    return StreamingResponse(process_batch(input.urls, input.analyses), media_type="application/x-ndjson")
 
 @app.get("/application/retrieve_exisiting")
 async def retrieve_query(news_id: str):
-    news = methods.get_news_by_id(news_id)
+    news = read_news_by_id(news_id)
+    # Someone is looking at it now: compute what the prescrape or telebot left out
+    request_analyses(news, None, job_queue.PRIORITY_INTERACTIVE)
     return news
 
 @app.get("/application/stream_news")
-async def stream_news(news_id: str):
+async def stream_news(news_id: str, last_event_id: Optional[str] = Header(None)):
     """
-    Streams updates for a single news document by ID and stops after 5 minutes.
+    Streams updates for a single news document by ID and stops after
+    `vars.stream_timeout` seconds. Updates come from the shared stream hub,
+    so concurrent viewers of one article do not each poll the database.
+
+    The full document is sent once as a plain message; after that only the
+    changed fields are sent as `patch` events carrying JSON-patch operations.
+    A result pushed by the orchestrator the moment its stage completes is
+    sent as a `stage` event: `{"stage": ..., "patch": [...]}`.
+    A client reconnecting with `Last-Event-ID` only gets the patches it
+    missed, when the hub still has them. Stages the article has no result
+    for yet (e.g. left out by the prescrape) are queued at interactive
+    priority, and stream in as they complete.
     """
     async def event_stream(news_id):
-        last_data = None  # Store last known state to prevent redundant updates
-        start_time = time.time()  # Record the start time
-        timeout = 4 * 60  # multiplier x sec
+        subscription = await stream_hub.subscribe(news_id, last_event_id)
+        try:
+            await asyncio.to_thread(request_analyses, subscription.snapshot, None, job_queue.PRIORITY_INTERACTIVE)
+            if subscription.backlog is not None:
+                for version, patch in subscription.backlog:
+                    yield f"id: {subscription.event_id(version)}\nevent: patch\ndata: {json.dumps(patch)}\n\n"
+            elif subscription.snapshot:
+                yield f"id: {subscription.event_id(subscription.version)}\ndata: {json.dumps(subscription.snapshot)}\n\n"
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + vars.stream_timeout
+
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    version, patch, stage = await asyncio.wait_for(subscription.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(patch, dict):
+                    # First snapshot of an article that could not be loaded when we subscribed
+                    yield f"id: {subscription.event_id(version)}\ndata: {json.dumps(patch)}\n\n"
+                elif stage:
+                    event = {"stage": stage, "patch": patch}
+                    yield f"id: {subscription.event_id(version)}\nevent: stage\ndata: {json.dumps(event)}\n\n"
+                else:
+                    yield f"id: {subscription.event_id(version)}\nevent: patch\ndata: {json.dumps(patch)}\n\n"
+
+            yield "event: close\ndata: Stream timeout\n\n"  # Signal client to close
+        finally:
+            stream_hub.unsubscribe(news_id, subscription.queue)
 
-        while time.time() - start_time < timeout:  # Run for 5 minutes
-            news = methods.get_news_by_id(news_id)  # Fetch latest data
+    return StreamingResponse(event_stream(news_id), media_type="text/event-stream")
 
-            if news and news != last_data:  # Send only if data has changed
-                last_data = news
-                yield f"data: {json.dumps(news)}\n\n"
+@app.get("/application/status/http")
+def http_status():
+    """
+    Connection pool usage and request counters for each downstream service.
+    """
+    return http_client.all_stats()
 
-            await asyncio.sleep(5)  # Polling interval (adjust if needed)
+@app.get("/application/status/cache")
+def cache_status():
+    """
+    Hit, miss and eviction counters of the news document cache.
+    """
+    return news_store.stats()
 
-        yield "event: close\ndata: Stream timeout\n\n"  # Signal client to close
+@app.get("/application/status/streams")
+def stream_status():
+    """
+    Number of watched articles and connected SSE clients.
+    """
+    return stream_hub.stats()
 
-    return StreamingResponse(event_stream(news_id), media_type="text/event-stream")
+@app.get("/application/status/breakers")
+def breaker_status():
+    """
+    Circuit breaker state (closed, open or half_open), consecutive failures
+    and the current adaptive read timeout of every downstream service.
+    """
+    return http_client.breaker_stats()
+
+@app.post("/application/resume")
+def resume_articles(limit: int = Query(None, ge=1, le=500, description="Articles to check")):
+    """
+    Finds articles with missing stage results (e.g. the service restarted
+    mid-analysis) and queues them to re-run only the missing stages.
+    """
+    try:
+        return resume_incomplete(limit)
+    except Exception as e:
+        logger.error(f"Failed to resume incomplete articles: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read incomplete articles")
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus metrics of this worker process: stage and downstream latencies,
+    error counters, queue depth, in-flight analyses, SSE streams and cache hit
+    ratios.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/application/jobs/{job_id}", responses={
+    404: {
+        "description": "Job not found"
+    }
+    })
+def get_job(job_id: str):
+    """
+    Returns the status of a background analysis job. Analysis jobs use the
+    news id as their job id.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("payload", None)
+    return job
 
 @app.get("/application/get_all_quiz")
 async def get_all_quiz(question_type: str = None):
@@ -155,73 +405,421 @@ async def get_quiz(number: int = Query(..., description="Number of questions"),
     quiz = methods.get_quiz(number=number, question_type=question_type)
     return quiz
 
-def process_url(url: str, return_news: bool = False, background: bool = True):
+def analysis_stages():
+    """
+    The analysis graph run for every new article. Only the data summary needs
+    earlier results; everything else runs concurrently.
+
+    When a stage's service errors, times out or has its circuit open, the
+    stage yields an empty fallback result (not saved) and the rest of the
+    graph carries on.
+    """
+    return [
+        pipeline.Stage("sentiment", methods.get_sentiment, fallback=dict),
+        pipeline.Stage("emotion", methods.get_emotion, fallback=dict),
+        pipeline.Stage("propaganda", methods.get_propaganda, fallback=dict),
+        pipeline.Stage("summary", methods.get_summarise, fallback=str),
+        pipeline.Stage("data summary", methods.get_data_summary,
+                       depends_on=("sentiment", "emotion", "propaganda", "summary"), fallback=str),
+        pipeline.Stage("fact check", methods.get_fact_check, fallback=list),
+    ]
+
+# The news document field each analysis stage fills in
+STAGE_FIELDS = {
+    "sentiment": "sentiment_result",
+    "emotion": "emotion_result",
+    "propaganda": "propaganda_result",
+    "summary": "summarise_result",
+    "data summary": "data_summary",
+    "fact check": "factcheck_result",
+}
+
+def stage_fields(label: str, result) -> dict:
+    """Maps a stage's return value to the news field it fills in."""
+    field = STAGE_FIELDS.get(label)
+    if not field or not result:
+        return {}
+    return {field: result}
+
+def check_analyses(analyses: Optional[List[str]]):
+    unknown = [label for label in analyses or () if label not in STAGE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown analyses: {', '.join(unknown)}. "
+                                                    f"Choose from: {', '.join(STAGE_FIELDS)}")
+
+def requested_stages(analyses: Optional[List[str]] = None) -> List[str]:
+    """The stages `analyses` need, dependencies included; every stage when None."""
+    stages = analysis_stages()
+    if analyses:
+        stages = pipeline.select_stages(stages, analyses)
+    return [stage.name for stage in stages]
+
+def missing_stages(news: dict, analyses: Optional[List[str]] = None) -> List[str]:
+    """The stages `analyses` need that have no saved result in `news`."""
+    return [label for label in requested_stages(analyses) if news.get(STAGE_FIELDS[label]) is None]
+
+def run_analysis(url: str, title: str, text: str, news_id: str = None, completed: dict = None,
+                 analyses: List[str] = None):
+    """
+    Runs the analysis graph, or only the stages in `analyses` and their
+    dependencies, for an article that is already saved.
+    Returns None on success, or a dict describing the failed stages.
+
+    Stage results travel in a `PipelineContext` and are persisted through the
+    multi-field update route, after every stage or once at the end depending
+    on `vars.pipeline_flush`. Stages in `completed` (label -> saved result)
+    are not run again; their results seed the context.
+    """
+    completed = completed or {}
+    ctx = pipeline.PipelineContext(
+        url, title, text,
+        news_id=news_id,
+        writer=methods.update_news,
+        flush_each_stage=vars.pipeline_flush == "stage",
+        results={STAGE_FIELDS[label]: result for label, result in completed.items()}
+    )
+
+    def on_stage_complete(label, result):
+        news_store.invalidate(news_id=news_id, url=url)
+        fields = stage_fields(label, result)
+        stream_hub.publish(news_id, fields, stage=label)
+        if news_id and fields:
+            # For SSE clients connected to the other worker processes
+            stage_event_log.append(news_id, label, fields)
+
+    with metrics.analyses_in_flight.track_inprogress():
+        stages = analysis_stages()
+        if analyses:
+            stages = pipeline.select_stages(stages, analyses)
+        report = pipeline.run_stages(stages, ctx,
+                                     max_workers=vars.pipeline_max_workers,
+                                     on_complete=on_stage_complete,
+                                     completed=completed)
+
+    metrics.analysis_latency.observe(report.total_time)
+    for label, elapsed in report.timings.items():
+        metrics.stage_latency.labels(label).observe(elapsed)
+    for label in report.errors:
+        metrics.stage_failures.labels(label, "error").inc()
+    for label in report.skipped:
+        metrics.stage_failures.labels(label, "skipped").inc()
+    for label in report.degraded:
+        metrics.stage_failures.labels(label, "fallback").inc()
+
+    try:
+        ctx.flush()
+    except Exception as e:
+        logger.error(f"Failed to save results for {url}: {e}")
+        report.errors["save"] = str(e)
+    news_store.invalidate(news_id=news_id, url=url)
+
+    for label, result in report.results.items():
+        if not result:
+            logger.warning(f"No result returned for {label}.")
+
+    timings = ", ".join(f"{label}={elapsed:.2f}s" for label, elapsed in report.timings.items())
+    logger.info(f"Finished processing {url} in {report.total_time:.2f}s ({timings})")
+
+    if not report.ok:
+        failed = list(report.errors) + report.skipped
+        return {"error": f"Failed at {', '.join(failed)}"}
+
+def run_analysis_job(payload: dict):
+    result = run_analysis(payload["url"], payload["title"], payload["text"], payload.get("news_id"),
+                          completed=payload.get("completed"), analyses=payload.get("analyses"))
+    if result and "error" in result:
+        raise RuntimeError(result["error"])
+
+jobs.register("analyse", run_analysis_job)
+
+def saved_stages(news: dict) -> dict:
+    """The stages of `news` whose result is already in the database."""
+    return {label: news[field] for label, field in STAGE_FIELDS.items() if news.get(field) is not None}
+
+def find_duplicate(text: str, content_hash: str):
+    """
+    A stored article with the same body text, else the most similar one above
+    `vars.near_duplicate_threshold`. Returns (news, match) with match "exact"
+    or "near", or (None, None). Lookup failures only mean no reuse.
+    """
+    if vars.content_dedup:
+        try:
+            duplicate = methods.get_news_by_content_hash(content_hash)
+            if duplicate:
+                return duplicate, "exact"
+        except Exception as e:
+            logger.error(f"Content fingerprint lookup failed: {e}")
+
+    if vars.near_duplicate_threshold:
+        try:
+            matches = methods.find_near_duplicates(text, vars.near_duplicate_threshold)
+            if matches:
+                logger.info(f"Near-duplicate of {matches[0]['id']} (similarity {matches[0]['similarity']:.2f})")
+                return methods.get_news_by_id(matches[0]["id"]), "near"
+        except Exception as e:
+            logger.error(f"Near-duplicate lookup failed: {e}")
+
+    return None, None
+
+def reusable_stages(text: str, content_hash: str) -> dict:
+    """
+    Saved stage results that can be copied from a duplicate of the article.
+    An exact copy shares every result; a near-duplicate (a byline, a
+    correction or a paragraph apart) only the stages in
+    `vars.near_duplicate_reuse`, the others are recomputed.
+    """
+    duplicate, match = find_duplicate(text, content_hash)
+    if not duplicate:
+        return {}
+    reused = saved_stages(duplicate)
+    if match == "near":
+        reused = {label: result for label, result in reused.items() if label in vars.near_duplicate_reuse}
+    if reused:
+        logger.info(f"Reusing {', '.join(reused)} from {duplicate.get('url')} ({match} match)")
+        metrics.reused_analyses.labels(match).inc()
+    return reused
+
+def resume_analysis_job(payload: dict):
+    """
+    Runs only the stages of `payload["analyses"]` (default all) whose results
+    are missing from the saved article, after the job `payload["after"]` if
+    one is given.
+    """
+    if payload.get("after"):
+        wait_for_job(payload["after"], time.time() + vars.inflight_wait_timeout)
+    news = methods.get_news_by_id(payload["news_id"])
+    if not news or not news.get("url"):
+        raise RuntimeError(f"News {payload['news_id']} not found")
+    missing = missing_stages(news, payload.get("analyses"))
+    if not missing:
+        return
+    logger.info(f"Resuming {news['url']}: missing {', '.join(missing)}")
+    result = run_analysis(news["url"], news.get("title", ""), news.get("content", ""), news.get("id"),
+                          completed=saved_stages(news), analyses=missing)
+    if result and "error" in result:
+        raise RuntimeError(result["error"])
+
+jobs.register("resume", resume_analysis_job)
+
+def lazy_job_id(news_id: str) -> str:
+    """Id of the job computing stages asked for while another job of the article was active."""
+    return f"{news_id}:lazy"
+
+def analysis_pending(news_id: str) -> bool:
+    """True while a job computing stages of `news_id` is queued or running, in any process."""
+    for job_id in (news_id, lazy_job_id(news_id)):
+        job = jobs.get(job_id)
+        if job and job["status"] in ("queued", "running"):
+            return True
+    return False
+
+def request_analyses(news: dict, analyses: Optional[List[str]], priority: int) -> bool:
+    """
+    Queues the stages of `analyses` that `news` has no result for yet, e.g.
+    the LLM stages left out when it was prescraped. A job already queued or
+    running for the article keeps its stages; the others go into a follow-up
+    job that starts once it is done. Returns True if any stage is pending.
+    """
+    news_id = news.get("id") if news else None
+    if not news_id:
+        return False
+    missing = missing_stages(news, analyses)
+    if not missing:
+        return False
+
+    try:
+        active = jobs.get(news_id)
+        if active and active["status"] in ("queued", "running"):
+            jobs.raise_priority(news_id, priority)
+            covered = requested_stages(active["payload"].get("analyses"))
+            missing = [label for label in missing if label not in covered]
+            if missing:
+                jobs.submit("resume", {"news_id": news_id, "analyses": missing, "after": news_id},
+                            job_id=lazy_job_id(news_id), priority=priority)
+        else:
+            jobs.submit("resume", {"news_id": news_id, "analyses": missing}, job_id=news_id, priority=priority)
+    except job_queue.QueueFull:
+        logger.warning(f"Job queue is full, not computing {', '.join(missing)} for {news_id} now")
+        return False
+    return True
+
+def resume_incomplete(limit: int = None) -> dict:
+    """
+    Queues a resume job for every saved article with missing results among
+    `vars.resume_analyses` (the others wait until someone asks), created more than `vars.resume_min_age` seconds ago (younger ones may
+    still be running synchronously). Jobs are keyed by news id, so articles
+    already queued or running are not queued twice, and run at background
+    priority, so at most `vars.job_background_limit` run at once.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=vars.resume_min_age)
+    fields = [STAGE_FIELDS[label] for label in requested_stages(vars.resume_analyses)]
+    articles = methods.get_incomplete_news(limit or vars.resume_batch_size, cutoff.isoformat(), fields)
+
+    queued = 0
+    for news in articles:
+        try:
+            job = jobs.submit("resume", {"news_id": news["id"], "analyses": vars.resume_analyses}, job_id=news["id"],
+                              priority=job_queue.PRIORITY_BACKGROUND)
+        except job_queue.QueueFull:
+            logger.warning("Job queue is full, leaving the remaining articles for the next resume pass")
+            break
+        if job["kind"] == "resume":
+            queued += 1
+    logger.info(f"Found {len(articles)} incomplete articles, queued {queued} for resumption")
+    return {"incomplete": len(articles), "queued": queued}
+
+def resume_on_startup():
+    if not vars.resume_on_startup:
+        return
+    try:
+        resume_incomplete()
+    except Exception as e:
+        logger.error(f"Failed to resume incomplete articles: {e}")
+
+def wait_for_job(job_id: str, deadline: float) -> bool:
+    """Blocks until job `job_id`, if there is one, finishes. Returns True if it had to wait."""
+    waited = False
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if not job or job["status"] not in ("queued", "running"):
+            break
+        waited = True
+        time.sleep(1)
+    return waited
+
+def wait_for_analysis(news_id: str) -> bool:
+    """
+    Blocks until the queued analyses of `news_id`, if there are any, finish.
+    Returns True if it had to wait.
+    """
+    if not news_id:
+        return False
+    deadline = time.time() + vars.inflight_wait_timeout
+    waited = wait_for_job(news_id, deadline)
+    return wait_for_job(lazy_job_id(news_id), deadline) or waited
+
+def follow_flight(flight: inflight.Flight, url: str, return_news: bool, background: bool, priority: int,
+                  analyses: Optional[List[str]] = None):
+    """
+    Shares the result of another caller's in-flight `process_url` for the same
+    URL. Background callers only need the saved article (its id is enough to
+    stream progress); synchronous callers wait for the full analysis. Stages
+    this caller wants but the other did not are queued after it.
+    """
+    flight.request_priority(priority)
+    event = flight.saved if background else flight.done
+    if not event.wait(vars.inflight_wait_timeout):
+        raise TimeoutError(f"Timed out waiting for the in-flight analysis of {url}")
+    if flight.error is not None:
+        raise flight.error
+    if flight.news and flight.news.get("id"):
+        # The leader may have queued it already, at a lower priority
+        jobs.raise_priority(flight.news["id"], priority)
+
+    if not return_news:
+        return {"exists": True}  # saved by the leader, like an existing article to a background caller
+    # Only what the leader is not computing already
+    wanted = [label for label in requested_stages(analyses) if label not in (flight.analyses or ())]
+    if background and flight.news is not None:
+        if wanted:
+            request_analyses(flight.news, wanted, priority)
+        return flight.news
+
+    news = read_news(url)
+    if wanted:
+        request_analyses(news, wanted, priority)
+    if not background and wait_for_analysis(news.get("id")):
+        news_store.invalidate(url=url)
+        news = read_news(url)
+    return news
+
+def process_url(url: str, return_news: bool = False, background: bool = True,
+                priority: int = job_queue.PRIORITY_INTERACTIVE, analyses: Optional[List[str]] = None):
     """
     Core function that processes a news URL.
     If `return_news` is True, it returns the news data (for API responses).
     If `return_news` is False, it only performs data extraction & analysis.
+    Background analyses are queued at `priority`; prescrape and backfills use
+    `PRIORITY_BACKGROUND` so they never hold up user requests.
+    Only the stages in `analyses` (default all) are run; returning an existing
+    article queues those of them it has no result for yet.
     """
+    # Every lookup, insert and in-flight key uses the canonical form of the URL,
+    # but the page is scraped from the address it was shared under
+    source_url = canonical.resolve(url)
+    url = canonical.canonicalize(source_url)
+
+    flight, leader = inflight_requests.join(url)
+    flight.request_priority(priority)
+    failure = None
     try:
+        if not leader:
+            logger.info(f"Analysis of {url} already in flight, attaching to it...")
+            return follow_flight(flight, url, return_news, background, priority, analyses)
+
         logger.info("Checking if article exists...")
         exists = methods.check_exists(url)
 
         if exists["exists"]:
             logger.info(f"News already exists for {url}")
             if return_news:
-                return methods.get_news(url)
-            return  # If called from the background task, no return is needed.
+                news = read_news(url)
+                if news.get("id"):
+                    # e.g. a user asking for an article the prescrape queued
+                    jobs.raise_priority(news["id"], priority)
+                request_analyses(news, analyses, priority)
+                if not background and wait_for_analysis(news.get("id")):
+                    news_store.invalidate(url=url)
+                    news = read_news(url)
+                return news
+            return exists  # If called from the background task, only report that it exists.
+
+        if background and not jobs.has_capacity():
+            raise job_queue.QueueFull("Job queue is full")
 
         logger.info("New article, processing...")
 
         # Extract article content
-        data = methods.extract_news(url)
+        data = methods.extract_news(source_url)
         text = data.get("body", "")
         title = data.get("headline", "")
         
         if text == "" or title == "":
             raise HTTPException(status_code=400, detail="Invalid URL")
 
-        # Save article content
-        initial_save = methods.create_news(url, title, text)
-
-        # Define the remaining processing as a separate function
-        def remaining_processing():
-            analysis_methods = [
-                (methods.get_sentiment, "sentiment"),
-                (methods.get_emotion, "emotion"),
-                (methods.get_propaganda, "propaganda"),
-                (methods.get_summarise, "summary"),
-                (methods.get_data_summary, "data summary"),
-                (methods.get_fact_check, "fact check")
-            ]
-
-            for analysis_method, label in analysis_methods:
-                try:
-                    result = analysis_method(text, url, title)
-                    if not result:
-                        logger.warning(f"No result returned for {label}.")
-                except Exception as e:
-                    logger.error(f"Error getting {label} for {url}: {e}")
-                    return {"error": f"Failed at {label}: {str(e)}"}
-
-            logger.info(f"Finished processing {url}")
+        # Reuse the analysis of an identical or near-identical article saved under another URL
+        content_hash = fingerprint.content_hash(text)
+        reused = reusable_stages(text, content_hash)
 
-            if return_news:
-                return methods.get_news(url)
+        # Save article content, with any copied results
+        initial_save = methods.create_news(url, title, text, content_hash=content_hash,
+                                           results={STAGE_FIELDS[label]: result for label, result in reused.items()})
+        flight.analyses = requested_stages(analyses)
+        flight.mark_saved(initial_save)
 
         if background:
-            # Run the remaining processing in a separate thread
-            threading.Thread(target=remaining_processing).start()
+            if any(label not in reused for label in flight.analyses):
+                # Queue the remaining processing for the worker pool
+                jobs.submit("analyse", {"url": url, "title": title, "text": text, "news_id": initial_save.get("id"),
+                                        "completed": reused, "analyses": analyses},
+                            job_id=initial_save.get("id"), priority=flight.priority)
             # Return the initial save result immediately
             return initial_save
         else:
             # Perform the remaining processing synchronously
-            result = remaining_processing()
+            result = run_analysis(url, title, text, initial_save.get("id"), completed=reused, analyses=analyses)
             if return_news:
-                return methods.get_news(url)
+                return read_news(url)
             return result
 
+    except job_queue.QueueFull as error:
+        failure = error
+        logger.warning(f"Not processing {url}: {error}")
+        if return_news:
+            raise HTTPException(status_code=429, detail="Too many articles are being analysed, try again later")
+
     except Exception as error:
+        failure = error
         logger.error(f"Error processing {url}: {error}")
         if return_news:
             # Check if the error is an HTTPException with a description
@@ -231,3 +829,66 @@ def process_url(url: str, return_news: bool = False, background: bool = True):
                 # Handle other errors including ConnectionError
                 error_message = str(error) if str(error) else "Internal Server Error"
                 raise HTTPException(status_code=500, detail=error_message)
+
+    finally:
+        if leader:
+            inflight_requests.finish(flight, failure)
+
+def backfill_url(url: str, analyses: Optional[List[str]] = None):
+    """
+    Analyses `url` as a background priority job, so bulk work never delays
+    interactive queries, and returns the article once its analysis finished.
+    """
+    news = process_url(url, return_news=True, background=True, priority=job_queue.PRIORITY_BACKGROUND,
+                       analyses=analyses)
+    if wait_for_analysis(news.get("id")):
+        key = canonical.canonical_url(url)
+        news_store.invalidate(url=key)
+        news = read_news(key)
+    return news
+
+def batch_line(url: str, status: str, **fields) -> str:
+    return json.dumps({"url": url, "status": status, **fields}, default=str) + "\n"
+
+def process_batch(urls: List[str], analyses: Optional[List[str]] = None) -> Iterable[str]:
+    """
+    Yields one NDJSON line per distinct canonical URL: articles that already
+    have every result in `analyses` (default all) from a single bulk lookup
+    straight away, then the others as their background priority analyses
+    finish (see `backfill_url`).
+    """
+    # Canonical URL -> the first URL given for it, which is what gets scraped
+    sources: Dict[str, str] = {}
+    for url in urls:
+        sources.setdefault(canonical.canonical_url(url), url)
+    canonical_urls = list(sources)
+
+    try:
+        existing = {news.get("url"): news for news in methods.get_news_by_urls(canonical_urls)}
+    except Exception as e:
+        logger.error(f"Bulk lookup failed, processing every URL: {e}")
+        existing = {}
+
+    remaining = []
+    for url in canonical_urls:
+        news = existing.get(url)
+        if news and not missing_stages(news, analyses):
+            news_store.put(news)
+            yield batch_line(url, "exists", news=news)
+        else:
+            remaining.append(url)
+
+    futures = {batch_pool.submit(backfill_url, sources[url], analyses): url for url in remaining}
+    try:
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                yield batch_line(url, "processed", news=future.result())
+            except HTTPException as e:
+                yield batch_line(url, "error", error=e.detail)
+            except Exception as e:
+                yield batch_line(url, "error", error=str(e) or "Internal Server Error")
+    finally:
+        # The client went away: drop whatever has not started yet
+        for future in futures:
+            future.cancel()
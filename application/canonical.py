@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import logging
+import threading
+
+import requests
+
+import vars as vars
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "cmpid", "amp",
+    "at_medium", "at_campaign", "at_custom1", "at_custom2", "at_custom3", "at_custom4",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "pk_", "mtm_")
+
+# Hosts that only redirect to the real article
+SHORTENER_HOSTS = {
+    "t.co", "bit.ly", "tinyurl.com", "ow.ly", "buff.ly", "goo.gl", "is.gd",
+    "tiny.cc", "lnkd.in", "t.ly", "rb.gy", "shorturl.at", "cna.asia", "str.sg",
+}
+
+
+def _strip_amp_path(path: str) -> str:
+    if path.startswith("/amp/"):
+        path = path[len("/amp"):]
+    if path.endswith("/amp"):
+        path = path[:-len("/amp")]
+    return path
+
+
+def _straitstimes(host: str, path: str, query: List[Tuple[str, str]]):
+    # Article pages are fully identified by their path
+    return "www.straitstimes.com", _strip_amp_path(path), []
+
+
+def _channelnewsasia(host: str, path: str, query: List[Tuple[str, str]]):
+    # Article pages end in a numeric id, the query string is only tracking (cid=...)
+    return "www.channelnewsasia.com", _strip_amp_path(path), []
+
+
+# Per-publisher rules, keyed by registered domain: (host, path, query) -> (host, path, query)
+PUBLISHER_RULES: Dict[str, Callable] = {
+    "straitstimes.com": _straitstimes,
+    "channelnewsasia.com": _channelnewsasia,
+}
+
+
+def _registered_domain(host: str) -> str:
+    parts = host.split(".")
+    return ".".join(parts[-2:]) if len(parts) >= 2 else host
+
+
+def canonicalize(url: str) -> str:
+    """
+    Normalises a URL so that links to the same article compare equal:
+    https, lower-case host without `m.`/`amp.`/`mobile.` prefixes, no default
+    port, fragment, trailing slash or tracking parameters, sorted query.
+    Known publishers get stricter rules (see `PUBLISHER_RULES`).
+
+    The result is only the key articles are stored and looked up under; not
+    every site serves https or the bare host, so scrape the original URL.
+    """
+    url = url.strip()
+    parts = urlsplit(url if "://" in url else "https://" + url)
+
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+
+    host = (parts.hostname or "").lower()
+    for prefix in ("m.", "amp.", "mobile."):
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+
+    rule = PUBLISHER_RULES.get(_registered_domain(host))
+    if rule:
+        host, path, query = rule(host, path, query)
+
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+class RedirectCache:
+    """
+    Bounded LRU cache of shortener link -> final URL. Short links never change
+    target, so entries do not expire; failed lookups are not cached.
+    """
+    def __init__(self, max_size: int = 10000, timeout: float = 5.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, url: str) -> str:
+        with self._lock:
+            if url in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(url)
+                return self._cache[url]
+            self.misses += 1
+
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code == 405:
+                response = self.session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+                response.close()
+            resolved = response.url
+        except requests.RequestException as e:
+            logger.warning(f"Could not resolve redirect for {url}: {e}")
+            return url
+
+        with self._lock:
+            self._cache[url] = resolved
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return resolved
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    def hit_ratio(self) -> float:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
+
+
+redirects = RedirectCache(max_size=vars.redirect_cache_size, timeout=vars.redirect_timeout)
+
+
+def is_shortened(url: str) -> bool:
+    host = (urlsplit(url if "://" in url else "https://" + url).hostname or "").lower()
+    return host.removeprefix("www.") in SHORTENER_HOSTS
+
+
+def resolve(url: str) -> str:
+    """The URL to scrape: shortened links are followed, anything else is kept as given."""
+    url = url.strip()
+    return redirects.resolve(url) if is_shortened(url) else url
+
+
+def canonical_url(url: str) -> str:
+    """Resolves shortened links, then canonicalises. Used as the article key."""
+    return canonicalize(resolve(url))
@@ -0,0 +1,20 @@
+import hashlib
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalise(text: str) -> str:
+    """
+    Body text reduced to lower-case words separated by single spaces, so
+    copies that only differ in whitespace, punctuation, quote style or case
+    compare equal.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 fingerprint of the normalised body text."""
+    return hashlib.sha256(normalise(text).encode("utf-8")).hexdigest()
@@ -0,0 +1,339 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, List, Optional, Union
+
+import logging
+import threading
+import time
+
+import requests
+
+import vars as vars
+import metrics
+import resilience
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    """One backend instance of a service, with its own health (circuit breaker) and load."""
+
+    def __init__(self, base_url: str, breaker: resilience.CircuitBreaker):
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+
+class ServiceClient:
+    """
+    Keep-alive HTTP client for one downstream service, spread over one or
+    more replica URLs.
+
+    Each service gets its own `requests.Session` with a dedicated connection
+    pool per replica, so a burst of calls to one container cannot starve the
+    others, and connections are reused instead of opening a new TCP socket
+    per call.
+
+    Requests go to the healthy replica with the fewest requests in flight.
+    Each replica has a circuit breaker: after `failure_threshold` consecutive
+    failures (errors or 5xx responses) it is ejected for `reset_timeout`
+    seconds, then gets a single probe request. When every replica is ejected
+    the request fails fast with `CircuitOpenError` instead of tying up the
+    orchestrator's threads. A 503 is a busy replica shedding load, not a
+    failure: it does not count towards the breaker, and the request is sent
+    once more to another replica if there is one.
+
+    Unless the caller passes a timeout, the read timeout adapts to the
+    observed p99 latency of the route (the path, or the `route` the caller
+    names for paths carrying ids), within [min_read_timeout, read_timeout],
+    so fast lookups do not cut short the slow bulk calls of the same service.
+    With `hedge` enabled, a `hedge=True` request (only pass it for idempotent
+    calls) that has not answered by the route's p95 is also sent to a second
+    replica, and the first answer wins.
+    """
+
+    def __init__(self, name: str, base_urls: Union[str, List[str]], pool_size: int = 10,
+                 connect_timeout: float = 3.0, read_timeout: float = 30.0,
+                 min_read_timeout: float = 1.0, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 timeout_multiplier: float = 2.0, hedge: bool = False):
+        if isinstance(base_urls, str):
+            base_urls = [url for url in base_urls.split(",") if url.strip()]
+        if not base_urls:
+            raise ValueError(f"No URL configured for service '{name}'")
+
+        self.name = name
+        self.replicas = [
+            Replica(url.strip(), resilience.CircuitBreaker(f"{name} ({url.strip()})",
+                                                           failure_threshold=failure_threshold,
+                                                           reset_timeout=reset_timeout))
+            for url in base_urls
+        ]
+        self.base_url = self.replicas[0].base_url
+        self.pool_size = pool_size
+        self.hedge = hedge
+        self.timeout = (connect_timeout, read_timeout)
+        self.min_read_timeout = min_read_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.read_timeouts: Dict[str, resilience.AdaptiveTimeout] = {}
+
+        self.session = requests.Session()
+        # pool_block=True makes callers wait for a free connection instead of
+        # opening (and then discarding) extra sockets beyond the pool size
+        self._adapter = HTTPAdapter(pool_connections=len(self.replicas), pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._total_time = 0.0
+
+    def read_timeout_for(self, route: str) -> resilience.AdaptiveTimeout:
+        """The adaptive read timeout of one route of the service."""
+        with self._lock:
+            timeout = self.read_timeouts.get(route)
+            if timeout is None:
+                timeout = resilience.AdaptiveTimeout(self.timeout[1], min_timeout=self.min_read_timeout,
+                                                     multiplier=self.timeout_multiplier)
+                self.read_timeouts[route] = timeout
+            return timeout
+
+    # ------------------------ ROUTING ----------------------- #
+    def _pick(self, exclude: Optional[Replica] = None) -> Replica:
+        """The least loaded replica whose breaker lets a request through."""
+        with self._lock:
+            candidates = sorted((replica for replica in self.replicas if replica is not exclude),
+                                key=lambda replica: replica.in_flight)
+        for replica in candidates:
+            try:
+                replica.breaker.allow()
+                return replica
+            except resilience.CircuitOpenError:
+                continue
+        raise resilience.CircuitOpenError(f"No healthy replica of {self.name}")
+
+    def _send(self, replica: Replica, method: str, path: str, tracker: resilience.AdaptiveTimeout,
+              read_timeout: float, **kwargs) -> requests.Response:
+        with self._lock:
+            replica.in_flight += 1
+            replica.requests += 1
+
+        metrics.downstream_requests.labels(self.name, method).inc()
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, replica.base_url + path, **kwargs)
+            tracker.observe(time.perf_counter() - start)
+            if response.status_code == 503:
+                # Backpressure from a healthy replica, e.g. a full inference queue
+                metrics.downstream_errors.labels(self.name, "overloaded").inc()
+                replica.breaker.record_neutral()
+            elif response.status_code >= 500:
+                metrics.downstream_errors.labels(self.name, "status").inc()
+                replica.breaker.record_failure()
+            else:
+                replica.breaker.record_success()
+            return response
+        except requests.Timeout:
+            metrics.downstream_errors.labels(self.name, "timeout").inc()
+            # Counted at the timeout it had, so the p99 catches up with a slower service
+            tracker.observe(read_timeout)
+            replica.breaker.record_failure()
+            with self._lock:
+                replica.errors += 1
+            raise
+        except requests.RequestException:
+            metrics.downstream_errors.labels(self.name, "connection").inc()
+            replica.breaker.record_failure()
+            with self._lock:
+                replica.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.downstream_latency.labels(self.name).observe(elapsed)
+            with self._lock:
+                replica.in_flight -= 1
+                self._total_time += elapsed
+
+    def request(self, method: str, path: str, hedge: bool = False, route: Optional[str] = None,
+                **kwargs) -> requests.Response:
+        """
+        Sends the request to a healthy replica. `route` keys the adaptive read
+        timeout (default: `path`); an explicit `timeout` bypasses it.
+        """
+        try:
+            replica = self._pick()
+        except resilience.CircuitOpenError:
+            metrics.downstream_errors.labels(self.name, "circuit_open").inc()
+            raise
+
+        tracker = self.read_timeout_for(route or path)
+        if "timeout" in kwargs:
+            timeout = kwargs["timeout"]
+            read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        else:
+            read_timeout = tracker.current()
+            kwargs["timeout"] = (self.timeout[0], read_timeout)
+
+        hedge_after = tracker.percentile(0.95) if hedge and self.hedge and len(self.replicas) > 1 else None
+        if hedge_after is None:
+            response = self._send(replica, method, path, tracker, read_timeout, **kwargs)
+        else:
+            response = self._hedged(replica, hedge_after, method, path, tracker, read_timeout, **kwargs)
+        if response.status_code != 503 or len(self.replicas) == 1:
+            return response
+
+        # The replica was too busy to take the request: one more try elsewhere
+        try:
+            other = self._pick(exclude=replica)
+        except resilience.CircuitOpenError:
+            return response
+        response.close()
+        return self._send(other, method, path, tracker, read_timeout, **kwargs)
+
+    def _hedged(self, primary: Replica, hedge_after: float, method: str, path: str,
+                tracker: resilience.AdaptiveTimeout, read_timeout: float, **kwargs) -> requests.Response:
+        futures = [_hedge_pool.submit(self._send, primary, method, path, tracker, read_timeout, **kwargs)]
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            try:
+                backup = self._pick(exclude=primary)
+            except resilience.CircuitOpenError:
+                backup = None
+            if backup is not None:
+                metrics.downstream_hedges.labels(self.name).inc()
+                futures.append(_hedge_pool.submit(self._send, backup, method, path, tracker, read_timeout, **kwargs))
+
+        # First successful answer wins; an error only counts once both have failed
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    error = e
+                    continue
+                if response.status_code < 500 or not pending:
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return response
+                error = None
+                response.close()
+        raise error
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    # ------------------------ STATUS ----------------------- #
+    def stats(self) -> Dict[str, Any]:
+        """Request counters plus the state of the underlying connection pools."""
+        connections_opened = 0
+        idle_connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            if pool.pool is not None:
+                idle_connections += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        with self._lock:
+            requests_sent = sum(replica.requests for replica in self.replicas)
+            return {
+                "base_url": self.base_url,
+                "replicas": [
+                    {"url": replica.base_url, "in_flight": replica.in_flight,
+                     "requests": replica.requests, "errors": replica.errors}
+                    for replica in self.replicas
+                ],
+                "pool_size": self.pool_size,
+                "connect_timeout": self.timeout[0],
+                "read_timeout": self.timeout[1],
+                "in_flight": sum(replica.in_flight for replica in self.replicas),
+                "requests": requests_sent,
+                "errors": sum(replica.errors for replica in self.replicas),
+                "avg_latency": self._total_time / requests_sent if requests_sent else 0.0,
+                "connections_opened": connections_opened,
+                "idle_connections": idle_connections,
+            }
+
+    def breaker_stats(self) -> Dict[str, Any]:
+        """Overall health, per-replica breaker state and the adaptive timeout of each route."""
+        replicas = [{"url": replica.base_url, **replica.breaker.stats()} for replica in self.replicas]
+        open_count = sum(replica["state"] == resilience.CircuitBreaker.OPEN for replica in replicas)
+        closed_count = sum(replica["state"] == resilience.CircuitBreaker.CLOSED for replica in replicas)
+        if closed_count == len(replicas):
+            state = resilience.CircuitBreaker.CLOSED
+        elif open_count == len(replicas):
+            state = resilience.CircuitBreaker.OPEN
+        else:
+            state = "degraded"
+        with self._lock:
+            routes = dict(self.read_timeouts)
+        return {
+            "state": state,
+            "replicas": replicas,
+            "read_timeout": self.timeout[1],
+            "min_read_timeout": self.min_read_timeout,
+            "routes": {
+                route: {**timeout.stats(), "p95": timeout.percentile(0.95)}
+                for route, timeout in routes.items()
+            },
+        }
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+# Threads that carry hedged requests: the original and its backup run side by side
+_hedge_pool = ThreadPoolExecutor(max_workers=vars.hedge_pool_size, thread_name_prefix="hedge")
+
+
+_clients: Dict[str, ServiceClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str) -> ServiceClient:
+    """Returns the shared client for a downstream service named in `vars.service_urls`."""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            settings = vars.http_settings[name]
+            client = ServiceClient(
+                name,
+                vars.service_urls[name],
+                pool_size=settings["pool_size"],
+                connect_timeout=settings["connect_timeout"],
+                read_timeout=settings["read_timeout"],
+                min_read_timeout=settings["min_read_timeout"],
+                failure_threshold=settings["failure_threshold"],
+                reset_timeout=settings["reset_timeout"],
+                timeout_multiplier=vars.adaptive_timeout_multiplier,
+                hedge=settings["hedge"],
+            )
+            _clients[name] = client
+        return client
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.stats() for client in clients}
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Circuit breaker state per replica and current adaptive timeouts per service."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.breaker_stats() for client in clients}
@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import threading
+
+
+class Flight:
+    """
+    One in-progress analysis. The leader fills it in; followers wait on it.
+
+    `saved` is set once the article row exists (followers that only need the
+    news id, e.g. to open the SSE stream, can return then). `done` is set when
+    the leader is finished with the URL, successfully or not. `priority` is
+    the most urgent job priority any caller asked for; the leader queues the
+    analysis with it. `analyses` are the stages the leader is computing, once
+    it knows the article is new.
+    """
+    def __init__(self, key: str):
+        self.key = key
+        self.news: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.priority: Optional[int] = None
+        self.analyses: Optional[List[str]] = None
+        self.saved = threading.Event()
+        self.done = threading.Event()
+
+    def mark_saved(self, news: Dict[str, Any]):
+        self.news = news
+        self.saved.set()
+
+    def request_priority(self, priority: int):
+        if self.priority is None or priority < self.priority:
+            self.priority = priority
+
+
+class InFlightRegistry:
+    """
+    Single-flight registry keyed by URL: the first caller for a key becomes the
+    leader and does the work, concurrent callers for the same key attach to
+    the leader's flight instead of starting their own.
+    """
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """Returns the flight for `key` and whether the caller is its leader."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = Flight(key)
+            self._flights[key] = flight
+            return flight, True
+
+    def finish(self, flight: Flight, error: Optional[BaseException] = None):
+        """Releases the key and wakes every follower."""
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.error = error
+        flight.saved.set()
+        flight.done.set()
+
+    def active(self) -> int:
+        with self._lock:
+            return len(self._flights)
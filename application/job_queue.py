@@ -0,0 +1,337 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+# Lower runs first. Interactive jobs come from a user waiting on the result;
+# background jobs (prescrape, backfills) only use the capped share of workers.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth."""
+
+
+class JobQueue:
+    """
+    Bounded job queue persisted in SQLite and drained by a fixed pool of
+    worker threads.
+
+    Jobs survive a restart: anything still `queued` is picked up again, and a
+    `running` job whose lease expired (its worker died) is put back in the
+    queue. While a job runs, its worker keeps extending the lease, so only a
+    job whose worker stopped renewing it is run again; a worker that lost its
+    job that way does not overwrite the result of the new run. Because the
+    state lives in the database file, several uvicorn
+    worker processes sharing the file also share one queue and one depth limit.
+
+    Jobs are claimed by priority, then age. At most `background_limit` jobs at
+    `PRIORITY_BACKGROUND` or lower run at once (across processes), so the
+    remaining workers are always free for interactive jobs.
+    """
+
+    def __init__(self, db_path: str, workers: int = 4, max_depth: int = 100, lease_seconds: int = 600,
+                 background_limit: int = 2):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self.background_limit = background_limit
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads = []
+        self._running: Dict[str, str] = {}  # job id -> owner token of the claims running here
+        self._running_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+
+        self._init_db()
+
+    # ------------------------ STORAGE ----------------------- #
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    owner TEXT,
+                    lease_until REAL,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    priority INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "priority" not in columns:
+                # Job databases created before priorities existed
+                conn.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            conn.execute("DROP INDEX IF EXISTS idx_jobs_status")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority, created_at)")
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # ------------------------ PUBLIC API ----------------------- #
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]):
+        """Registers the function that runs jobs of the given kind."""
+        self._handlers[kind] = handler
+
+    def depth(self) -> int:
+        """Number of jobs waiting to be picked up."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def running(self) -> int:
+        """Number of jobs being run, by any process sharing the queue."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+
+    def has_capacity(self) -> bool:
+        return self.depth() < self.max_depth
+
+    def submit(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None,
+               priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """
+        Persists a new job and wakes a worker. Raises `QueueFull` when the queue
+        is already at `max_depth`. Re-submitting the id of a finished job
+        replaces it; re-submitting an active one returns the active job, after
+        raising a queued job to `priority` if that is more urgent.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        job_id = job_id or uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if existing and existing["status"] in ("queued", "running"):
+                    if existing["status"] == "queued" and priority < existing["priority"]:
+                        conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+                    conn.execute("COMMIT")
+                    return self.get(job_id)
+
+                depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= self.max_depth:
+                    raise QueueFull(f"Job queue is full ({depth} jobs waiting)")
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (id, kind, payload, status, created_at, priority) "
+                    "VALUES (?, ?, ?, 'queued', ?, ?)",
+                    (job_id, kind, json.dumps(payload), time.time(), priority)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def raise_priority(self, job_id: str, priority: int) -> bool:
+        """Moves a queued job up to `priority`. Returns True if it changed."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET priority = ? WHERE id = ? AND status = 'queued' AND priority > ?",
+                (priority, job_id, priority)
+            )
+        if cursor.rowcount:
+            logger.info(f"Raised job {job_id} to priority {priority}")
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the job with its queue position (for queued jobs), or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return None
+            job = self._row_to_job(row)
+            if job["status"] == "queued":
+                job["position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+                    "AND (priority < ? OR (priority = ? AND created_at < ?))",
+                    (job["priority"], job["priority"], job["created_at"])
+                ).fetchone()[0]
+        return job
+
+    def start(self):
+        """Starts the worker threads. Safe to call more than once."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._requeue_expired()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.workers:
+                thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Job queue started with {self.workers} workers (max depth {self.max_depth})")
+
+    def stop(self, timeout: float = 5.0):
+        """Signals the workers to exit once their current job finishes."""
+        with self._lock:
+            self._stopping.set()
+            with self._wakeup:
+                self._wakeup.notify_all()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    # ------------------------ WORKERS ----------------------- #
+    def _requeue_expired(self):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ?",
+                (time.time(),)
+            )
+            if cursor.rowcount:
+                logger.warning(f"Re-queued {cursor.rowcount} jobs whose worker did not finish them")
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                running_background = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'running' AND priority >= ?",
+                    (PRIORITY_BACKGROUND,)
+                ).fetchone()[0]
+                # Once background work has its share of workers, only more urgent jobs may start
+                max_priority = PRIORITY_BACKGROUND if running_background >= self.background_limit else None
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND (? IS NULL OR priority < ?) "
+                    "ORDER BY priority, created_at LIMIT 1",
+                    (max_priority, max_priority)
+                ).fetchone()
+                if row:
+                    # Unique per claim, so a re-queued job claimed again in this process has a new owner
+                    owner = f"{self._owner}:{uuid.uuid4().hex[:8]}"
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, started_at = ? WHERE id = ?",
+                        (owner, now + self.lease_seconds, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        job = self._row_to_job(row)
+        job.update(status="running", owner=owner, lease_until=now + self.lease_seconds, started_at=now)
+        return job
+
+    def _renew(self, job_id: str, owner: str) -> bool:
+        """Extends the lease of a job this worker still owns. Returns False if it lost the job."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id, owner)
+            )
+        return cursor.rowcount > 0
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: str = None,
+                owner: Optional[str] = None) -> bool:
+        """
+        Records the outcome of a job. With `owner`, only while that claim still
+        owns the job; returns False when it was re-queued and claimed again.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND (? IS NULL OR (owner = ? AND status = 'running'))",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id,
+                 owner, owner)
+            )
+        if not cursor.rowcount:
+            logger.warning(f"Job {job_id} was taken over by another worker; dropping this run's {status} result")
+        return cursor.rowcount > 0
+
+    def _heartbeat(self):
+        # Renew well before the lease runs out, so a slow job is never mistaken for a dead worker
+        interval = max(self.lease_seconds / 3, 0.1)
+        while not self._stopping.wait(interval):
+            with self._running_lock:
+                running = list(self._running.items())
+            for job_id, owner in running:
+                try:
+                    if not self._renew(job_id, owner):
+                        logger.warning(f"Lost the lease of job {job_id} while it was running")
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to renew the lease of job {job_id}: {e}")
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                # Other processes may enqueue into the same file, so poll as well
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                try:
+                    self._requeue_expired()
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to requeue expired jobs: {e}")
+                continue
+
+            handler = self._handlers.get(job["kind"])
+            with self._running_lock:
+                self._running[job["id"]] = job["owner"]
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+                result = handler(job["payload"])
+                self._finish(job["id"], "done", result=result, owner=job["owner"])
+            except Exception as e:
+                logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+                self._finish(job["id"], "failed", error=str(e), owner=job["owner"])
+            finally:
+                with self._running_lock:
+                    if self._running.get(job["id"]) == job["owner"]:
+                        del self._running[job["id"]]
+
+            # A background slot may have freed up for a worker that skipped one
+            with self._wakeup:
+                self._wakeup.notify_all()
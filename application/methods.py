@@ -1,8 +1,10 @@
 import vars as vars
 from typing import Dict, List, Any
 
-import requests
 from flask import abort 
+import http_client
+import metrics
+from pipeline import PipelineContext
 
 import pprint
 import logging
@@ -11,6 +13,14 @@ from typing import List, Dict, Any
 
 logger = logging.getLogger(__name__)
 
+# Shared keep-alive clients, one connection pool per downstream service
+scraper = http_client.get_client("scraper")
+database = http_client.get_client("database")
+sentiment_service = http_client.get_client("sentiment")
+emotion_service = http_client.get_client("emotion")
+propaganda_service = http_client.get_client("propaganda")
+factcheck_service = http_client.get_client("factcheck")
+
 def sanitize_factcheck_data(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Sanitizes the fact-check data to ensure it conforms to the FactCheckItem model.
@@ -38,11 +48,11 @@ def sanitize_factcheck_data(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return sanitized_data
 
 # Scraper calls
+@metrics.timed("extract_news")
 def extract_news(url):
-    query_url = vars.scraper_url + "/scraper/get-article"
     params = {"url": url}
 
-    response = requests.get(query_url, params=params)
+    response = scraper.get("/scraper/get-article", params=params)
 
     if response.status_code == 400:
         abort(400, description="Invalid URL format")
@@ -51,21 +61,21 @@ def extract_news(url):
     return text
 
 # Database calls
+@metrics.timed("check_exists")
 def check_exists (url):
     
-    query_url = vars.database_url + "/database/check_exists/"
     data = {"url": url}
 
-    response = requests.post(query_url, json=data)
+    response = database.post("/database/check_exists/", json=data)
     exists = response.json()
     return exists
 
+@metrics.timed("get_news")
 def get_news (url):
     # get completed news data from the database
-    query_url = vars.database_url + "/database/getByURL/"
     data = {"url": url}
 
-    response = requests.post(query_url, json=data)
+    response = database.post("/database/getByURL/", json=data)
     news = response.json()
     
     if '_id' in news and '$oid' in news['_id']:
@@ -74,10 +84,69 @@ def get_news (url):
 
     return news
 
+@metrics.timed("get_news_by_urls")
+def get_news_by_urls (urls):
+    # every stored news document among `urls`, in one call
+    response = database.post("/database/getByURLs/", json={"urls": urls})
+    response.raise_for_status()
+    news_list = response.json()
+
+    for news in news_list:
+        if '_id' in news and '$oid' in news['_id']:
+            news['id'] = news['_id']['$oid']
+            del news['_id']
+
+    return news_list
+
+@metrics.timed("get_news_by_id")
 def get_news_by_id (news_id):
-    query_url = vars.database_url + "/database/getByID/" + news_id
+    response = database.get("/database/getByID/" + news_id, route="/database/getByID/")
+    news = response.json()
+
+    if '_id' in news and '$oid' in news['_id']:
+        news['id'] = news['_id']['$oid']
+        del news['_id']
+
+    return news
 
-    response = requests.get(query_url)
+@metrics.timed("get_recent_news")
+def get_recent_news (limit):
+    # most recently created news, newest first
+    response = database.get("/database/getRecent/", params={"limit": limit})
+    response.raise_for_status()
+    news_list = response.json()
+
+    for news in news_list:
+        if '_id' in news and '$oid' in news['_id']:
+            news['id'] = news['_id']['$oid']
+            del news['_id']
+
+    return news_list
+
+@metrics.timed("get_incomplete_news")
+def get_incomplete_news (limit, created_before, fields=None):
+    # saved news with at least one analysis result (of `fields`, default all) missing, oldest first
+    params = {"limit": limit, "created_before": created_before}
+    if fields:
+        params["fields"] = ",".join(fields)
+    response = database.get("/database/getIncomplete/", params=params)
+    response.raise_for_status()
+    news_list = response.json()
+
+    for news in news_list:
+        if '_id' in news and '$oid' in news['_id']:
+            news['id'] = news['_id']['$oid']
+            del news['_id']
+
+    return news_list
+
+@metrics.timed("get_news_by_content_hash")
+def get_news_by_content_hash (content_hash):
+    # the most complete stored article with the same body fingerprint, or None
+    response = database.get("/database/getByContentHash/" + content_hash, route="/database/getByContentHash/")
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
     news = response.json()
 
     if '_id' in news and '$oid' in news['_id']:
@@ -86,12 +155,24 @@ def get_news_by_id (news_id):
 
     return news
 
-def create_news (url, title, content):
+@metrics.timed("find_near_duplicates")
+def find_near_duplicates (content, threshold, limit=1):
+    # stored articles whose body is at least `threshold` similar, most similar first
+    data = {"content": content, "threshold": threshold, "limit": limit}
+    response = database.post("/database/nearDuplicates/", json=data)
+    response.raise_for_status()
+    return response.json()
+
+@metrics.timed("create_news")
+def create_news (url, title, content, content_hash=None, results: Dict[str, Any] = None):
     
-    query_url = vars.database_url + "/database/"
     data = {"url": url, "title": title, "content": content}
+    if content_hash:
+        data["content_hash"] = content_hash
+    # results copied from a duplicate article are saved with it
+    data.update(results or {})
 
-    response = requests.post(query_url, json=data)
+    response = database.post("/database/", json=data)
     news = response.json()
     # print(response.json())
 
@@ -101,194 +182,144 @@ def create_news (url, title, content):
 
     return news
 
-def get_sentiment (text, url, title: str):
-    try:
-        query_url = vars.sentiment_url + "/sentiment/analyze_sentiment"
-        data = {"text": text}
+@metrics.timed("update_news")
+def update_news (url, fields: Dict[str, Any]):
+    # partial update of several result fields in one call
+    data = {"url": url, **fields}
 
-        response = requests.post(query_url, json=data, timeout=30)
-        sentiment = response.json()
+    response = database.put("/database/results/", json=data)
+    response.raise_for_status()
+    return response.json()
 
-        # save to db
-        db_url = vars.database_url + "/database/sentiment/"
-        data = {"url": url, "sentiment_result": sentiment["sentiment_result"]}
+# Analysis stages. Each takes the pipeline context, records its result in it
+# (the context decides when that is written to the database) and returns it.
+# Errors are raised; the pipeline substitutes the stage's fallback result.
+@metrics.timed("get_sentiment")
+def get_sentiment (ctx: PipelineContext):
+    data = {"text": ctx.text}
 
-        response = requests.put(db_url, json=data, timeout=30)
+    response = sentiment_service.post("/sentiment/analyze_sentiment", json=data, hedge=True)
+    sentiment = response.json()["sentiment_result"]
 
-        return sentiment
-    except Exception as e:
-        logger.error(f"[app] Sentiment service error: {e}")
-        return {}
+    ctx.record({"sentiment_result": sentiment})
+    return sentiment
 
-def get_emotion (text, url, title: str):
-    try:
-        query_url = vars.emotion_url + "/emotion/analyze_emotion"
-        data = {"text": text}
+@metrics.timed("get_emotion")
+def get_emotion (ctx: PipelineContext):
+    data = {"text": ctx.text}
 
-        response = requests.post(query_url, json=data, timeout=30)
-        emotion = response.json()
+    response = emotion_service.post("/emotion/analyze_emotion", json=data, hedge=True)
+    emotion = response.json()["emotion_result"]
 
-        # save to db
-        db_url = vars.database_url + "/database/emotion/"
-        data = {"url": url, "emotion_result": emotion["emotion_result"]}
-        response = requests.put(db_url, json=data, timeout=30)
+    ctx.record({"emotion_result": emotion})
+    return emotion
 
-        return emotion
-    except Exception as e:
-        logger.error(f"[app] Emotion service error: {e}")
-        return {}
+@metrics.timed("get_propaganda")
+def get_propaganda (ctx: PipelineContext):
+    data = {"text": ctx.text}
 
-def get_propaganda (text, url, title: str):
-    try:
-        query_url = vars.propaganda_url + "/propaganda/analyze_propaganda"
-        data = {"text": text}
+    response = propaganda_service.post("/propaganda/analyze_propaganda", json=data, hedge=True)
+    propaganda = response.json()["propaganda_result"]
 
-        response = requests.post(query_url, json=data, timeout=30)
-        propaganda = response.json()
+    ctx.record({"propaganda_result": propaganda})
+    return propaganda
 
-        # save to db
-        db_url = vars.database_url + "/database/propaganda/"
-        data = {"url": url, "propaganda_result": propaganda["propaganda_result"]}
-        response = requests.put(db_url, json=data, timeout=30)
-
-        return propaganda
-    except Exception as e:
-        logger.error(f"[app] Propaganda service error: {e}")
-        return {}
-
-def get_fact_check(article_content: str, url: str, title: str ):
-    query_url = vars.factcheck_url + "/factcheck/predict/fact-check"
+@metrics.timed("get_fact_check")
+def get_fact_check(ctx: PipelineContext):
     payload = {
-        "title": title, 
-        "content": article_content
+        "title": ctx.title, 
+        "content": ctx.text
     }
     
-    try:
-        response = requests.post(query_url, json=payload)
-        response_json = response.json()
-        
-        # Check if response contains the expected data
-        if "response" not in response_json:
-            # Return empty list if API keys are not configured
-            print(f"[app] Fact-check service error: {response_json}")
-            return []
-            
-        data = response_json["response"]
-        sanitized_data = sanitize_factcheck_data(data)
-    except Exception as e:
-        print(f"[app] Error calling fact-check service: {e}")
-        return []
-
-    # print ("[app] Fact check response: ", sanitized_data)
-
-    db_url = vars.database_url + "/database/factcheck/"
-    db_payload = {"url": url, "factcheck_result": sanitized_data}
+    response = factcheck_service.post("/factcheck/predict/fact-check", json=payload)
+    response_json = response.json()
     
-    # save to db
-    try:
-        response = requests.put(db_url, json=db_payload)
-    except Exception as e:
-        print(f"[app] Error saving fact-check to database: {e}")
+    # Check if response contains the expected data
+    if "response" not in response_json:
+        # Return empty list if API keys are not configured
+        print(f"[app] Fact-check service error: {response_json}")
+        return []
+        
+    data = response_json["response"]
+    sanitized_data = sanitize_factcheck_data(data)
 
+    ctx.record({"factcheck_result": sanitized_data})
     return sanitized_data
     
-def get_summarise(article_content: str, url: str, title: str) -> Dict:
-    query_url = vars.factcheck_url + "/factcheck/summarise"
+@metrics.timed("get_summarise")
+def get_summarise(ctx: PipelineContext) -> str:
     payload = {
-        "content": article_content
+        "content": ctx.text
     }
     
-    try:
-        response = requests.post(query_url, json=payload)
-        response_json = response.json()
-        
-        # Check if response contains the expected data
-        if "response" not in response_json:
-            # Return empty string if API keys are not configured
-            print(f"[app] Summarise service error: {response_json}")
-            return ""
-            
-        data = response_json["response"]
-    except Exception as e:
-        print(f"[app] Error calling summarise service: {e}")
-        return ""
+    response = factcheck_service.post("/factcheck/summarise", json=payload)
+    response_json = response.json()
     
-    db_url = vars.database_url + "/database/summarise/"
-    db_payload = {"url": url, "summarise_result": data}
-    
-    try:
-        response = requests.put(db_url, json=db_payload)
-    except Exception as e:
-        print(f"[app] Error saving summarise to database: {e}")
+    # Check if response contains the expected data
+    if "response" not in response_json:
+        # Return empty string if API keys are not configured
+        print(f"[app] Summarise service error: {response_json}")
+        return ""
+        
+    data = response_json["response"]
     
+    ctx.record({"summarise_result": data})
     return data
 
-def get_data_summary(text, url, title: str):
-    data = get_news(url)
-
-    query_url = vars.factcheck_url + "/factcheck/summarise/model-data"
+@metrics.timed("get_data_summary")
+def get_data_summary(ctx: PipelineContext):
+    # built from the results of the earlier stages, no need to re-read the article
     payload = {
-        "sentiment_result": data["sentiment_result"],
-        "emotion_result": data["emotion_result"],
-        "propaganda_result": data["propaganda_result"],
-        "summarise_result": data["summarise_result"]
+        "sentiment_result": ctx.results.get("sentiment_result"),
+        "emotion_result": ctx.results.get("emotion_result"),
+        "propaganda_result": ctx.results.get("propaganda_result"),
+        "summarise_result": ctx.results.get("summarise_result")
     }
 
-    try:
-        response = requests.post(query_url, json=payload)
-        response_json = response.json()
-        
-        # Check if response contains the expected data
-        if "response" not in response_json:
-            # Return empty string if API keys are not configured
-            print(f"[app] Data summary service error: {response_json}")
-            return ""
-            
-        data = response_json["response"]
-    except Exception as e:
-        print(f"[app] Error calling data summary service: {e}")
+    response = factcheck_service.post("/factcheck/summarise/model-data", json=payload)
+    response_json = response.json()
+    
+    # Check if response contains the expected data
+    if "response" not in response_json:
+        # Return empty string if API keys are not configured
+        print(f"[app] Data summary service error: {response_json}")
         return ""
+        
+    data = response_json["response"]
 
-    db_url = vars.database_url + "/database/ModelDataSummary/"
-    db_payload = {"url": url, "data_summary": data}
-
-    try:
-        response = requests.put(db_url, json=db_payload)
-    except Exception as e:
-        print(f"[app] Error saving data summary to database: {e}")
-
+    ctx.record({"data_summary": data})
     return data
 
+@metrics.timed("get_latest_urls")
 def get_latest_urls(max_num: int) -> Dict:
-    query_url = vars.scraper_url + "/scraper/get-latest-articles"
     payload = {
         "num_articles": max_num
     }
     
-    response = requests.get(query_url, payload)
+    response = scraper.get("/scraper/get-latest-articles", params=payload)
     deserialised_response = response.json()
     
     return deserialised_response
 
+@metrics.timed("get_all_quiz")
 def get_all_quiz(question_type: str = None) :
-    query_url = vars.database_url + "/database/quiz/getAll"
     payload = {
         "question_type": question_type
     }
     
-    response = requests.get(query_url, payload)
+    response = database.get("/database/quiz/getAll", params=payload)
     deserialised_response = response.json()
     
     return deserialised_response
 
+@metrics.timed("get_quiz")
 def get_quiz(number, question_type):
-    query_url = vars.database_url + "/database/quiz/getRandom"
     payload = {
         "number": number,
         "question_type": question_type
     }
     
-    response = requests.get(query_url, payload)
+    response = database.get("/database/quiz/getRandom", params=payload)
     deserialised_response = response.json()
     
     return deserialised_response
\ No newline at end of file
@@ -0,0 +1,74 @@
+from functools import wraps
+from typing import Callable
+
+from prometheus_client import Counter, Gauge, Histogram
+
+import time
+
+# Seconds; analysis calls range from a few ms (database) to minutes (LLM fact check)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# ------------------------ PIPELINE ----------------------- #
+stage_latency = Histogram(
+    "pipeline_stage_duration_seconds", "Wall-clock time of one analysis stage",
+    ["stage"], buckets=LATENCY_BUCKETS)
+stage_failures = Counter(
+    "pipeline_stage_failures_total", "Analysis stages that raised or were skipped",
+    ["stage", "reason"])
+analysis_latency = Histogram(
+    "pipeline_analysis_duration_seconds", "Wall-clock time of a whole article analysis",
+    buckets=LATENCY_BUCKETS)
+analyses_in_flight = Gauge(
+    "pipeline_analyses_in_flight", "Article analyses running in this process")
+
+reused_analyses = Counter(
+    "pipeline_reused_analyses_total", "New articles whose results were copied from a duplicate",
+    ["match"])
+
+# ------------------------ METHODS ----------------------- #
+call_latency = Histogram(
+    "method_call_duration_seconds", "Time spent in one call to a downstream operation (methods.*)",
+    ["method"], buckets=LATENCY_BUCKETS)
+call_errors = Counter(
+    "method_call_errors_total", "Calls to a downstream operation (methods.*) that raised",
+    ["method"])
+
+# ------------------------ DOWNSTREAM HTTP ----------------------- #
+downstream_requests = Counter(
+    "downstream_requests_total", "HTTP requests sent to a downstream service",
+    ["service", "method"])
+downstream_errors = Counter(
+    "downstream_errors_total", "HTTP requests to a downstream service that failed",
+    ["service", "kind"])
+downstream_hedges = Counter(
+    "downstream_hedged_requests_total", "Backup requests sent to a second replica after the p95",
+    ["service"])
+downstream_latency = Histogram(
+    "downstream_request_duration_seconds", "HTTP request time per downstream service",
+    ["service"], buckets=LATENCY_BUCKETS)
+
+# ------------------------ QUEUES, STREAMS AND CACHES ----------------------- #
+# Set to callbacks by app.py once the objects they read exist
+queue_depth = Gauge("job_queue_depth", "Analysis jobs waiting for a worker")
+queue_running = Gauge("job_queue_running", "Analysis jobs being run, across processes")
+inflight_urls = Gauge("inflight_urls", "URLs being processed, shared between duplicate requests")
+sse_streams = Gauge("sse_streams", "Open SSE streams")
+sse_topics = Gauge("sse_topics", "News ids with a live stream topic")
+cache_hit_ratio = Gauge("cache_hit_ratio", "Hits over lookups since start", ["cache"])
+
+
+def timed(method: str) -> Callable:
+    """Decorator recording the latency of every call, and the ones that raise."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                call_errors.labels(method).inc()
+                raise
+            finally:
+                call_latency.labels(method).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import threading
+import time
+
+# Fields written by the analysis stages. Once all are filled in the article no
+# longer changes and can be cached for the full TTL.
+RESULT_FIELDS = (
+    "sentiment_result", "emotion_result", "propaganda_result",
+    "factcheck_result", "summarise_result", "data_summary",
+)
+
+
+def is_complete(news: Dict[str, Any]) -> bool:
+    # None means not computed; an empty result (e.g. a fact check with no claims) is a result
+    return all(news.get(field) is not None for field in RESULT_FIELDS)
+
+
+class NewsCache:
+    """
+    LRU + TTL read-through cache of news documents, keyed by id with a
+    secondary index on (canonical) URL.
+
+    Completed articles are effectively immutable and are kept for `ttl`
+    seconds. Articles still being analysed (`is_pending(news_id)`, e.g. a job
+    queued for them) are only kept for `partial_ttl` seconds, since another
+    worker process may be writing their results; within this process every
+    stage write invalidates them explicitly. Articles missing results that
+    nothing is computing, e.g. the stages a prescrape left out, are kept for
+    `ttl` too, but every `partial_ttl` seconds a hit re-checks `is_pending`
+    in case another process started computing them.
+    """
+    def __init__(self, max_size: int = 1000, ttl: float = 3600, partial_ttl: float = 5,
+                 is_pending: Callable[[str], bool] = lambda news_id: False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.partial_ttl = partial_ttl
+        self.is_pending = is_pending
+
+        # id -> (expires_at, news, recheck_at); recheck_at is None for complete articles
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._ids_by_url: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, news_id: Optional[str]):
+        """The cached article, and whether the caller must re-check `is_pending` for it."""
+        entry = self._entries.get(news_id) if news_id else None
+        if entry is None:
+            return None, False
+        expires_at, news, recheck_at = entry
+        now = time.monotonic()
+        if expires_at < now:
+            self._remove(news_id)
+            return None, False
+        self._entries.move_to_end(news_id)
+        if recheck_at is not None and recheck_at < now:
+            # Only one caller re-checks per interval
+            self._entries[news_id] = (expires_at, news, now + self.partial_ttl)
+            return news, True
+        return news, False
+
+    def _fresh(self, news: Optional[Dict[str, Any]], recheck: bool) -> Optional[Dict[str, Any]]:
+        if news is None or not recheck or not self.is_pending(news["id"]):
+            return news
+        self.invalidate(news_id=news["id"])
+        return None
+
+    def _remove(self, news_id: str):
+        _, news, _ = self._entries.pop(news_id)
+        if self._ids_by_url.get(news.get("url")) == news_id:
+            del self._ids_by_url[news["url"]]
+
+    def put(self, news: Dict[str, Any]):
+        news_id = news.get("id") if isinstance(news, dict) else None
+        if not news_id:
+            return
+        now = time.monotonic()
+        if is_complete(news):
+            ttl, recheck_at = self.ttl, None
+        elif self.is_pending(news_id):
+            ttl, recheck_at = self.partial_ttl, None
+        else:
+            ttl, recheck_at = self.ttl, now + self.partial_ttl
+        with self._lock:
+            if news_id in self._entries:
+                self._remove(news_id)
+            self._entries[news_id] = (now + ttl, news, recheck_at)
+            if news.get("url"):
+                self._ids_by_url[news["url"]] = news_id
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_by_id(self, news_id: str, loader: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            news, recheck = self._lookup(news_id)
+        news = self._fresh(news, recheck)
+        with self._lock:
+            if news is not None:
+                self.hits += 1
+                return news
+            self.misses += 1
+        news = loader(news_id)
+        self.put(news)
+        return news
+
+    def get_by_url(self, url: str, loader: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            news, recheck = self._lookup(self._ids_by_url.get(url))
+        news = self._fresh(news, recheck)
+        with self._lock:
+            if news is not None:
+                self.hits += 1
+                return news
+            self.misses += 1
+        news = loader(url)
+        self.put(news)
+        return news
+
+    def invalidate(self, news_id: Optional[str] = None, url: Optional[str] = None):
+        with self._lock:
+            news_id = news_id or self._ids_by_url.get(url)
+            if news_id in self._entries:
+                self._remove(news_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ids_by_url.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    A single node of the analysis graph.
+
+    `func` is called with the arguments passed to `run_stages`, once every
+    stage named in `depends_on` has finished successfully. If it raises and
+    the stage has a `fallback`, `fallback()` becomes its result instead and
+    the stage is reported as degraded rather than failed.
+    """
+    name: str
+    func: Callable[..., Any]
+    depends_on: Tuple[str, ...] = ()
+    fallback: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class PipelineReport:
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    degraded: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    total_time: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.skipped
+
+
+class PipelineContext:
+    """
+    In-memory state of one article's analysis, passed to every stage.
+
+    Stages `record` the fields they produce; later stages read them from
+    `results` instead of re-fetching the article. Recorded fields are
+    written through `writer(url, fields)` straight away when
+    `flush_each_stage` is set, otherwise they are coalesced into a single
+    write by `flush()` at the end of the run.
+    """
+
+    def __init__(self, url: str, title: str, text: str, news_id: str = None,
+                 writer: Callable[[str, Dict[str, Any]], Any] = None,
+                 flush_each_stage: bool = True, results: Dict[str, Any] = None):
+        self.url = url
+        self.title = title
+        self.text = text
+        self.news_id = news_id
+        self.writer = writer
+        self.flush_each_stage = flush_each_stage
+        self.results: Dict[str, Any] = dict(results or {})
+        self._pending: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def record(self, fields: Dict[str, Any]):
+        with self._lock:
+            self.results.update(fields)
+            self._pending.update(fields)
+        if self.flush_each_stage:
+            self.flush()
+
+    def flush(self):
+        """Writes every recorded field not yet persisted, in one call."""
+        with self._lock:
+            fields, self._pending = self._pending, {}
+        if fields and self.writer:
+            try:
+                self.writer(self.url, fields)
+            except Exception:
+                with self._lock:
+                    # Keep them for the next flush; newer values win
+                    self._pending = {**fields, **self._pending}
+                raise
+
+
+def _validate(stages: List[Stage]):
+    names = [stage.name for stage in stages]
+    if len(names) != len(set(names)):
+        raise ValueError("Stage names must be unique")
+
+    known = set(names)
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in known]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    # Kahn's algorithm, only to reject cycles before anything is submitted
+    remaining = {stage.name: set(stage.depends_on) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Stage graph has a cycle between: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def select_stages(stages: List[Stage], names) -> List[Stage]:
+    """
+    The stages named in `names` plus everything they (transitively) depend
+    on, in their original order. Raises ValueError for unknown names.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown}")
+
+    selected = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(by_name[name].depends_on)
+    return [stage for stage in stages if stage.name in selected]
+
+
+def _timed_call(func, args):
+    start = time.perf_counter()
+    try:
+        return True, func(*args), time.perf_counter() - start
+    except Exception as e:
+        return False, e, time.perf_counter() - start
+
+
+def run_stages(stages: List[Stage], *args, max_workers: int = None,
+               on_complete: Callable[[str, Any], None] = None,
+               completed: Dict[str, Any] = None) -> PipelineReport:
+    """
+    Runs `stages` concurrently, respecting their dependencies.
+
+    A failing stage does not stop independent branches: only the stages that
+    (transitively) depend on it are skipped, unless it has a fallback.
+    Per-stage wall-clock timings are recorded in the returned report.
+    `on_complete(name, result)` is called as each stage succeeds, before its
+    dependents are started; fallback results are not passed to it.
+
+    `completed` maps stages already done (e.g. by an earlier, interrupted run)
+    to their results: they are not run again and count as satisfied
+    dependencies.
+    """
+    _validate(stages)
+
+    report = PipelineReport()
+    report.results.update(completed or {})
+    pending = {stage.name: stage for stage in stages if stage.name not in report.results}
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1,
+                            thread_name_prefix="pipeline") as pool:
+
+        def schedule_ready():
+            changed = True
+            while changed:
+                changed = False
+                for name, stage in list(pending.items()):
+                    failed = [dep for dep in stage.depends_on
+                              if dep in report.errors or dep in report.skipped]
+                    if failed:
+                        logger.warning(f"Skipping {name}: dependency failed ({', '.join(failed)})")
+                        report.skipped.append(name)
+                        del pending[name]
+                        changed = True
+                    elif all(dep in report.results for dep in stage.depends_on):
+                        del pending[name]
+                        running[pool.submit(_timed_call, stage.func, args)] = stage
+
+        schedule_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                ok, value, elapsed = future.result()
+                report.timings[stage.name] = elapsed
+                if ok:
+                    report.results[stage.name] = value
+                    if on_complete:
+                        try:
+                            on_complete(stage.name, value)
+                        except Exception as e:
+                            logger.error(f"on_complete hook failed for {stage.name}: {e}")
+                elif stage.fallback is not None:
+                    logger.error(f"Stage {stage.name} failed after {elapsed:.2f}s, using its fallback: {value}")
+                    report.degraded[stage.name] = str(value)
+                    report.results[stage.name] = stage.fallback()
+                else:
+                    logger.error(f"Stage {stage.name} failed after {elapsed:.2f}s: {value}")
+                    report.errors[stage.name] = str(value)
+            schedule_ready()
+
+    report.total_time = time.perf_counter() - start
+    return report
@@ -0,0 +1,220 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process runs as its own leader
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# What `process(url)` reports for a URL; anything falsy is a failure, retried next cycle
+CREATED = "created"  # saved by this call
+EXISTING = "existing"  # already in the database, e.g. a user submitted it first
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of seen URLs, persisted to a local file.
+
+    Sized for `capacity` entries at `error_rate` false positives. A false
+    positive only means a new article is skipped by the prescrape (a user can
+    still submit it); once the filter holds `capacity` entries it is cleared
+    rather than letting the error rate grow.
+    """
+    _HEADER = struct.Struct("<QQQ")  # bits, hashes, count
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        with self._lock:
+            if self.count >= self.capacity:
+                logger.info("Seen-URL filter is full, clearing it")
+                self._bits = bytearray(len(self._bits))
+                self.count = 0
+            for pos in self._positions(item):
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        with self._lock:
+            return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(self._HEADER.pack(self.num_bits, self.num_hashes, self.count))
+                f.write(self._bits)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Loads a saved filter with the same sizing. Returns False if there is none."""
+        try:
+            with open(path, "rb") as f:
+                num_bits, num_hashes, count = self._HEADER.unpack(f.read(self._HEADER.size))
+                bits = f.read()
+        except (OSError, struct.error):
+            return False
+        if num_bits != self.num_bits or num_hashes != self.num_hashes or len(bits) != len(self._bits):
+            logger.warning(f"Ignoring seen-URL filter at {path}: it was built with different sizing")
+            return False
+        with self._lock:
+            self._bits = bytearray(bits)
+            self.count = count
+        return True
+
+
+class PrescrapeScheduler:
+    """
+    Periodically fetches the latest article URLs and hands the unseen ones to
+    `process(url)`.
+
+    - Only the process holding an exclusive lock on `lock_path` runs cycles,
+      so several uvicorn workers do not repeat the same work. The others
+      retry the lock every `leader_retry` seconds and take over if the
+      leader dies. Without `fcntl` (Windows) there is no lock and each
+      process is its own leader, so run a single worker there.
+    - URLs already handled are remembered in a Bloom filter saved at
+      `seen_path` and skipped without any network call.
+    - Providers are processed in parallel, at most `parallelism` at a time.
+    - The sleep between cycles halves when a cycle found many new articles
+      and doubles when it found none, within [min_interval, max_interval].
+
+    `process(url)` returns `CREATED` when it saved the article and `EXISTING`
+    when the database already had it; both are remembered, but only created
+    articles count towards the cycle's new articles. Other URLs are retried
+    next cycle.
+    """
+
+    def __init__(self, fetch_latest: Callable[[int], Dict[str, List[str]]],
+                 process: Callable[[str], bool],
+                 canonicalize: Callable[[str], str] = lambda url: url,
+                 lock_path: str = "prescrape.lock", seen_path: str = "prescrape_seen.bin",
+                 num_articles: int = 10, parallelism: int = 2,
+                 interval: float = 30 * 60, min_interval: float = 5 * 60, max_interval: float = 120 * 60,
+                 seen_capacity: int = 100000, leader_retry: float = 60):
+        self.fetch_latest = fetch_latest
+        self.process = process
+        self.canonicalize = canonicalize
+        self.lock_path = lock_path
+        self.seen_path = seen_path
+        self.num_articles = num_articles
+        self.parallelism = parallelism
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = interval
+        self.leader_retry = leader_retry
+
+        self.seen = BloomFilter(capacity=seen_capacity)
+        self._lock_file = None
+
+    # ------------------------ LEADER ELECTION ----------------------- #
+    def try_become_leader(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+
+        if self.seen.load(self.seen_path):
+            logger.info(f"Loaded seen-URL filter with {self.seen.count} URLs")
+        logger.info(f"Process {os.getpid()} is the prescrape leader")
+        return True
+
+    def release(self):
+        if self._lock_file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    # ------------------------ CYCLES ----------------------- #
+    def _process_provider(self, provider: str, urls: List[str]) -> int:
+        new_count = 0
+        skipped = 0
+        for url in urls:
+            try:
+                key = self.canonicalize(url)
+                if key in self.seen:
+                    skipped += 1
+                    continue
+                outcome = self.process(url)
+                if outcome in (CREATED, EXISTING):
+                    self.seen.add(key)
+                if outcome == CREATED:
+                    new_count += 1
+                elif outcome == EXISTING:
+                    skipped += 1
+            except Exception as e:
+                logger.error(f"Failed to process URL {url}: {e}")
+        logger.info(f"Prescrape {provider}: {new_count} processed, {skipped} already seen or stored")
+        return new_count
+
+    def run_cycle(self) -> int:
+        """Runs one prescrape pass and returns the number of articles it created."""
+        article_dict = self.fetch_latest(self.num_articles)
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="prescrape") as pool:
+            counts = pool.map(lambda item: self._process_provider(*item), article_dict.items())
+            new_count = sum(counts)
+        try:
+            self.seen.save(self.seen_path)
+        except OSError as e:
+            logger.error(f"Failed to save seen-URL filter: {e}")
+        return new_count
+
+    def next_interval(self, new_count: int) -> float:
+        if new_count == 0:
+            self.interval = min(self.max_interval, self.interval * 2)
+        elif new_count >= max(1, self.num_articles // 2):
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = self.base_interval
+        return self.interval
+
+    def run_forever(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if not self.try_become_leader():
+                stop.wait(self.leader_retry)
+                continue
+            try:
+                logger.info("Fetching latest URLs from CNA and Straits Times...")
+                new_count = self.run_cycle()
+            except Exception as e:
+                logger.error(f"Failed to process latest articles: {e}")
+                new_count = 0
+            interval = self.next_interval(new_count)
+            logger.info(f"Prescrape found {new_count} new articles, next run in {interval / 60:.0f} minutes")
+            stop.wait(interval)
+        self.release()
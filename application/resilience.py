@@ -0,0 +1,140 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import logging
+import math
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a service whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one downstream service.
+
+    - closed: requests go through; `failure_threshold` failures in a row open it.
+    - open: requests fail fast with `CircuitOpenError` for `reset_timeout` seconds.
+    - half_open: one probe request is let through; its outcome closes or
+      re-opens the breaker. Other requests keep failing fast meanwhile.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Raises `CircuitOpenError` unless a request may be sent now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info(f"Circuit for {self.name} half-open, sending a probe request")
+                return
+        raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_neutral(self):
+        """
+        Ends a request whose outcome says nothing about health, e.g. a 503 a
+        busy replica answers to shed load: the state is kept, and a probe slot
+        is freed for the next request.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "open_for": time.monotonic() - self._opened_at if self._state == self.OPEN else 0.0,
+            }
+
+
+class AdaptiveTimeout:
+    """
+    Read timeout derived from the p99 of the last `window` request latencies:
+    `multiplier * p99`, kept within [min_timeout, max_timeout]. Until
+    `min_samples` requests have been seen, `max_timeout` is used.
+
+    Requests that time out are recorded at the timeout they had, so when a
+    service slows down for good the p99, and the timeout, grow back towards
+    `max_timeout` instead of cutting every request short.
+    """
+
+    def __init__(self, max_timeout: float, min_timeout: float = 1.0, multiplier: float = 2.0,
+                 window: int = 200, min_samples: int = 20):
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed: float):
+        with self._lock:
+            self._samples.append(elapsed)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The `q` quantile (0-1) of the recent latencies, or None without enough samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+    def p99(self) -> Optional[float]:
+        return self.percentile(0.99)
+
+    def current(self) -> float:
+        p99 = self.p99()
+        if p99 is None:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p99 * self.multiplier))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"p99": self.p99(), "read_timeout": self.current()}
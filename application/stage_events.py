@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StageEventLog:
+    """
+    Short-lived log of completed analysis stages, shared by the worker
+    processes through a SQLite file.
+
+    The process running an analysis publishes each stage result to its own
+    stream hub directly; SSE clients connected to another worker process
+    learn about it by tailing this log. Rows older than `retention` seconds
+    are pruned, the log is not a record of results.
+    """
+
+    def __init__(self, db_path: str, retention: float = 600):
+        self.db_path = db_path
+        self.retention = retention
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    news_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    fields TEXT NOT NULL,
+                    origin TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def append(self, news_id: str, stage: str, fields: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO stage_events (news_id, stage, fields, origin, created_at) VALUES (?, ?, ?, ?, ?)",
+                (news_id, stage, json.dumps(fields), self.origin, time.time())
+            )
+
+    def latest_id(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM stage_events").fetchone()[0]
+
+    def read_since(self, last_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """Events after `last_id`, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM stage_events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+            ).fetchall()
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["fields"] = json.loads(event["fields"])
+            events.append(event)
+        return events
+
+    def prune(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM stage_events WHERE created_at < ?", (time.time() - self.retention,))
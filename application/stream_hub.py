@@ -0,0 +1,240 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def _pointer(key: str) -> str:
+    return "/" + key.replace("~", "~0").replace("/", "~1")
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Top-level JSON-patch (RFC 6902) operations turning `old` into `new`.
+    News documents are flat apart from the result objects, and a stage always
+    replaces its whole result, so top-level operations are enough.
+    """
+    ops = []
+    for key, value in new.items():
+        if key not in old:
+            ops.append({"op": "add", "path": _pointer(key), "value": value})
+        elif old[key] != value:
+            ops.append({"op": "replace", "path": _pointer(key), "value": value})
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": _pointer(key)})
+    return ops
+
+
+class _Topic:
+    def __init__(self, history_size: int):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.snapshot: Optional[Dict[str, Any]] = None
+        # Fields published by the orchestrator that the database has not caught up with yet
+        self.published: Dict[str, Any] = {}
+        self.history: Deque[Tuple[int, List[Dict[str, Any]]]] = deque(maxlen=history_size)
+        self.subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self.poller: Optional[asyncio.Task] = None
+        self.idle_since: Optional[float] = None
+
+
+@dataclass
+class Subscription:
+    """
+    What a new SSE client needs to start streaming: its queue of
+    `(version, patch, stage)` updates (`stage` names the analysis stage that
+    produced the update, or is None), and either the full `snapshot` or, when
+    it resumed from a known event id, the `backlog` of patches it missed.
+    If the article could not be loaded yet, `snapshot` is None and the first
+    update carries the whole document as `patch` (a dict, not a list).
+    """
+    queue: asyncio.Queue
+    epoch: str
+    version: int
+    snapshot: Optional[Dict[str, Any]]
+    backlog: Optional[List[Tuple[int, List[Dict[str, Any]]]]]
+
+    def event_id(self, version: int) -> str:
+        return f"{self.epoch}-{version}"
+
+
+class StreamHub:
+    """
+    Fans out news document updates to every SSE client watching the same id.
+
+    There is one topic per news id with the latest known snapshot, a version
+    counter and the last few patches. The orchestrator pushes stage results
+    with `publish` (from any thread) and each subscriber queue receives the
+    resulting patch. A single poller per topic re-reads the document from the
+    database every `poll_interval` seconds as a fallback, e.g. when another
+    worker process is running the analysis. However many clients watch an
+    article, it costs one poll. A polled document only adds to the snapshot:
+    with PIPELINE_FLUSH=end stage results are published before they are
+    saved, so the database row can be older than what the clients show.
+
+    A topic outlives its last subscriber by `resume_window` seconds so that a
+    reconnecting client can resume from its `Last-Event-ID`.
+    """
+
+    def __init__(self, loader: Callable[[str], Dict[str, Any]], poll_interval: float = 10,
+                 history_size: int = 32, resume_window: float = 60):
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.history_size = history_size
+        self.resume_window = resume_window
+        self._topics: Dict[str, _Topic] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------ SUBSCRIBERS ----------------------- #
+    async def subscribe(self, news_id: str, last_event_id: Optional[str] = None) -> Subscription:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._prune()
+            topic = self._topics.setdefault(news_id, _Topic(self.history_size))
+            # Nobody kept an idle topic up to date, so re-read it first
+            needs_load = topic.snapshot is None or topic.poller is None
+
+        news = await asyncio.to_thread(self._load, news_id) if needs_load else None
+
+        with self._lock:
+            # The topic may have been pruned, or replaced, while loading
+            topic = self._topics.setdefault(news_id, topic)
+            if news:
+                self._merge_loaded(topic, news)
+            topic.subscribers.add((loop, queue))
+            topic.idle_since = None
+            if topic.poller is None:
+                topic.poller = loop.create_task(self._poll(news_id, topic))
+
+            return Subscription(
+                queue=queue,
+                epoch=topic.epoch,
+                version=topic.version,
+                snapshot=topic.snapshot,
+                backlog=self._backlog(topic, last_event_id),
+            )
+
+    def unsubscribe(self, news_id: str, queue: asyncio.Queue):
+        with self._lock:
+            topic = self._topics.get(news_id)
+            if topic is None:
+                return
+            topic.subscribers = {sub for sub in topic.subscribers if sub[1] is not queue}
+            if not topic.subscribers:
+                if topic.poller is not None:
+                    topic.poller.cancel()
+                    topic.poller = None
+                topic.idle_since = time.monotonic()
+            self._prune()
+
+    def _backlog(self, topic: _Topic, last_event_id: Optional[str]):
+        """Patches after `last_event_id`, or None if the client needs a snapshot."""
+        if not last_event_id or topic.snapshot is None:
+            return None
+        epoch, _, version = last_event_id.partition("-")
+        if epoch != topic.epoch or not version.isdigit():
+            return None
+        version = int(version)
+        if version > topic.version:
+            return None
+        missed = [(v, patch) for v, patch in topic.history if v > version]
+        if len(missed) != topic.version - version:
+            return None  # part of it already fell out of the history
+        return missed
+
+    def _prune(self):
+        now = time.monotonic()
+        for news_id, topic in list(self._topics.items()):
+            if not topic.subscribers and topic.idle_since is not None \
+                    and now - topic.idle_since > self.resume_window:
+                del self._topics[news_id]
+
+    # ------------------------ PUBLISHERS ----------------------- #
+    def publish(self, news_id: Optional[str], fields: Dict[str, Any], stage: Optional[str] = None):
+        """
+        Merges `fields`, e.g. the result of analysis `stage`, into the snapshot
+        of `news_id` and notifies its subscribers. Does nothing when nobody is
+        watching the article.
+        """
+        if not news_id or not fields:
+            return
+        with self._lock:
+            topic = self._topics.get(news_id)
+            if topic is None or topic.snapshot is None:
+                return
+            topic.published.update(fields)
+            self._set_snapshot(topic, {**topic.snapshot, **fields}, stage)
+
+    def update(self, news_id: str, news: Dict[str, Any]):
+        """Merges a freshly loaded `news` document into the snapshot of `news_id`."""
+        if not news:
+            return
+        with self._lock:
+            topic = self._topics.get(news_id)
+            if topic is not None:
+                self._merge_loaded(topic, news)
+
+    def _merge_loaded(self, topic: _Topic, news: Dict[str, Any]):
+        # Published fields win until the database holds the same value; no field is ever dropped
+        for key, value in list(topic.published.items()):
+            if news.get(key) == value:
+                del topic.published[key]
+        if topic.snapshot is None:
+            self._set_snapshot(topic, news)
+        else:
+            self._set_snapshot(topic, {**topic.snapshot, **news, **topic.published})
+
+    def _set_snapshot(self, topic: _Topic, news: Dict[str, Any], stage: Optional[str] = None):
+        if topic.snapshot is None:
+            # Subscribers already waiting (the first load failed) get the whole document
+            topic.snapshot = news
+            topic.version += 1
+            self._notify(topic, news, stage)
+            return
+        patch = diff(topic.snapshot, news)
+        if not patch:
+            return
+        topic.snapshot = news
+        topic.version += 1
+        topic.history.append((topic.version, patch))
+        self._notify(topic, patch, stage)
+
+    def _notify(self, topic: _Topic, update: Any, stage: Optional[str]):
+        for loop, queue in topic.subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (topic.version, update, stage))
+            except RuntimeError:
+                # The subscriber's loop is closed; it is removed on unsubscribe
+                pass
+
+    # ------------------------ FALLBACK POLLING ----------------------- #
+    def _load(self, news_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.loader(news_id)
+        except Exception as e:
+            logger.error(f"Failed to load news {news_id} for streaming: {e}")
+            return None
+
+    async def _poll(self, news_id: str, topic: _Topic):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            news = await asyncio.to_thread(self._load, news_id)
+            if self._topics.get(news_id) is not topic or topic.poller is None:
+                return
+            self.update(news_id, news)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "subscribers": sum(len(topic.subscribers) for topic in self._topics.values()),
+            }
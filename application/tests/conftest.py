@@ -0,0 +1,12 @@
+import os
+import shutil
+import tempfile
+
+# app.py opens its job queue and stage event log at import time. Point them at a
+# throwaway file, not the jobs.db the dev server (testing.sh) uses in this directory.
+_job_dir = tempfile.mkdtemp(prefix="application-tests-")
+os.environ["JOB_DB_PATH"] = os.path.join(_job_dir, "jobs.db")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_job_dir, ignore_errors=True)
@@ -1,15 +1,33 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
 from app import app
 from api_models import URLwithBG
+import pipeline
+import job_queue
+import time
+import threading
+import requests
+import http_client
+import canonical
+import news_cache
+import stream_hub
+import asyncio
 import json
+import prescrape
+import resilience
+import stage_events
+import fingerprint
+import sqlite3
 
 client = TestClient(app)
 
 @pytest.fixture
 def mock_methods():
     with patch("app.methods") as mock:
+        mock.get_news_by_content_hash.return_value = None  # no stored duplicate
+        mock.find_near_duplicates.return_value = []
         yield mock
 
 def test_health_check():
@@ -60,3 +78,910 @@ def test_stream_news(mock_methods):
         response = client.get("/application/stream_news?news_id=test_id")
         assert response.status_code == 200
         assert response.headers["content-type"] == "application/json"
+
+def test_run_stages_respects_dependencies():
+    order = []
+
+    def record(name):
+        def stage(*args):
+            order.append(name)
+            return name
+        return stage
+
+    report = pipeline.run_stages([
+        pipeline.Stage("summary", record("summary"), depends_on=("a", "b")),
+        pipeline.Stage("a", record("a")),
+        pipeline.Stage("b", record("b")),
+    ], "text", "url", "title")
+
+    assert report.ok
+    assert order[-1] == "summary"
+    assert set(report.timings) == {"a", "b", "summary"}
+
+def test_run_stages_isolates_failures():
+    def boom(*args):
+        raise RuntimeError("service down")
+
+    report = pipeline.run_stages([
+        pipeline.Stage("a", boom),
+        pipeline.Stage("b", lambda *args: "ok"),
+        pipeline.Stage("summary", lambda *args: "done", depends_on=("a", "b")),
+    ])
+
+    assert report.results == {"b": "ok"}
+    assert report.errors == {"a": "service down"}
+    assert report.skipped == ["summary"]
+
+def test_run_stages_rejects_cycles():
+    with pytest.raises(ValueError):
+        pipeline.run_stages([
+            pipeline.Stage("a", lambda: None, depends_on=("b",)),
+            pipeline.Stage("b", lambda: None, depends_on=("a",)),
+        ])
+
+def test_new_query_queue_full(mock_methods):
+    mock_methods.check_exists.return_value = {"exists": False}
+    with patch("app.jobs.has_capacity", return_value=False):
+        response = client.post("/application/new_query", json={"url": "test_url", "background": True})
+    assert response.status_code == 429
+    mock_methods.extract_news.assert_not_called()
+
+def test_get_job_not_found():
+    response = client.get("/application/jobs/does_not_exist")
+    assert response.status_code == 404
+
+def test_job_queue_survives_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+
+    before_restart = job_queue.JobQueue(db_path, workers=0, max_depth=1)
+    before_restart.register("echo", lambda payload: payload)
+    before_restart.submit("echo", {"n": 1}, job_id="job1")
+    with pytest.raises(job_queue.QueueFull):
+        before_restart.submit("echo", {"n": 2})
+
+    after_restart = job_queue.JobQueue(db_path, workers=1)
+    after_restart.register("echo", lambda payload: payload)
+    after_restart.start()
+    try:
+        for _ in range(50):
+            if after_restart.get("job1")["status"] == "done":
+                break
+            time.sleep(0.1)
+        assert after_restart.get("job1")["result"] == {"n": 1}
+    finally:
+        after_restart.stop()
+
+def test_process_url_single_flight(mock_methods):
+    import app as app_module
+    release = threading.Event()
+
+    def slow_extract(url):
+        release.wait(5)
+        return {"body": "test_content", "headline": "test_title"}
+
+    mock_methods.check_exists.return_value = {"exists": False}
+    mock_methods.extract_news.side_effect = slow_extract
+    mock_methods.create_news.return_value = {"id": "new_id"}
+
+    results = []
+    with patch("app.jobs.submit") as mock_submit:
+        callers = [threading.Thread(target=lambda: results.append(app_module.process_url("test_url", return_news=True)))
+                   for _ in range(3)]
+        for caller in callers:
+            caller.start()
+        while app_module.inflight_requests.active() == 0:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        release.set()
+        for caller in callers:
+            caller.join(5)
+
+    assert results == [{"id": "new_id"}] * 3
+    assert mock_methods.extract_news.call_count == 1
+    assert mock_submit.call_count == 1
+    assert app_module.inflight_requests.active() == 0
+
+def test_http_status_reports_pools():
+    response = client.get("/application/status/http")
+    assert response.status_code == 200
+    stats = response.json()
+    assert set(stats) >= {"database", "scraper", "sentiment", "emotion", "propaganda", "factcheck"}
+    assert stats["database"]["pool_size"] == 20
+    assert stats["database"]["in_flight"] == 0
+
+def test_service_client_counts_errors():
+    service = http_client.ServiceClient("down", "http://127.0.0.1:9", connect_timeout=0.5, read_timeout=0.5)
+    with pytest.raises(requests.RequestException):
+        service.get("/")
+    stats = service.stats()
+    assert stats["requests"] == 1
+    assert stats["errors"] == 1
+    assert stats["in_flight"] == 0
+
+@pytest.mark.parametrize("raw, expected", [
+    ("https://www.straitstimes.com/singapore/some-story?utm_source=telegram&utm_medium=social#comments",
+     "https://www.straitstimes.com/singapore/some-story"),
+    ("http://straitstimes.com/singapore/some-story/", "https://www.straitstimes.com/singapore/some-story"),
+    ("https://m.channelnewsasia.com/singapore/some-story-4821234?cid=telegram_cna_social",
+     "https://www.channelnewsasia.com/singapore/some-story-4821234"),
+    ("https://www.channelnewsasia.com/amp/singapore/some-story-4821234",
+     "https://www.channelnewsasia.com/singapore/some-story-4821234"),
+    ("https://Example.com:443/news/story/?b=2&fbclid=abc&a=1", "https://example.com/news/story?a=1&b=2"),
+])
+def test_canonicalize(raw, expected):
+    assert canonical.canonicalize(raw) == expected
+
+def test_canonical_url_resolves_shortener_once():
+    cache = canonical.RedirectCache()
+    response = MagicMock(status_code=200, url="https://www.straitstimes.com/singapore/some-story?utm_source=x")
+    with patch.object(cache.session, "head", return_value=response) as mock_head, \
+         patch("canonical.redirects", cache):
+        assert canonical.canonical_url("https://t.co/abc") == "https://www.straitstimes.com/singapore/some-story"
+        assert canonical.canonical_url("https://t.co/abc") == "https://www.straitstimes.com/singapore/some-story"
+    assert mock_head.call_count == 1
+
+def test_news_cache_read_through_and_invalidate():
+    cache = news_cache.NewsCache(max_size=2)
+    loader = MagicMock(return_value={"id": "id1", "url": "https://example.com/a"})
+
+    assert cache.get_by_id("id1", loader)["url"] == "https://example.com/a"
+    assert cache.get_by_url("https://example.com/a", loader)["id"] == "id1"
+    assert loader.call_count == 1
+
+    cache.invalidate(url="https://example.com/a")
+    cache.get_by_id("id1", loader)
+    assert loader.call_count == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_news_cache_evicts_least_recently_used():
+    cache = news_cache.NewsCache(max_size=2)
+    for news_id in ("a", "b", "c"):
+        cache.put({"id": news_id, "url": news_id})
+    assert cache.stats()["evictions"] == 1
+
+    loader = MagicMock(return_value={"id": "a"})
+    cache.get_by_id("a", loader)
+    assert loader.called
+
+def test_news_cache_keeps_settled_partial_articles():
+    pending = set()
+    cache = news_cache.NewsCache(ttl=3600, partial_ttl=0.05, is_pending=lambda news_id: news_id in pending)
+    # A prescraped article: fact check found no claims, data summary left for later
+    prescraped = {"id": "p1", **{field: {"x": 1} for field in news_cache.RESULT_FIELDS},
+                  "factcheck_result": [], "data_summary": None}
+    loader = MagicMock(return_value=prescraped)
+
+    cache.get_by_id("p1", loader)
+    time.sleep(0.1)
+    cache.get_by_id("p1", loader)
+    assert loader.call_count == 1  # nothing is computing the rest, so it stays cached
+
+    # Another process starts computing the data summary: the next re-check drops it
+    pending.add("p1")
+    time.sleep(0.1)
+    cache.get_by_id("p1", loader)
+    assert loader.call_count == 2
+    assert news_cache.is_complete({**prescraped, "data_summary": "summary"})
+
+def test_cache_status():
+    response = client.get("/application/status/cache")
+    assert response.status_code == 200
+    assert set(response.json()) >= {"hits", "misses", "evictions", "hit_ratio"}
+
+def test_stream_hub_shares_one_load_between_subscribers():
+    loader = MagicMock(return_value={"id": "id1", "sentiment_result": None})
+    hub = stream_hub.StreamHub(loader, poll_interval=60, resume_window=0)
+
+    async def scenario():
+        first = await hub.subscribe("id1")
+        second = await hub.subscribe("id1")
+        assert first.snapshot == {"id": "id1", "sentiment_result": None}
+
+        publisher = threading.Thread(target=hub.publish, args=("id1", {"sentiment_result": {"positive": 1.0}}))
+        publisher.start()
+        publisher.join()
+
+        updates = [await asyncio.wait_for(sub.queue.get(), 1) for sub in (first, second)]
+        hub.unsubscribe("id1", first.queue)
+        hub.unsubscribe("id1", second.queue)
+        return updates
+
+    updates = asyncio.run(scenario())
+    patch_ops = [{"op": "replace", "path": "/sentiment_result", "value": {"positive": 1.0}}]
+    assert updates == [(2, patch_ops, None)] * 2
+    assert loader.call_count == 1
+    assert hub.stats()["subscribers"] == 0
+
+def test_stream_hub_resumes_from_last_event_id():
+    loader = MagicMock(return_value={"id": "id1", "emotion_result": None})
+    hub = stream_hub.StreamHub(loader, poll_interval=60)
+
+    async def scenario():
+        first = await hub.subscribe("id1")
+        last_seen = first.event_id(first.version)
+        hub.unsubscribe("id1", first.queue)
+
+        hub.publish("id1", {"emotion_result": {"joy": 0.9}})
+        loader.return_value = {"id": "id1", "emotion_result": {"joy": 0.9}}
+        resumed = await hub.subscribe("id1", last_event_id=last_seen)
+        fresh = await hub.subscribe("id1", last_event_id="unknown-1")
+        hub.unsubscribe("id1", resumed.queue)
+        hub.unsubscribe("id1", fresh.queue)
+        return resumed, fresh
+
+    resumed, fresh = asyncio.run(scenario())
+    assert resumed.backlog == [(2, [{"op": "replace", "path": "/emotion_result", "value": {"joy": 0.9}}])]
+    assert fresh.backlog is None
+    assert fresh.snapshot == {"id": "id1", "emotion_result": {"joy": 0.9}}
+
+def test_stream_hub_poll_keeps_fields_not_yet_saved():
+    loader = MagicMock(return_value={"id": "id1", "sentiment_result": None})
+    hub = stream_hub.StreamHub(loader, poll_interval=60)
+
+    async def scenario():
+        sub = await hub.subscribe("id1")
+        # With PIPELINE_FLUSH=end the result is published before the row is written
+        hub.publish("id1", {"sentiment_result": {"positive": 1.0}, "summary": "text"}, stage="sentiment")
+        hub.update("id1", {"id": "id1", "sentiment_result": None, "title": "title"})
+        stale_poll = hub._topics["id1"].snapshot
+        hub.update("id1", {"id": "id1", "sentiment_result": {"positive": 1.0}, "summary": "text", "title": "title"})
+        hub.unsubscribe("id1", sub.queue)
+        updates = []
+        while not sub.queue.empty():
+            updates.append(sub.queue.get_nowait())
+        return stale_poll, updates
+
+    stale_poll, updates = asyncio.run(scenario())
+    assert stale_poll == {"id": "id1", "sentiment_result": {"positive": 1.0}, "summary": "text", "title": "title"}
+    assert all(op["op"] != "remove" and op["path"] != "/sentiment_result"
+               for _, patch, _ in updates[1:] for op in patch)
+    assert hub._topics["id1"].published == {}
+
+def test_stream_hub_sends_first_snapshot_after_failed_load():
+    loader = MagicMock(side_effect=Exception("database down"))
+    hub = stream_hub.StreamHub(loader, poll_interval=60)
+
+    async def scenario():
+        sub = await hub.subscribe("id1")
+        hub.update("id1", {"id": "id1", "sentiment_result": None})
+        update = await asyncio.wait_for(sub.queue.get(), 1)
+        hub.unsubscribe("id1", sub.queue)
+        return sub, update
+
+    sub, update = asyncio.run(scenario())
+    assert sub.snapshot is None
+    assert update == (1, {"id": "id1", "sentiment_result": None}, None)
+
+def test_stream_news_sends_snapshot_then_closes(mock_methods):
+    mock_methods.get_news_by_id.return_value = {"id": "stream_id", "title": "test_title"}
+    with patch("app.vars.stream_timeout", 0.2):
+        response = client.get("/application/stream_news?news_id=stream_id")
+    assert response.status_code == 200
+    lines = response.text.split("\n")
+    assert lines[0].startswith("id: ")
+    assert lines[1] == 'data: {"id": "stream_id", "title": "test_title"}'
+    assert lines[-4:] == ["event: close", "data: Stream timeout", "", ""]
+
+def test_run_analysis_coalesces_results_into_one_write():
+    import app as app_module
+    import methods
+
+    def service_response(payload):
+        return MagicMock(json=MagicMock(return_value=payload))
+
+    services = {
+        "sentiment_service": {"sentiment_result": {"positive": 0.5}},
+        "emotion_service": {"emotion_result": {"joy": 0.5}},
+        "propaganda_service": {"propaganda_result": {"propaganda_probability": 0.1}},
+    }
+    factcheck_responses = {
+        "/factcheck/summarise": {"response": "a summary"},
+        "/factcheck/summarise/model-data": {"response": {"overall": "neutral"}},
+        "/factcheck/predict/fact-check": {"response": []},
+    }
+
+    with patch("app.vars.pipeline_flush", "end"), \
+         patch.object(methods, "database") as database, \
+         patch.object(methods, "factcheck_service") as factcheck_service, \
+         patch.object(methods, "sentiment_service") as sentiment_service, \
+         patch.object(methods, "emotion_service") as emotion_service, \
+         patch.object(methods, "propaganda_service") as propaganda_service:
+        for service, payload in zip((sentiment_service, emotion_service, propaganda_service), services.values()):
+            service.post.return_value = service_response(payload)
+        factcheck_service.post.side_effect = lambda path, json: service_response(factcheck_responses[path])
+
+        app_module.run_analysis("https://example.com/a", "title", "text", "id1")
+
+    database.put.assert_called_once()
+    path, = database.put.call_args.args
+    saved = database.put.call_args.kwargs["json"]
+    assert path == "/database/results/"
+    assert saved["sentiment_result"] == {"positive": 0.5}
+    assert saved["data_summary"] == {"overall": "neutral"}
+    assert saved["factcheck_result"] == []
+
+    data_summary_call = [c for c in factcheck_service.post.call_args_list if c.args[0] == "/factcheck/summarise/model-data"][0]
+    assert data_summary_call.kwargs["json"]["summarise_result"] == "a summary"
+    database.post.assert_not_called()
+
+def test_bloom_filter_persists_seen_urls(tmp_path):
+    seen = prescrape.BloomFilter(capacity=1000)
+    seen.add("https://example.com/a")
+    assert "https://example.com/a" in seen
+    assert "https://example.com/b" not in seen
+
+    path = str(tmp_path / "seen.bin")
+    seen.save(path)
+    reloaded = prescrape.BloomFilter(capacity=1000)
+    assert reloaded.load(path)
+    assert "https://example.com/a" in reloaded
+    assert reloaded.count == 1
+    assert not prescrape.BloomFilter(capacity=10).load(path)
+
+def test_prescrape_skips_seen_urls_and_adapts_interval(tmp_path):
+    latest = {"cna": ["https://example.com/a", "https://example.com/b"], "st": ["https://example.com/c"]}
+    processed = []
+
+    def process(url):
+        processed.append(url)
+        if url == "https://example.com/c":
+            return None  # c failed and is retried
+        return prescrape.EXISTING if url == "https://example.com/b" else prescrape.CREATED
+
+    scheduler = prescrape.PrescrapeScheduler(
+        fetch_latest=lambda num: latest, process=process,
+        lock_path=str(tmp_path / "lock"), seen_path=str(tmp_path / "seen.bin"),
+        num_articles=2, interval=60, min_interval=10, max_interval=600,
+    )
+    # b was already stored, e.g. submitted by a user: remembered but not new
+    assert scheduler.run_cycle() == 1
+    assert sorted(processed) == ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+
+    processed.clear()
+    assert scheduler.run_cycle() == 0
+    assert processed == ["https://example.com/c"]
+
+    assert scheduler.next_interval(2) == 30
+    assert scheduler.next_interval(0) == 60
+    assert scheduler.next_interval(0) == 120
+    assert scheduler.next_interval(1) == 60
+
+def test_prescrape_single_leader(tmp_path):
+    def make():
+        return prescrape.PrescrapeScheduler(fetch_latest=dict, process=bool,
+                                            lock_path=str(tmp_path / "lock"), seen_path=str(tmp_path / "seen.bin"))
+    first, second = make(), make()
+    assert first.try_become_leader()
+    assert not second.try_become_leader()
+    first.release()
+    assert second.try_become_leader()
+    second.release()
+
+def test_prescrape_follower_retries_lock_on_short_interval(tmp_path):
+    def make():
+        return prescrape.PrescrapeScheduler(fetch_latest=lambda num: {}, process=bool, leader_retry=0.05,
+                                            lock_path=str(tmp_path / "lock"), seen_path=str(tmp_path / "seen.bin"))
+    leader, follower = make(), make()
+    assert leader.try_become_leader()
+    stop = threading.Event()
+    thread = threading.Thread(target=follower.run_forever, args=(stop,))
+    thread.start()
+    try:
+        leader.release()
+        deadline = time.monotonic() + 5
+        while follower._lock_file is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert follower._lock_file is not None
+    finally:
+        stop.set()
+        thread.join(5)
+
+def test_prescrape_without_flock_leads_alone(tmp_path):
+    with patch("prescrape.fcntl", None):
+        first, second = (prescrape.PrescrapeScheduler(fetch_latest=dict, process=bool,
+                                                      lock_path=str(tmp_path / "lock"),
+                                                      seen_path=str(tmp_path / "seen.bin")) for _ in range(2))
+        assert first.try_become_leader()
+        assert second.try_become_leader()
+        first.release()
+        second.release()
+
+def test_prescrape_url_reports_existing_articles(mock_methods):
+    mock_methods.check_exists.return_value = {"exists": True}
+    import app as app_module
+    assert app_module.prescrape_url("https://example.com/a") == prescrape.EXISTING
+
+def test_batch_query_streams_ndjson(mock_methods):
+    complete = {"id": "1", "url": "https://www.example.com/done",
+                **{field: {"x": 1} for field in news_cache.RESULT_FIELDS}}
+    mock_methods.get_news_by_urls.return_value = [complete]
+
+    def fake_process(url, return_news, background, priority, analyses):
+        assert return_news and background
+        assert priority == job_queue.PRIORITY_BACKGROUND
+        if url.endswith("bad"):
+            raise HTTPException(status_code=400, detail="Invalid URL")
+        return {"id": "2", "url": url}
+
+    with patch("app.process_url", side_effect=fake_process) as process:
+        response = client.post("/application/batch_query", json={"urls": [
+            "https://www.example.com/done", "https://www.example.com/new",
+            "https://www.example.com/new?utm_source=x", "https://www.example.com/bad",
+        ]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"url": "https://www.example.com/done", "status": "exists", "news": complete}
+    by_url = {line["url"]: line for line in lines[1:]}
+    assert by_url["https://www.example.com/new"]["status"] == "processed"
+    assert by_url["https://www.example.com/bad"] == {"url": "https://www.example.com/bad", "status": "error", "error": "Invalid URL"}
+    assert process.call_count == 2
+    mock_methods.get_news_by_urls.assert_called_once_with([
+        "https://www.example.com/done", "https://www.example.com/new", "https://www.example.com/bad"])
+
+def test_batch_query_limits():
+    assert client.post("/application/batch_query", json={"urls": []}).status_code == 400
+    with patch("app.vars.batch_max_urls", 1):
+        response = client.post("/application/batch_query", json={"urls": ["https://a.com/1", "https://a.com/2"]})
+    assert response.status_code == 413
+
+def test_metrics_endpoint(mock_methods):
+    import app as app_module
+    mock_methods.get_sentiment.return_value = {"positive": 0.5}
+    for name in ("get_emotion", "get_propaganda", "get_summarise", "get_data_summary", "get_fact_check"):
+        getattr(mock_methods, name).return_value = {"x": 1}
+    app_module.run_analysis("https://example.com/a", "title", "text", "id1")
+
+    service = http_client.ServiceClient("metrics-test", "http://127.0.0.1:1", connect_timeout=0.2)
+    with pytest.raises(requests.RequestException):
+        service.get("/")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'pipeline_stage_duration_seconds_count{stage="sentiment"}' in body
+    assert 'downstream_requests_total{method="GET",service="metrics-test"} 1.0' in body
+    assert 'downstream_errors_total{kind="connection",service="metrics-test"} 1.0' in body
+    assert "job_queue_depth" in body
+    assert "job_queue_running" in body
+    assert "sse_streams" in body
+    assert 'cache_hit_ratio{cache="news"}' in body
+
+def test_circuit_breaker_opens_and_probes_half_open():
+    breaker = resilience.CircuitBreaker("svc", failure_threshold=2, reset_timeout=0.05)
+    breaker.allow()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.allow()  # the probe
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["consecutive_failures"] == 0
+
+def test_adaptive_timeout_follows_p99():
+    timeout = resilience.AdaptiveTimeout(max_timeout=30, min_timeout=1, multiplier=2, min_samples=10)
+    assert timeout.current() == 30
+    for _ in range(99):
+        timeout.observe(0.5)
+    timeout.observe(4)
+    assert timeout.p99() == 0.5
+    assert timeout.current() == 1
+    timeout.observe(4)
+    assert timeout.current() == 8
+
+def test_service_client_fails_fast_when_circuit_open():
+    service = http_client.ServiceClient("breaker-test", "http://127.0.0.1:1", connect_timeout=0.2,
+                                        failure_threshold=1, reset_timeout=60)
+    with patch.object(service.session, "request", side_effect=requests.ConnectionError("down")) as send:
+        with pytest.raises(requests.ConnectionError):
+            service.get("/")
+        with pytest.raises(resilience.CircuitOpenError):
+            service.get("/")
+    assert send.call_count == 1
+
+def test_service_client_routes_to_least_loaded_replica():
+    service = http_client.ServiceClient("replica-test", "http://replica-a:1,http://replica-b:1")
+    service.replicas[0].in_flight = 3
+    with patch.object(service.session, "request", return_value=MagicMock(status_code=200)) as send:
+        service.get("/")
+    assert send.call_args[0][1] == "http://replica-b:1/"
+
+def test_service_client_ejects_failing_replica():
+    service = http_client.ServiceClient("eject-test", ["http://replica-a:1", "http://replica-b:1"],
+                                        failure_threshold=1, reset_timeout=60)
+
+    def send(method, url, **kwargs):
+        if url.startswith("http://replica-a:1"):
+            raise requests.ConnectionError("down")
+        return MagicMock(status_code=200)
+
+    with patch.object(service.session, "request", side_effect=send) as request:
+        with pytest.raises(requests.ConnectionError):
+            service.get("/")
+        for _ in range(3):
+            assert service.get("/").status_code == 200
+    assert [call[0][1] for call in request.call_args_list[1:]] == ["http://replica-b:1/"] * 3
+    assert service.breaker_stats()["state"] == "degraded"
+
+def test_service_client_hedges_slow_requests():
+    service = http_client.ServiceClient("hedge-test", "http://replica-a:1,http://replica-b:1", hedge=True)
+    for _ in range(service.read_timeout_for("/").min_samples):
+        service.read_timeout_for("/").observe(0.01)
+
+    def send(method, url, **kwargs):
+        if url.startswith("http://replica-a:1"):
+            time.sleep(0.5)
+        return MagicMock(status_code=200, url=url)
+
+    with patch.object(service.session, "request", side_effect=send):
+        response = service.post("/", hedge=True)
+    assert response.url == "http://replica-b:1/"
+
+def test_service_client_times_out_each_route_separately():
+    service = http_client.ServiceClient("route-test", "http://replica-a:1", read_timeout=15, min_read_timeout=1)
+    for _ in range(service.read_timeout_for("/fast").min_samples):
+        service.read_timeout_for("/fast").observe(0.01)
+
+    with patch.object(service.session, "request", return_value=MagicMock(status_code=200)) as send:
+        service.get("/fast")
+        service.get("/bulk")
+        service.get("/bulk", timeout=(3, 60))
+    timeouts = [call.kwargs["timeout"][1] for call in send.call_args_list]
+    # The fast route's p99 does not shrink the timeout of the bulk one; an explicit timeout wins
+    assert timeouts == [1, 15, 60]
+    assert set(service.breaker_stats()["routes"]) == {"/fast", "/bulk"}
+
+def test_service_client_retries_overloaded_replica_elsewhere():
+    service = http_client.ServiceClient("overload-test", "http://replica-a:1,http://replica-b:1",
+                                        failure_threshold=1, reset_timeout=60)
+
+    def send(method, url, **kwargs):
+        status = 503 if url.startswith("http://replica-a:1") else 200
+        return MagicMock(status_code=status, url=url)
+
+    with patch.object(service.session, "request", side_effect=send):
+        for _ in range(3):
+            assert service.get("/").url == "http://replica-b:1/"
+    # Backpressure is not a failure: the busy replica stays in rotation
+    assert service.breaker_stats()["state"] == "closed"
+
+def test_stage_fallback_keeps_dependents_running():
+    def broken(ctx):
+        raise RuntimeError("service down")
+
+    stages = [
+        pipeline.Stage("a", broken, fallback=dict),
+        pipeline.Stage("b", lambda ctx: "b"),
+        pipeline.Stage("c", lambda ctx: "c", depends_on=("a", "b")),
+    ]
+    completed = []
+    report = pipeline.run_stages(stages, None, on_complete=lambda name, result: completed.append(name))
+    assert report.ok
+    assert report.results == {"a": {}, "b": "b", "c": "c"}
+    assert report.degraded == {"a": "service down"}
+    assert "a" not in completed
+
+def test_breaker_status_endpoint():
+    http_client.get_client("sentiment")
+    response = client.get("/application/status/breakers")
+    assert response.status_code == 200
+    assert response.json()["sentiment"]["state"] == "closed"
+    assert "read_timeout" in response.json()["sentiment"]
+
+def test_job_queue_runs_interactive_jobs_first(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"), workers=2, background_limit=1)
+    queue.register("analyse", lambda payload: None)
+    with patch.object(queue, "start"):
+        for i in range(3):
+            queue.submit("analyse", {}, job_id=f"bg{i}", priority=job_queue.PRIORITY_BACKGROUND)
+        queue.submit("analyse", {}, job_id="user")
+
+    assert queue.get("user")["position"] == 0
+    assert queue.get("bg0")["position"] == 1
+    assert queue._claim()["id"] == "user"
+    assert queue._claim()["id"] == "bg0"
+    # Background work already has its share of workers
+    assert queue._claim() is None
+
+    # A user asking for a queued background article moves it up
+    assert queue.raise_priority("bg2", job_queue.PRIORITY_INTERACTIVE)
+    assert queue._claim()["id"] == "bg2"
+
+    queue._finish("bg0", "done")
+    assert queue._claim()["id"] == "bg1"
+
+def test_job_queue_renews_lease_of_running_job(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"), workers=1, lease_seconds=0.3)
+    release = threading.Event()
+    queue.register("slow", lambda payload: release.wait(5))
+    queue.submit("slow", {}, job_id="slow")
+    try:
+        # Outlives its lease several times over without being run again
+        time.sleep(1)
+        queue._requeue_expired()
+        job = queue.get("slow")
+        assert job["status"] == "running"
+        assert job["lease_until"] > time.time()
+    finally:
+        release.set()
+        queue.stop()
+    assert queue.get("slow")["status"] == "done"
+
+def test_job_queue_worker_survives_requeue_errors(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"), workers=1)
+    done = threading.Event()
+    queue.register("analyse", lambda payload: done.set())
+    queue.start()
+    with patch.object(queue, "_requeue_expired", side_effect=sqlite3.OperationalError("database is locked")):
+        try:
+            time.sleep(1.5)  # at least one idle pass hits the error
+            queue.submit("analyse", {}, job_id="a")
+            assert done.wait(5)
+        finally:
+            queue.stop()
+
+def test_job_queue_finish_checks_ownership(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"), lease_seconds=0)
+    queue.register("analyse", lambda payload: None)
+    with patch.object(queue, "start"):
+        queue.submit("analyse", {}, job_id="a")
+    first = queue._claim()
+    queue._requeue_expired()
+    second = queue._claim()
+
+    # The stale run neither renews nor overwrites the run that took over
+    assert not queue._renew("a", first["owner"])
+    assert not queue._finish("a", "failed", error="stale", owner=first["owner"])
+    assert queue._finish("a", "done", owner=second["owner"])
+    assert queue.get("a")["status"] == "done"
+
+def test_job_queue_resubmit_raises_priority(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    queue.register("analyse", lambda payload: None)
+    with patch.object(queue, "start"):
+        queue.submit("analyse", {}, job_id="a", priority=job_queue.PRIORITY_BACKGROUND)
+        queue.submit("analyse", {}, job_id="b", priority=job_queue.PRIORITY_BACKGROUND)
+        job = queue.submit("analyse", {}, job_id="b")
+    assert job["priority"] == job_queue.PRIORITY_INTERACTIVE
+    assert job["position"] == 0
+
+def test_prescrape_queues_background_jobs(mock_methods):
+    import app as app_module
+    mock_methods.check_exists.return_value = {"exists": False}
+    mock_methods.extract_news.return_value = {"headline": "title", "body": "text"}
+    mock_methods.create_news.return_value = {"id": "prescraped-1"}
+    with patch.object(app_module.jobs, "submit") as submit:
+        assert app_module.prescrape_url("https://example.com/prescraped") == prescrape.CREATED
+    assert submit.call_args.kwargs["priority"] == job_queue.PRIORITY_BACKGROUND
+
+def test_stream_news_relays_stage_results(mock_methods):
+    import app as app_module
+    mock_methods.get_news_by_id.return_value = {"id": "stage_id", "sentiment_result": None}
+
+    def complete_stage():
+        time.sleep(0.2)
+        app_module.stream_hub.publish("stage_id", {"sentiment_result": {"positive": 1.0}}, stage="sentiment")
+
+    threading.Thread(target=complete_stage).start()
+    with patch("app.vars.stream_timeout", 0.6):
+        response = client.get("/application/stream_news?news_id=stage_id")
+
+    events = response.text.split("\n\n")
+    assert events[1].splitlines()[1] == "event: stage"
+    data = json.loads(events[1].splitlines()[2][len("data: "):])
+    assert data == {"stage": "sentiment",
+                    "patch": [{"op": "replace", "path": "/sentiment_result", "value": {"positive": 1.0}}]}
+
+def test_stage_event_log_is_shared_between_processes(tmp_path):
+    db_path = str(tmp_path / "events.db")
+    writer = stage_events.StageEventLog(db_path)
+    reader = stage_events.StageEventLog(db_path, retention=0)
+    reader.origin = "other-process"
+
+    start = reader.latest_id()
+    writer.append("id1", "sentiment", {"sentiment_result": {"positive": 1.0}})
+    events = reader.read_since(start)
+    assert [(e["news_id"], e["stage"], e["fields"]) for e in events] == \
+        [("id1", "sentiment", {"sentiment_result": {"positive": 1.0}})]
+    assert events[0]["origin"] == writer.origin != reader.origin
+    assert reader.read_since(events[-1]["id"]) == []
+
+    reader.prune()
+    assert reader.read_since(0) == []
+
+def test_run_stages_skips_completed_stages():
+    ran = []
+
+    def stage(name):
+        return lambda ctx: ran.append(name) or name
+
+    stages = [
+        pipeline.Stage("a", stage("a")),
+        pipeline.Stage("b", stage("b")),
+        pipeline.Stage("c", stage("c"), depends_on=("a", "b")),
+    ]
+    report = pipeline.run_stages(stages, None, completed={"a": "saved a"})
+    assert sorted(ran) == ["b", "c"]
+    assert report.results == {"a": "saved a", "b": "b", "c": "c"}
+
+def test_resume_job_reruns_only_missing_stages(mock_methods):
+    import app as app_module
+    mock_methods.get_news_by_id.return_value = {
+        "id": "resume1", "url": "https://example.com/r", "title": "t", "content": "c",
+        "sentiment_result": {"positive": 1.0}, "emotion_result": {"joy": 1.0},
+        "propaganda_result": {"p": 0.1}, "summarise_result": "summary",
+        "data_summary": None, "factcheck_result": None,
+    }
+    mock_methods.get_data_summary.side_effect = lambda ctx: ctx.results["summarise_result"] + " data"
+    mock_methods.get_fact_check.return_value = []
+
+    app_module.resume_analysis_job({"news_id": "resume1"})
+
+    for name in ("get_sentiment", "get_emotion", "get_propaganda", "get_summarise"):
+        getattr(mock_methods, name).assert_not_called()
+    mock_methods.get_data_summary.assert_called_once()
+    mock_methods.get_fact_check.assert_called_once()
+
+def test_resume_endpoint_queues_incomplete_articles(mock_methods):
+    import app as app_module
+    mock_methods.get_incomplete_news.return_value = [{"id": "inc1"}, {"id": "inc2"}]
+    with patch.object(app_module.jobs, "submit", side_effect=lambda kind, payload, job_id, priority: {"kind": kind}) as submit:
+        response = client.post("/application/resume?limit=2")
+    assert response.status_code == 200
+    assert response.json() == {"incomplete": 2, "queued": 2}
+    assert submit.call_args.kwargs["priority"] == job_queue.PRIORITY_BACKGROUND
+    limit, created_before, fields = mock_methods.get_incomplete_news.call_args.args
+    assert limit == 2
+    assert "factcheck_result" not in fields
+
+def test_content_hash_ignores_formatting():
+    assert fingerprint.content_hash("Hello,  World!\n") == fingerprint.content_hash("hello world")
+    assert fingerprint.content_hash("\u201cQuoted\u201d text") == fingerprint.content_hash('"quoted" TEXT')
+    assert fingerprint.content_hash("hello world") != fingerprint.content_hash("hello there world")
+
+def test_process_url_scrapes_the_original_url(mock_methods):
+    import app as app_module
+    mock_methods.check_exists.return_value = {"exists": False}
+    mock_methods.extract_news.return_value = {"headline": "title", "body": "Mobile only story."}
+    mock_methods.create_news.return_value = {"id": "m1"}
+    mock_methods.get_news_by_content_hash.return_value = None
+
+    with patch.object(app_module.jobs, "submit"):
+        app_module.process_url("http://m.example.com/story?utm_source=x", return_news=False)
+
+    mock_methods.extract_news.assert_called_once_with("http://m.example.com/story?utm_source=x")
+    mock_methods.check_exists.assert_called_once_with("https://example.com/story")
+    assert mock_methods.create_news.call_args.args[0] == "https://example.com/story"
+
+def test_duplicate_content_reuses_saved_results(mock_methods):
+    import app as app_module
+    mock_methods.check_exists.return_value = {"exists": False}
+    mock_methods.extract_news.return_value = {"headline": "title", "body": "Same wire story."}
+    mock_methods.create_news.return_value = {"id": "copy1"}
+    mock_methods.get_news_by_content_hash.return_value = {
+        "id": "orig", "url": "https://example.com/original",
+        "sentiment_result": {"positive": 1.0}, "emotion_result": {"joy": 1.0},
+        "propaganda_result": {"p": 0.1}, "summarise_result": "summary",
+        "data_summary": {"overall": "ok"}, "factcheck_result": None,
+    }
+
+    with patch.object(app_module.jobs, "submit") as submit:
+        app_module.process_url("https://example.com/syndicated", return_news=False)
+
+    assert mock_methods.get_news_by_content_hash.call_args.args == (fingerprint.content_hash("same wire story"),)
+    saved = mock_methods.create_news.call_args.kwargs["results"]
+    assert saved["sentiment_result"] == {"positive": 1.0}
+    assert "factcheck_result" not in saved
+    # Only the fact check is left to compute
+    completed = submit.call_args.args[1]["completed"]
+    assert set(completed) == {"sentiment", "emotion", "propaganda", "summary", "data summary"}
+
+    mock_methods.get_news_by_content_hash.return_value["factcheck_result"] = []
+    with patch.object(app_module.jobs, "submit") as submit:
+        app_module.process_url("https://example.com/another-copy", return_news=False)
+    submit.assert_not_called()
+
+def test_near_duplicate_reuses_text_independent_stages(mock_methods):
+    import app as app_module
+    mock_methods.check_exists.return_value = {"exists": False}
+    mock_methods.extract_news.return_value = {"headline": "title", "body": "Story with a correction."}
+    mock_methods.create_news.return_value = {"id": "near1"}
+    mock_methods.find_near_duplicates.return_value = [{"id": "orig", "similarity": 0.95}]
+    mock_methods.get_news_by_id.return_value = {
+        "id": "orig", "url": "https://example.com/original",
+        "sentiment_result": {"positive": 1.0}, "emotion_result": {"joy": 1.0},
+        "propaganda_result": {"p": 0.1}, "summarise_result": "summary",
+        "data_summary": {"overall": "ok"}, "factcheck_result": [],
+    }
+
+    with patch.object(app_module.jobs, "submit") as submit, \
+         patch("app.vars.near_duplicate_reuse", ["sentiment", "emotion"]):
+        app_module.process_url("https://example.com/corrected", return_news=False)
+
+    mock_methods.get_news_by_id.assert_called_once_with("orig")
+    assert set(submit.call_args.args[1]["completed"]) == {"sentiment", "emotion"}
+
+def test_select_stages_adds_dependencies():
+    stages = [
+        pipeline.Stage("a", lambda ctx: "a"),
+        pipeline.Stage("b", lambda ctx: "b"),
+        pipeline.Stage("c", lambda ctx: "c", depends_on=("a",)),
+        pipeline.Stage("d", lambda ctx: "d"),
+    ]
+    assert [stage.name for stage in pipeline.select_stages(stages, ["c", "b"])] == ["a", "b", "c"]
+    with pytest.raises(ValueError):
+        pipeline.select_stages(stages, ["e"])
+
+def test_new_query_runs_only_requested_analyses(mock_methods):
+    mock_methods.check_exists.return_value = {"exists": False}
+    mock_methods.extract_news.return_value = {"body": "test_content", "headline": "test_title"}
+    mock_methods.create_news.return_value = {"id": "new_id"}
+    mock_methods.get_sentiment.return_value = {"positive": 1.0}
+    mock_methods.get_news.return_value = {"id": "new_id", "sentiment_result": {"positive": 1.0}}
+    with patch("app.jobs.get", return_value=None):
+        response = client.post("/application/new_query", json={
+            "url": "https://example.com/only-sentiment", "background": False, "analyses": ["sentiment"]})
+    assert response.status_code == 200
+    mock_methods.get_sentiment.assert_called_once()
+    for name in ("get_emotion", "get_propaganda", "get_summarise", "get_data_summary", "get_fact_check"):
+        getattr(mock_methods, name).assert_not_called()
+
+def test_new_query_rejects_unknown_analyses(mock_methods):
+    response = client.post("/application/new_query", json={"url": "test_url", "analyses": ["horoscope"]})
+    assert response.status_code == 400
+    mock_methods.check_exists.assert_not_called()
+
+def test_existing_article_computes_missing_analyses_on_request(mock_methods):
+    mock_methods.check_exists.return_value = {"exists": True}
+    mock_methods.get_news.return_value = {
+        "id": "lazy1", "url": "https://example.com/lazy",
+        "sentiment_result": {"positive": 1.0}, "emotion_result": {"joy": 1.0},
+        "propaganda_result": {"p": 0.1}, "summarise_result": "summary",
+        "data_summary": None, "factcheck_result": None,
+    }
+    with patch("app.jobs.get", return_value=None), patch("app.jobs.submit") as submit:
+        response = client.post("/application/new_query", json={
+            "url": "https://example.com/lazy", "analyses": ["summary", "fact check"]})
+    assert response.status_code == 200
+    submit.assert_called_once()
+    kind, payload = submit.call_args.args
+    assert kind == "resume"
+    assert payload == {"news_id": "lazy1", "analyses": ["fact check"]}
+
+def test_opening_an_article_queues_its_missing_stages(mock_methods):
+    prescraped = {"id": "opened1", "url": "https://example.com/o", "sentiment_result": {"positive": 1.0},
+                  "emotion_result": {"joy": 1.0}, "propaganda_result": {"p": 0.1}, "summarise_result": "summary",
+                  "data_summary": None, "factcheck_result": None}
+    mock_methods.get_news_by_id.return_value = prescraped
+    with patch("app.jobs.get", return_value=None), patch("app.jobs.submit") as submit, \
+            patch("app.vars.stream_timeout", 0.1):
+        assert client.get("/application/retrieve_exisiting?news_id=opened1").status_code == 200
+        assert client.get("/application/stream_news?news_id=opened1").status_code == 200
+
+    assert submit.call_count == 2
+    for call in submit.call_args_list:
+        assert call.args[1] == {"news_id": "opened1", "analyses": ["data summary", "fact check"]}
+        assert call.kwargs["priority"] == job_queue.PRIORITY_INTERACTIVE
+
+def test_lazy_analyses_follow_the_active_job(mock_methods):
+    import app as app_module
+    active = {"status": "running", "payload": {"analyses": ["sentiment", "summary"]}}
+    with patch("app.jobs.get", return_value=active), patch("app.jobs.submit") as submit:
+        assert app_module.request_analyses({"id": "lazy2"}, ["summary", "fact check"], job_queue.PRIORITY_INTERACTIVE)
+    payload = submit.call_args.args[1]
+    assert payload == {"news_id": "lazy2", "analyses": ["fact check"], "after": "lazy2"}
+    assert submit.call_args.kwargs["job_id"] == app_module.lazy_job_id("lazy2")
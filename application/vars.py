@@ -2,6 +2,8 @@ import os
 
 # get the urls from the environment variable or use the default value
 # Fixed: Corrected fallback ports to match actual service ports in docker-compose
+# A service with several replicas takes a comma-separated list, e.g.
+# PROPAGANDA_URL=http://propaganda-1:8014,http://propaganda-2:8014
 sentiment_url = os.getenv("SENTIMENT_URL") or "http://localhost:8012"
 emotion_url = os.getenv("EMOTION_URL") or "http://localhost:8013"
 propaganda_url = os.getenv("PROPAGANDA_URL") or "http://localhost:8014"
@@ -10,6 +12,90 @@ factcheck_url = os.getenv("FACTCHECK_URL") or "http://localhost:8016"
 scraper_url = os.getenv("SCRAPER_URL") or "http://localhost:8015"
 database_url = os.getenv("DATABASE_URL") or "http://localhost:8011"
 
-prescrape_num = os.getenv("SCRAPE_NUM") or 10
+service_urls = {
+    "sentiment": sentiment_url,
+    "emotion": emotion_url,
+    "propaganda": propaganda_url,
+    "factcheck": factcheck_url,
+    "scraper": scraper_url,
+    "database": database_url,
+}
+
+# Connection pool size (per replica), timeouts (seconds), circuit breaker (per replica) and
+# hedging per downstream service. Override with e.g. SENTIMENT_POOL_SIZE, SENTIMENT_CONNECT_TIMEOUT,
+# SENTIMENT_READ_TIMEOUT, SENTIMENT_MIN_READ_TIMEOUT, SENTIMENT_BREAKER_THRESHOLD, SENTIMENT_BREAKER_RESET,
+# SENTIMENT_HEDGE
+def _http_settings(name, pool_size, read_timeout, min_read_timeout):
+    prefix = name.upper()
+    return {
+        "pool_size": int(os.getenv(f"{prefix}_POOL_SIZE") or pool_size),
+        "connect_timeout": float(os.getenv(f"{prefix}_CONNECT_TIMEOUT") or 3),
+        "read_timeout": float(os.getenv(f"{prefix}_READ_TIMEOUT") or read_timeout), # ceiling of the adaptive read timeout
+        "min_read_timeout": float(os.getenv(f"{prefix}_MIN_READ_TIMEOUT") or min_read_timeout), # floor of the adaptive read timeout, per route
+        "failure_threshold": int(os.getenv(f"{prefix}_BREAKER_THRESHOLD") or 5), # consecutive failures that open the breaker
+        "reset_timeout": float(os.getenv(f"{prefix}_BREAKER_RESET") or 30), # seconds a replica is ejected before a probe request
+        "hedge": os.getenv(f"{prefix}_HEDGE") == "1", # resend idempotent calls slower than the p95 to a second replica
+    }
+
+hedge_pool_size = int(os.getenv("HEDGE_POOL_SIZE") or 32) # threads carrying hedged requests, across services
+adaptive_timeout_multiplier = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER") or 2) # read timeout = multiplier x observed p99
+
+http_settings = {
+    "sentiment": _http_settings("sentiment", pool_size=10, read_timeout=30, min_read_timeout=15),
+    "emotion": _http_settings("emotion", pool_size=10, read_timeout=30, min_read_timeout=15),
+    "propaganda": _http_settings("propaganda", pool_size=10, read_timeout=30, min_read_timeout=15),
+    "factcheck": _http_settings("factcheck", pool_size=10, read_timeout=120, min_read_timeout=60), # LLM calls
+    "scraper": _http_settings("scraper", pool_size=10, read_timeout=60, min_read_timeout=30),
+    "database": _http_settings("database", pool_size=20, read_timeout=15, min_read_timeout=8),
+}
+
+prescrape_num = int(os.getenv("SCRAPE_NUM") or 10)
 prescrape_feature_toggle = os.getenv("PRESCRAPE") == "1"
-prescrape_interval = 30 # in minutes
\ No newline at end of file
+prescrape_interval = int(os.getenv("PRESCRAPE_INTERVAL") or 30) # in minutes, after a cycle with a few new articles
+prescrape_min_interval = int(os.getenv("PRESCRAPE_MIN_INTERVAL") or 5) # in minutes, while many new articles appear
+prescrape_max_interval = int(os.getenv("PRESCRAPE_MAX_INTERVAL") or 120) # in minutes, while nothing new appears
+prescrape_parallelism = int(os.getenv("PRESCRAPE_PARALLELISM") or 2) # providers processed at the same time
+prescrape_lock_path = os.getenv("PRESCRAPE_LOCK_PATH") or "prescrape.lock" # held by the one process that prescrapes
+prescrape_leader_retry = int(os.getenv("PRESCRAPE_LEADER_RETRY") or 60) # in seconds, how often the other processes try to take over
+prescrape_seen_path = os.getenv("PRESCRAPE_SEEN_PATH") or "prescrape_seen.bin" # Bloom filter of URLs already processed
+prescrape_analyses = (os.getenv("PRESCRAPE_ANALYSES") or "sentiment,emotion,propaganda,summary").split(",") # stages run for prescraped articles, the rest when someone asks
+prescrape_seen_capacity = int(os.getenv("PRESCRAPE_SEEN_CAPACITY") or 100000) # URLs held before the filter is cleared
+
+pipeline_max_workers = int(os.getenv("PIPELINE_MAX_WORKERS") or 6) # concurrent analysis stages per article
+pipeline_flush = os.getenv("PIPELINE_FLUSH") or "stage" # "stage": save each result as it arrives, "end": one write per article
+
+job_db_path = os.getenv("JOB_DB_PATH") or "jobs.db"
+job_workers = int(os.getenv("JOB_WORKERS") or 4) # articles analysed concurrently per process
+job_queue_depth = int(os.getenv("JOB_QUEUE_DEPTH") or 100) # queued articles before new ones are rejected
+job_lease_seconds = int(os.getenv("JOB_LEASE_SECONDS") or 600) # a running job older than this is re-queued
+job_background_limit = int(os.getenv("JOB_BACKGROUND_LIMIT") or 2) # prescrape/backfill jobs running at once, across processes
+
+content_dedup = (os.getenv("CONTENT_DEDUP") or "1") == "1" # copy results from a stored article with the same body text
+near_duplicate_threshold = float(os.getenv("NEAR_DUPLICATE_THRESHOLD") or 0.9) # Jaccard similarity for reusing a near-duplicate's results, 0 to disable
+near_duplicate_reuse = (os.getenv("NEAR_DUPLICATE_REUSE") or "sentiment,emotion,propaganda,summary,data summary").split(",") # stages copied from a near-duplicate
+
+resume_on_startup = (os.getenv("RESUME_ON_STARTUP") or "1") == "1" # queue articles with missing results when the service starts
+resume_batch_size = int(os.getenv("RESUME_BATCH_SIZE") or 100) # incomplete articles checked per resume pass
+resume_analyses = (os.getenv("RESUME_ANALYSES") or ",".join(prescrape_analyses)).split(",") # stages finished by a resume pass, the rest when someone asks
+resume_min_age = int(os.getenv("RESUME_MIN_AGE") or 900) # seconds; younger articles may still be mid-analysis
+
+batch_concurrency = int(os.getenv("BATCH_CONCURRENCY") or 4) # new articles analysed at once across all batch requests
+batch_max_urls = int(os.getenv("BATCH_MAX_URLS") or 1000) # URLs accepted in one batch request
+
+inflight_wait_timeout = int(os.getenv("INFLIGHT_WAIT_TIMEOUT") or 300) # seconds a duplicate request waits for the running analysis
+
+redirect_cache_size = int(os.getenv("REDIRECT_CACHE_SIZE") or 10000) # resolved short links kept in memory
+redirect_timeout = float(os.getenv("REDIRECT_TIMEOUT") or 5) # seconds to resolve one short link
+
+news_cache_size = int(os.getenv("NEWS_CACHE_SIZE") or 1000) # news documents kept in memory
+news_cache_ttl = int(os.getenv("NEWS_CACHE_TTL") or 3600) # seconds a completed article is cached
+news_cache_partial_ttl = int(os.getenv("NEWS_CACHE_PARTIAL_TTL") or 5) # seconds an article still being analysed is cached
+news_cache_warm_num = int(os.getenv("NEWS_CACHE_WARM_NUM") or 50) # recent articles loaded at startup
+
+stage_event_poll_interval = float(os.getenv("STAGE_EVENT_POLL_INTERVAL") or 0.25) # seconds between checks for results computed by other worker processes
+stage_event_retention = int(os.getenv("STAGE_EVENT_RETENTION") or 600) # seconds a stage event is kept for other processes
+
+stream_timeout = int(os.getenv("STREAM_TIMEOUT") or 4 * 60) # seconds an SSE stream stays open
+stream_poll_interval = int(os.getenv("STREAM_POLL_INTERVAL") or 10) # seconds between fallback DB polls per watched article
+stream_history_size = int(os.getenv("STREAM_HISTORY_SIZE") or 32) # patches kept per article for Last-Event-ID resume
+stream_resume_window = int(os.getenv("STREAM_RESUME_WINDOW") or 60) # seconds an unwatched article can still be resumed
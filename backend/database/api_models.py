@@ -4,6 +4,15 @@ from typing import Optional, Dict, Any, List
 class URLItem(BaseModel):
     url: Optional[str] = None
 
+class URLList(BaseModel):
+    urls: List[str]
+
+class NearDuplicateQuery(BaseModel):
+    content: str
+    threshold: Optional[float] = None
+    limit: int = 5
+    exclude_id: Optional[str] = None
+
 class FactCheckItem(BaseModel):
     statement: str
     correctness: str
@@ -20,6 +29,7 @@ class NewsItem(URLItem):
     factcheck_result: Optional[List[FactCheckItem]] = None
     summarise_result: Optional[str] = None
     data_summary: Optional[Dict[str, Any]] = None
+    content_hash: Optional[str] = None
 
 
 class QuizItem(BaseModel):
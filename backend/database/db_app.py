@@ -1,17 +1,33 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import JSONResponse
 from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 
-from api_models import NewsItem, QuizItem
+from api_models import NewsItem, QuizItem, URLList, NearDuplicateQuery
 import news_driver as news_methods
 import quiz_driver as quiz_methods
+import near_duplicates as near_duplicates
+import vars as vars
+
+from typing import List, Optional
+
+import threading
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop = threading.Event()
+    if vars.minhash_enabled:
+        threading.Thread(target=near_duplicates.maintain, args=(stop,), daemon=True).start()
+    yield
+    stop.set()
 
-from typing import List
 
 app = FastAPI(
     title="DB App API",
     description="API DB connector to Supabase.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
@@ -92,7 +108,13 @@ def create_news(data: NewsItem):
         "title": data.title,
         "content": data.content
     }
+    # The content fingerprint, and results copied from a duplicate article, if given
+    news_data.update({key: value for key, value in data.dict(exclude_unset=True).items() if key not in news_data})
+    if vars.minhash_enabled:
+        news_data["minhash"] = near_duplicates.signature_for(data.content)
     news_id = news_methods.create_document(news_data)
+    if vars.minhash_enabled:
+        near_duplicates.add(news_id, news_data["minhash"])
     return JSONResponse(status_code=200, content={"id": news_id})
 
 
@@ -120,6 +142,64 @@ def get_all_news():
     return JSONResponse(status_code=200, content={"news_id": news})
 
 
+@app.get("/database/getRecent/", responses={
+    200: {
+        "description": "most recent news retrieved successfully",
+        "content": {
+            "application/json": {
+                "example": [{
+                    "url": "https://example.com/database2",
+                    "title": "Sample News Title",
+                    "content": "This is the content of the sample news article."
+                }, {
+                    "url": "https://example.com/database1",
+                    "title": "Sample News Title",
+                    "content": "This is the content of the sample news article."
+                },
+                ]
+            }
+        }
+    }
+})
+def get_recent_news(limit: int = Query(50, ge=1, le=500, description="Number of news to retrieve")):
+    news = news_methods.read_recent_documents(limit)
+    return JSONResponse(status_code=200, content=news)
+
+
+@app.get("/database/getIncomplete/", responses={
+    200: {
+        "description": "News with at least one analysis result missing, oldest first",
+        "content": {
+            "application/json": {
+                "example": [{
+                    "url": "https://example.com/database1",
+                    "title": "Sample News Title",
+                    "content": "This is the content of the sample news article.",
+                    "sentiment_result": {"positive": 0.5},
+                    "emotion_result": None
+                }]
+            }
+        }
+    },
+    400: {
+        "detail": "Unknown result field"
+    },
+    500: {
+        "detail": "Failed to read news"
+    }
+})
+def get_incomplete_news(limit: int = Query(100, ge=1, le=500, description="Number of news to retrieve"),
+                        created_before: Optional[str] = Query(None, description="Only news created before this ISO timestamp"),
+                        fields: Optional[str] = Query(None, description="Comma-separated result fields to check, default all")):
+    columns = fields.split(",") if fields else None
+    if columns and any(column not in news_methods.RESULT_COLUMNS for column in columns):
+        raise HTTPException(status_code=400, detail="Unknown result field")
+    news = news_methods.read_incomplete_documents(limit, created_before, columns)
+    if news is None:
+        raise HTTPException(status_code=500, detail="Failed to read news")
+    return JSONResponse(status_code=200, content=news)
+
+
 @app.post("/database/getByURL/", responses={
     200: {
         "description": "News retrieved successfully",
@@ -144,6 +224,72 @@ def get_news_by_filter(data: NewsItem):
     return JSONResponse(status_code=200, content=news)
 
 
+@app.post("/database/getByURLs/", responses={
+    200: {
+        "description": "News found for the given URLs; URLs not in the database are left out",
+        "content": {
+            "application/json": {
+                "example": [{
+                    "url": "https://example.com/database1",
+                    "title": "Sample News Title",
+                    "content": "This is the content of the sample news article."
+                }]
+            }
+        }
+    },
+    500: {
+        "detail": "Failed to read news"
+    }
+})
+def get_news_by_urls(data: URLList):
+    news = news_methods.read_documents_by_urls(list(dict.fromkeys(data.urls)))
+    if news is None:
+        raise HTTPException(status_code=500, detail="Failed to read news")
+    return JSONResponse(status_code=200, content=news)
+
+
+@app.get("/database/getByContentHash/{content_hash}", responses={
+    200: {
+        "description": "The most complete news with this body fingerprint",
+        "content": {
+            "application/json": {
+                "example": {
+                    "url": "https://example.com/database1",
+                    "title": "Sample News Title",
+                    "content": "This is the content of the sample news article.",
+                    "content_hash": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+                }
+            }
+        }
+    },
+    404: {
+        "detail": "News not found"
+    }
+})
+def get_news_by_content_hash(content_hash: str):
+    news = news_methods.read_document_by_content_hash(content_hash)
+    if not news:
+        raise HTTPException(status_code=404, detail="News not found")
+    return JSONResponse(status_code=200, content=news)
+
+
+@app.post("/database/nearDuplicates/", responses={
+    200: {
+        "description": "Indexed news whose body has an estimated Jaccard similarity of at least `threshold`, most similar first",
+        "content": {
+            "application/json": {
+                "example": [{"id": "1234567890abcdef", "similarity": 0.92}]
+            }
+        }
+    }
+})
+def get_near_duplicates(data: NearDuplicateQuery):
+    matches = near_duplicates.find(data.content, threshold=data.threshold, limit=data.limit, exclude=data.exclude_id)
+    return JSONResponse(status_code=200, content=[
+        {"id": news_id, "similarity": similarity} for news_id, similarity in matches
+    ])
+
+
 @app.get("/database/getByID/{news_id}", responses={
     200: {
         "description": "News retrieved successfully",
@@ -176,6 +322,46 @@ async def stream_news(news_id: str):
     return StreamingResponse(news_methods.stream_document_by_id(news_id), media_type="text/event-stream")
 
 
+@app.put("/database/results/", responses={
+    200: {
+        "description": "News results updated successfully",
+        "content": {
+            "application/json": {
+                "example": {
+                    "message": "News results updated successfully",
+                    "updated_fields": ["sentiment_result", "emotion_result"]
+                }
+            }
+        }
+    },
+    400: {
+        "detail": "No fields to update"
+    },
+    404: {
+        "detail": "News not found"
+    },
+    500: {
+        "detail": "Failed to update news"
+    }
+})
+def update_news_results_by_url(data: NewsItem):
+    # only the fields present in the request are written
+    update_data = data.dict(exclude_unset=True)
+    update_data.pop("url", None)
+    if not data.url or not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    updated = news_methods.update_fields_by_url(data.url, update_data)
+    if updated is None:
+        raise HTTPException(status_code=500, detail="Failed to update news")
+    if not updated:
+        raise HTTPException(status_code=404, detail="News not found")
+    return JSONResponse(status_code=200, content={
+        "message": "News results updated successfully",
+        "updated_fields": list(update_data)
+    })
+
+
 @app.put("/database/summarise/", responses={
     200: {
         "description": "Summary result updated successfully",
@@ -0,0 +1,108 @@
+from array import array
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import random
+import re
+import threading
+import unicodedata
+import zlib
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """Word `size`-grams of the case-folded text, ignoring punctuation."""
+    words = _NON_WORD.sub(" ", unicodedata.normalize("NFKC", text or "").casefold()).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _bands_for(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) splitting the signature so that pairs at about `threshold`
+    Jaccard similarity have a 50% chance of sharing a bucket.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class MinHashLSH:
+    """
+    MinHash signatures of article bodies with a banded LSH index over them.
+
+    A query only compares the signatures of articles sharing at least one
+    band bucket with it, so its cost does not grow with the corpus size; the
+    similarity reported is the MinHash estimate of the Jaccard similarity of
+    the two articles' word 5-gram sets.
+    """
+
+    def __init__(self, num_perm: int = 64, threshold: float = 0.8, seed: int = 1):
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.bands, self.rows = _bands_for(threshold, num_perm)
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._signatures: Dict[Hashable, array] = {}
+        self._buckets: List[Dict[int, List[Hashable]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+
+    def signature(self, text: str) -> array:
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)]
+        if not hashes:
+            return array("I", [_MAX_HASH] * self.num_perm)
+        return array("I", (min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH for a, b in self._perms))
+
+    def _band_keys(self, signature: array):
+        for band in range(self.bands):
+            yield band, hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def insert(self, key: Hashable, signature: array):
+        signature = array("I", signature)
+        if len(signature) != self.num_perm:
+            raise ValueError(f"Expected a signature of {self.num_perm} values, got {len(signature)}")
+        with self._lock:
+            if key in self._signatures:
+                self._remove(key)
+            self._signatures[key] = signature
+            for band, bucket_key in self._band_keys(signature):
+                self._buckets[band].setdefault(bucket_key, []).append(key)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            if key in self._signatures:
+                self._remove(key)
+
+    def _remove(self, key: Hashable):
+        signature = self._signatures.pop(key)
+        for band, bucket_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(bucket_key, [])
+            if key in bucket:
+                bucket.remove(key)
+            if not bucket:
+                self._buckets[band].pop(bucket_key, None)
+
+    def query(self, signature: array, threshold: Optional[float] = None,
+              limit: int = 10, exclude: Optional[Hashable] = None) -> List[Tuple[Hashable, float]]:
+        """Keys with an estimated Jaccard similarity of at least `threshold`, most similar first."""
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for band, bucket_key in self._band_keys(signature):
+                candidates.update(self._buckets[band].get(bucket_key, ()))
+            candidates.discard(exclude)
+            scored = []
+            for key in candidates:
+                other = self._signatures[key]
+                similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+                if similarity >= threshold:
+                    scored.append((key, similarity))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._signatures)
@@ -0,0 +1,69 @@
+from typing import List, Optional
+
+import logging
+import threading
+
+import news_driver as news_methods
+import vars as vars
+from minhash_index import MinHashLSH
+
+logger = logging.getLogger(__name__)
+
+# In-memory index of this worker process. Articles saved by this process are
+# added straight away; those saved by the other workers on the next `sync`.
+index = MinHashLSH(num_perm=vars.minhash_num_perm, threshold=vars.minhash_threshold)
+
+_sync_lock = threading.Lock()
+_last_created_at: Optional[str] = None
+_last_id: Optional[str] = None
+
+
+def signature_for(content: str) -> List[int]:
+    return list(index.signature(content or ""))
+
+
+def add(news_id: str, signature: List[int]):
+    if news_id and signature:
+        index.insert(news_id, signature)
+
+
+def find(content: str, threshold: Optional[float] = None, limit: int = 5, exclude: Optional[str] = None):
+    """Indexed articles whose body is at least `threshold` similar to `content`."""
+    return index.query(index.signature(content or ""), threshold=threshold, limit=limit, exclude=exclude)
+
+
+def sync(page_size: int = 1000) -> int:
+    """
+    Loads the signatures of articles created since the last sync. Articles
+    saved before signatures existed get one computed and stored.
+    """
+    global _last_created_at, _last_id
+    loaded = 0
+    with _sync_lock:
+        while True:
+            page = news_methods.read_minhash_page(_last_created_at, _last_id, page_size)
+            if not page:
+                break
+            for row in page:
+                signature = row.get("minhash")
+                if not signature or len(signature) != index.num_perm:
+                    signature = signature_for(row.get("content"))
+                    news_methods.update_minhash_by_id(row["id"], signature)
+                add(str(row["id"]), signature)
+                loaded += 1
+            _last_created_at, _last_id = page[-1]["created_at"], str(page[-1]["id"])
+            if len(page) < page_size:
+                break
+    return loaded
+
+
+def maintain(stop: threading.Event):
+    """Builds the index, then keeps loading new articles until `stop` is set."""
+    while not stop.is_set():
+        try:
+            loaded = sync()
+            if loaded:
+                logger.info(f"Near-duplicate index: loaded {loaded} articles, {len(index)} indexed")
+        except Exception as e:
+            logger.error(f"Failed to sync the near-duplicate index: {e}")
+        stop.wait(vars.minhash_refresh_interval)
@@ -13,6 +13,11 @@ sample_news_data = {
 # Get Supabase client
 supabase = get_supabase_client()
 
+# Columns returned by document reads; the content_hash and minhash
+# bookkeeping columns are left out, nothing downstream uses them
+DOCUMENT_COLUMNS = ("id, url, title, content, sentiment_result, emotion_result, propaganda_result, "
+                    "factcheck_result, summarise_result, data_summary, created_at, updated_at")
+
 # Create
 def create_document(data):
     """Create a new news document in Supabase."""
@@ -51,17 +56,37 @@ def check_url_exists(url):
 def read_all_documents():
     """Read all news documents."""
     try:
-        result = supabase.table("news_data").select("*").execute()
+        result = supabase.table("news_data").select(DOCUMENT_COLUMNS).execute()
         return result.data
     except Exception as e:
         print(f"Error reading all documents: {e}")
         return []
 
 
+def read_minhash_page(created_after=None, after_id=None, limit=1000):
+    """
+    Read id, content and MinHash signature of documents after the
+    (created_at, id) position of the previous page, oldest first.
+    """
+    try:
+        query = supabase.table("news_data").select("id, content, minhash, created_at")
+        if created_after and after_id:
+            # Rows sharing the last timestamp are told apart by id, so none are skipped
+            query = query.or_(f'created_at.gt."{created_after}",'
+                              f'and(created_at.eq."{created_after}",id.gt.{after_id})')
+        elif created_after:
+            query = query.gt("created_at", created_after)
+        result = query.order("created_at").order("id").limit(limit).execute()
+        return result.data
+    except Exception as e:
+        print(f"Error reading MinHash signatures: {e}")
+        return None
+
+
 def read_documents(filter_data):
     """Read news documents with filters."""
     try:
-        query = supabase.table("news_data").select("*")
+        query = supabase.table("news_data").select(DOCUMENT_COLUMNS)
 
         # Apply filters dynamically
         for key, value in filter_data.items():
@@ -74,10 +99,67 @@ def read_documents(filter_data):
         return None
 
 
+def read_recent_documents(limit):
+    """Read the most recently created news documents, newest first."""
+    try:
+        result = supabase.table("news_data").select(
+            DOCUMENT_COLUMNS).order("created_at", desc=True).limit(limit).execute()
+        return result.data
+    except Exception as e:
+        print(f"Error reading recent documents: {e}")
+        return []
+
+
+def read_documents_by_urls(urls, chunk_size=100):
+    """Read the news documents for a list of URLs. URLs not in the database are left out."""
+    documents = []
+    try:
+        # Chunked to keep each request's filter within URL length limits
+        for start in range(0, len(urls), chunk_size):
+            result = supabase.table("news_data").select(
+                DOCUMENT_COLUMNS).in_("url", urls[start:start + chunk_size]).execute()
+            documents.extend(result.data)
+        return documents
+    except Exception as e:
+        print(f"Error reading documents by URLs: {e}")
+        return None
+
+
+RESULT_COLUMNS = ("sentiment_result", "emotion_result", "propaganda_result",
+                  "factcheck_result", "summarise_result", "data_summary")
+
+
+def read_incomplete_documents(limit, created_before=None, columns=None):
+    """Read news documents with at least one of `columns` (default: every analysis result) missing, oldest first."""
+    try:
+        query = supabase.table("news_data").select(DOCUMENT_COLUMNS).or_(
+            ",".join(f"{column}.is.null" for column in columns or RESULT_COLUMNS))
+        if created_before:
+            query = query.lt("created_at", created_before)
+        result = query.order("created_at").limit(limit).execute()
+        return result.data
+    except Exception as e:
+        print(f"Error reading incomplete documents: {e}")
+        return None
+
+
+def read_document_by_content_hash(content_hash):
+    """Read the most complete news document with the given body fingerprint."""
+    try:
+        result = supabase.table("news_data").select(DOCUMENT_COLUMNS).eq(
+            "content_hash", content_hash).order("created_at").limit(10).execute()
+        if not result.data:
+            return None
+        return max(result.data, key=lambda doc: sum(doc.get(column) is not None for column in RESULT_COLUMNS))
+    except Exception as e:
+        print(f"Error reading document by content hash: {e}")
+        return None
+
+
 def read_document_by_id(id):
     """Read a news document by ID."""
     try:
-        result = supabase.table("news_data").select("*").eq("id", id).execute()
+        result = supabase.table("news_data").select(DOCUMENT_COLUMNS).eq("id", id).execute()
         if result.data:
             return result.data[0]
         return None
@@ -115,7 +197,7 @@ def read_document_by_url(url):
     """Read a news document by URL."""
     try:
         result = supabase.table("news_data").select(
-            "*").eq("url", url).execute()
+            DOCUMENT_COLUMNS).eq("url", url).execute()
         if result.data:
             return result.data[0]
         return None
@@ -140,6 +222,26 @@ def update_documents(filter_data, update_data):
         return 0
 
 
+def update_minhash_by_id(id, signature):
+    """Store the MinHash signature of a document that was saved without one."""
+    try:
+        supabase.table("news_data").update({"minhash": signature}).eq("id", id).execute()
+    except Exception as e:
+        print(f"Error updating MinHash signature: {e}")
+
+
+def update_fields_by_url(url, update_data):
+    """Update several fields of a document by URL in a single write.
+    Returns the number of rows updated, or None if the write failed."""
+    try:
+        result = supabase.table("news_data").update(
+            update_data).eq("url", url).execute()
+        return len(result.data) if result.data else 0
+    except Exception as e:
+        print(f"Error updating fields by URL: {e}")
+        return None
+
+
 def update_sentiment_result(id, sentiment_result):
     """Update the sentiment result of a document."""
     try:
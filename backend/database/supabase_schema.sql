@@ -32,8 +32,16 @@ CREATE TABLE IF NOT EXISTS quiz_data (
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Fingerprint of the normalised article body, shared by syndicated copies
+ALTER TABLE news_data ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- MinHash signature of the article body, loaded into the near-duplicate index
+ALTER TABLE news_data ADD COLUMN IF NOT EXISTS minhash JSONB;
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_news_url ON news_data(url);
+CREATE INDEX IF NOT EXISTS idx_news_content_hash ON news_data(content_hash);
+CREATE INDEX IF NOT EXISTS idx_news_created_at ON news_data(created_at);
 CREATE INDEX IF NOT EXISTS idx_quiz_question_type ON quiz_data(question_type);
 
 -- Create updated_at trigger function
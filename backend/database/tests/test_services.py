@@ -2,6 +2,8 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 from db_app import app
+import minhash_index
+import near_duplicates
 from api_models import NewsItem
 import json
 
@@ -155,3 +157,136 @@ def test_stream_news(mock_db_methods):
         'data: {"url": "test_url2", "title": "test_title2"}',
         '',
         ]
+
+def test_get_recent_news():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.read_recent_documents.return_value = [{"url": "url2"}, {"url": "url1"}]
+        response = client.get("/database/getRecent/?limit=2")
+    assert response.status_code == 200
+    assert response.json() == [{"url": "url2"}, {"url": "url1"}]
+    mock_news_methods.read_recent_documents.assert_called_once_with(2)
+
+def test_get_news_by_urls():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.read_documents_by_urls.return_value = [{"url": "url1"}]
+        response = client.post("/database/getByURLs/", json={"urls": ["url1", "url2", "url1"]})
+    assert response.status_code == 200
+    assert response.json() == [{"url": "url1"}]
+    mock_news_methods.read_documents_by_urls.assert_called_once_with(["url1", "url2"])
+
+def test_get_incomplete_news():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.read_incomplete_documents.return_value = [{"url": "url1", "emotion_result": None}]
+        response = client.get("/database/getIncomplete/?limit=5&created_before=2024-01-01T00:00:00%2B00:00")
+    assert response.status_code == 200
+    assert response.json() == [{"url": "url1", "emotion_result": None}]
+    mock_news_methods.read_incomplete_documents.assert_called_once_with(5, "2024-01-01T00:00:00+00:00", None)
+
+def test_get_incomplete_news_for_some_fields():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.RESULT_COLUMNS = ("sentiment_result", "factcheck_result")
+        mock_news_methods.read_incomplete_documents.return_value = []
+        response = client.get("/database/getIncomplete/?limit=5&fields=sentiment_result")
+        assert response.status_code == 200
+        mock_news_methods.read_incomplete_documents.assert_called_once_with(5, None, ["sentiment_result"])
+        assert client.get("/database/getIncomplete/?fields=content").status_code == 400
+
+def test_create_news_with_copied_results():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.check_url_exists.return_value = False
+        mock_news_methods.create_document.return_value = "new_id"
+        response = client.post("/database/", json={
+            "url": "test_url", "title": "test_title", "content": "test_content",
+            "content_hash": "abc", "sentiment_result": {"positive": 0.5},
+        })
+    assert response.status_code == 200
+    saved = mock_news_methods.create_document.call_args.args[0]
+    assert saved.pop("minhash") == near_duplicates.signature_for("test_content")
+    assert saved == {
+        "url": "test_url", "title": "test_title", "content": "test_content",
+        "content_hash": "abc", "sentiment_result": {"positive": 0.5},
+    }
+
+def test_get_news_by_content_hash():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.read_document_by_content_hash.return_value = {"url": "url1", "content_hash": "abc"}
+        response = client.get("/database/getByContentHash/abc")
+        assert response.status_code == 200
+        assert response.json() == {"url": "url1", "content_hash": "abc"}
+
+        mock_news_methods.read_document_by_content_hash.return_value = None
+        assert client.get("/database/getByContentHash/missing").status_code == 404
+
+def test_minhash_lsh_finds_near_duplicates():
+    index = minhash_index.MinHashLSH(num_perm=64, threshold=0.8)
+    story = " ".join(f"word{i}" for i in range(300))
+    index.insert("original", index.signature(story))
+    index.insert("other", index.signature(" ".join(f"other{i}" for i in range(300))))
+
+    corrected = story + " Correction: an earlier version misspelt a name."
+    matches = index.query(index.signature(corrected))
+    assert [key for key, _ in matches] == ["original"]
+    assert matches[0][1] >= 0.8
+    assert index.query(index.signature(corrected), exclude="original") == []
+
+    index.remove("original")
+    assert index.query(index.signature(story)) == []
+    assert len(index) == 1
+
+def test_near_duplicates_route():
+    with patch.object(near_duplicates, "index", minhash_index.MinHashLSH()):
+        story = " ".join(f"word{i}" for i in range(300))
+        near_duplicates.add("id1", near_duplicates.signature_for(story))
+        response = client.post("/database/nearDuplicates/", json={"content": story + " By a staff reporter."})
+        assert response.status_code == 200
+        assert [match["id"] for match in response.json()] == ["id1"]
+
+        response = client.post("/database/nearDuplicates/", json={"content": story, "exclude_id": "id1"})
+        assert response.json() == []
+
+def test_near_duplicates_sync_pages_past_shared_timestamps():
+    index = minhash_index.MinHashLSH(num_perm=64)
+    signature = [0] * 64
+    pages = [
+        [{"id": "a", "minhash": signature, "created_at": "t1"}, {"id": "b", "minhash": signature, "created_at": "t2"}],
+        [{"id": "c", "minhash": signature, "created_at": "t2"}],
+    ]
+    with patch.object(near_duplicates, "index", index), \
+            patch.object(near_duplicates, "_last_created_at", None), \
+            patch.object(near_duplicates, "_last_id", None), \
+            patch("near_duplicates.news_methods") as mock_news_methods:
+        mock_news_methods.read_minhash_page.side_effect = pages
+        assert near_duplicates.sync(page_size=2) == 3
+    # The second page starts after row "b", not after every row created at t2
+    assert mock_news_methods.read_minhash_page.call_args_list[1].args == ("t2", "b", 2)
+
+def test_update_news_results_by_url():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.update_fields_by_url.return_value = 1
+        response = client.put("/database/results/", json={
+            "url": "test_url",
+            "sentiment_result": {"positive": 0.5},
+            "factcheck_result": [{"statement": "test", "correctness": "true", "explanation": "test", "citations": []}]
+        })
+    assert response.status_code == 200
+    assert response.json()["updated_fields"] == ["sentiment_result", "factcheck_result"]
+    mock_news_methods.update_fields_by_url.assert_called_once_with("test_url", {
+        "sentiment_result": {"positive": 0.5},
+        "factcheck_result": [{"statement": "test", "correctness": "true", "explanation": "test", "citations": []}]
+    })
+
+def test_update_news_results_by_url_not_found():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.update_fields_by_url.return_value = 0
+        response = client.put("/database/results/", json={"url": "test_url", "sentiment_result": {"positive": 0.5}})
+    assert response.status_code == 404
+
+def test_update_news_results_by_url_failed_write():
+    with patch("db_app.news_methods") as mock_news_methods:
+        mock_news_methods.update_fields_by_url.return_value = None
+        response = client.put("/database/results/", json={"url": "test_url", "sentiment_result": {"positive": 0.5}})
+    assert response.status_code == 500
+
+def test_update_news_results_by_url_without_fields():
+    response = client.put("/database/results/", json={"url": "test_url"})
+    assert response.status_code == 400
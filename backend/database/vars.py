@@ -7,3 +7,9 @@ load_dotenv()
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 supabase_service_key = os.getenv("SUPABASE_SERVICE_KEY")
+
+# Near-duplicate index (MinHash/LSH) over article bodies
+minhash_enabled = (os.getenv("MINHASH_INDEX") or "1") == "1"
+minhash_num_perm = int(os.getenv("MINHASH_NUM_PERM") or 64) # signature length; more is more accurate and slower
+minhash_threshold = float(os.getenv("MINHASH_THRESHOLD") or 0.8) # Jaccard similarity the LSH bands are tuned for
+minhash_refresh_interval = int(os.getenv("MINHASH_REFRESH_INTERVAL") or 30) # seconds between loading articles saved by other workers
@@ -1,8 +1,15 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 
+import os
+import torch
+
 from methods import predict, aggregate_emotions_weighted, aggregate_emotions_majority_vote, hybrid_aggregation
 from api_models import TextInput, EmotionResponse
+from inference.batcher import MicroBatcher, QueueFull
 from model import emotion_model
 
 app = FastAPI(
@@ -12,8 +19,15 @@ app = FastAPI(
 )
 
 
+# intra-op threads of each forward pass; keep uvicorn workers x INFERENCE_WORKERS x TORCH_THREADS <= cores
+if os.getenv("TORCH_THREADS"):
+    torch.set_num_threads(int(os.getenv("TORCH_THREADS")))
+
 model = emotion_model()
 
+# chunks of concurrent requests share forward passes
+batcher = MicroBatcher.from_env(lambda chunks: predict(chunks, model))
+
 @app.get("/")
 def health_check():
     # return 200
@@ -24,20 +38,34 @@ def health_check2():
     # return 200
     return {"status": "ok"}
 
+@app.get("/emotion/ready")
+def readiness():
+    # 503 while the inference queue is full, so the load balancer sends requests elsewhere
+    stats = batcher.stats()
+    if not batcher.ready():
+        return JSONResponse(status_code=503, content={"status": "busy", **stats})
+    return {"status": "ready", **stats}
+
 @app.post("/emotion/analyze_emotion", 
           response_model= EmotionResponse, 
           summary= "Analyze Emotion", 
-          description="Analyze the emotion of the provided text."
+          description="Analyze the emotion of the provided text.",
+          responses={503: {"description": "Inference queue full, retry later"}}
           )
 async def analyze_emotion(input: TextInput):
     
-    text_chunks = model.chunk_text(input.text)
+    # tokenizing and inference run off the event loop, so health checks stay responsive
+    text_chunks = await run_in_threadpool(model.chunk_text, input.text)
     # print("text_chunks", text_chunks)
 
     weights = [len(chunk) for chunk in text_chunks]
     # print("weights", weights)
 
-    emotion_results = predict(text_chunks, model.tokenizer, model.classifier)
+    try:
+        emotion_results = await batcher.infer(text_chunks)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many texts waiting for inference, try again later",
+                            headers={"Retry-After": "1"})
     # print("emotion_results", emotion_results)
 
     weighted_avg, majority_vote = hybrid_aggregation(emotion_results, weights)
@@ -50,4 +78,7 @@ async def analyze_emotion(input: TextInput):
         }
     }
 
-
+@app.get("/metrics")
+def prometheus_metrics():
+    # batch sizes, padding and queueing time of the micro-batcher
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
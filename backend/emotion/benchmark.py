@@ -0,0 +1,18 @@
+"""
+Compares the inference backends of the emotion model, see
+inference/benchmark.py.
+
+    python export_onnx.py --quantize   # once, for the ONNX backends
+    python benchmark.py [--articles 8] [--repeat 5]
+"""
+from inference import benchmark
+from methods import predict
+from model import emotion_model
+
+
+if __name__ == "__main__":
+    benchmark.main(
+        "emotion", emotion_model,
+        prepare=lambda model, text: model.chunk_text(text),
+        run=lambda model, chunks: predict(chunks, model),
+    )
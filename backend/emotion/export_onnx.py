@@ -0,0 +1,23 @@
+"""
+Exports the emotion model to ONNX for INFERENCE_BACKEND=onnx, see
+inference/export_onnx.py.
+
+    python export_onnx.py [--quantize] [--output-dir onnx]
+"""
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from inference import export_onnx, onnx_backend
+from model import MODEL_NAME
+
+
+def export_model(output_dir=onnx_backend.ONNX_DIR, quantize=False):
+    return export_onnx.export_model(
+        AutoModelForSequenceClassification.from_pretrained(MODEL_NAME),
+        AutoTokenizer.from_pretrained(MODEL_NAME),
+        {"logits": {0: "batch"}},
+        output_dir, quantize,
+    )
+
+
+if __name__ == "__main__":
+    export_onnx.main("emotion", export_model)
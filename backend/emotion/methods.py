@@ -1,17 +1,15 @@
 from collections import Counter, defaultdict
 
-def predict(token_chunks, tokenizer, classifier):
-    results = []
-    for chunk in token_chunks:
-        # Detokenize the chunk back into text
-        chunk_text = tokenizer.decode(chunk, skip_special_tokens=True)
-        
-        # Perform emotion classification on the chunk
-        model_output = classifier(chunk_text)
-        
-        # Store the results in sequence
-        results.append(model_output)
-    return results
+def predict(token_chunks, model):
+    # Score every chunk in one padded forward pass, straight from the token ids
+    scores = model.predict_batch(token_chunks)
+
+    # Store the results in sequence, shaped like the pipeline output: emotions of a chunk by descending score
+    return [
+        [sorted(({'label': label, 'score': float(score)} for label, score in zip(model.labels, row)),
+                key=lambda emotion: emotion['score'], reverse=True)]
+        for row in scores
+    ]
 
 def aggregate_emotions_weighted(emotion_results, chunk_lengths):
     # Calculate proportional weights based on chunk lengths
@@ -1,26 +1,50 @@
-
-from transformers import pipeline, AutoTokenizer
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
 import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from inference import onnx_backend
+
+MODEL_NAME = "SamLowe/roberta-base-go_emotions"
 
 class emotion_model:
-    def __init__(self):
-        self.model_name = "SamLowe/roberta-base-go_emotions"
-        self.classifier = pipeline(
-            task="text-classification", 
-            model=self.model_name, tokenizer=self.model_name, 
-            top_k=None
-            )
+    def __init__(self, backend=None, onnx_path=None):
+        self.model_name = MODEL_NAME
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.config = AutoConfig.from_pretrained(self.model_name)
+        self.labels = [self.config.id2label[i] for i in range(self.config.num_labels)]
+        # "torch" or "onnx" (INFERENCE_BACKEND); the ONNX file comes from export_onnx.py
+        self.backend = backend or onnx_backend.BACKEND
+        if self.backend == "onnx":
+            self.model = onnx_backend.OnnxModel(onnx_path)
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            self.model.eval()
     
-    def chunk_text(self, text, max_length=500):
-        ### returns a list of tokenized chunks of the text
+    def chunk_text(self, text, max_length=510):
+        ### returns a list of tokenized chunks of the text, without special tokens (added per chunk)
 
-        tokens = self.tokenizer(text, return_tensors="pt", truncation=False)
+        tokens = self.tokenizer(text, return_tensors="pt", truncation=False, add_special_tokens=False)
         token_chunks = [tokens['input_ids'][0][i:i+max_length] for i in range(0, len(tokens['input_ids'][0]), max_length)]
         return token_chunks
-    
-    def predict_emotion(self, text):
-        text_chunks = self.chunk_text(text)
-        emotion_results = self.predict(text_chunks)
-        return emotion_results
-    
+
+    def pad_chunks(self, token_chunks):
+        ### adds <s> and </s> to every chunk and pads them to the longest one, the attention mask hides the padding
+        input_ids = [torch.tensor(self.tokenizer.build_inputs_with_special_tokens(chunk.tolist())) for chunk in token_chunks]
+        attention_mask = [torch.ones(len(ids), dtype=torch.long) for ids in input_ids]
+        return {
+            'input_ids': pad_sequence(input_ids, batch_first=True, padding_value=self.tokenizer.pad_token_id),
+            'attention_mask': pad_sequence(attention_mask, batch_first=True, padding_value=0)
+        }
+
+    def predict_batch(self, token_chunks):
+        ### returns the score of every emotion (columns, see self.labels) for every chunk (rows), in one forward pass
+        batch = self.pad_chunks(token_chunks)
+        with torch.no_grad():
+            if self.backend == "onnx":
+                logits = torch.from_numpy(self.model(**batch)['logits'])
+            else:
+                logits = self.model(**batch).logits
+        if self.config.problem_type == "multi_label_classification":
+            # an independent probability per emotion
+            return torch.sigmoid(logits).numpy()
+        return torch.softmax(logits, dim=-1).numpy()
@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from export_onnx import export_model
+from methods import predict
+from model import emotion_model
+
+TEXTS = [
+    "The new rail line opened ahead of schedule and commuters were delighted.",
+    "Thousands were left without power after the storm, and officials blamed each other.",
+    "The committee will meet on Thursday to review the budget.",
+    "I cannot believe they did this to us again. " * 150,  # several chunks of different lengths in one batch
+]
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    onnx_dir = str(tmp_path_factory.mktemp("onnx"))
+    fp32_path, int8_path = export_model(onnx_dir, quantize=True)
+    return {
+        "torch": emotion_model(backend="torch"),
+        "onnx": emotion_model(backend="onnx", onnx_path=fp32_path),
+        "int8": emotion_model(backend="onnx", onnx_path=int8_path),
+    }
+
+
+def scores(model):
+    ### {label: score} of every chunk of every text
+    results = []
+    for text in TEXTS:
+        for chunk in predict(model.chunk_text(text), model):
+            results.append({emotion['label']: emotion['score'] for emotion in chunk[0]})
+    return results
+
+
+def test_onnx_matches_torch(models):
+    for expected, actual in zip(scores(models["torch"]), scores(models["onnx"])):
+        assert actual.keys() == expected.keys()
+        for label in expected:
+            assert actual[label] == pytest.approx(expected[label], abs=1e-4)
+
+
+def test_int8_stays_close_to_torch(models):
+    for expected, actual in zip(scores(models["torch"]), scores(models["int8"])):
+        assert max(abs(actual[label] - expected[label]) for label in expected) < 0.1
+        assert max(actual, key=actual.get) == max(expected, key=expected.get)
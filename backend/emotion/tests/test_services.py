@@ -2,6 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 from app import app
+from methods import predict
 
 client = TestClient(app)
 
@@ -16,24 +17,38 @@ def test_health_check2():
     assert response.json() == {"status": "ok"}
 
 @patch('app.model.chunk_text')
-@patch('app.model.tokenizer')
-@patch('app.model.classifier')
 @patch('app.predict')
 @patch('app.hybrid_aggregation')
-def test_analyze_emotion(mock_hybrid_aggregation, mock_predict, mock_classifier, mock_tokenizer, mock_chunk_text):
-    # Mock the behavior of the model and tokenizer
-    mock_chunk_text.return_value = ["chunk1", "chunk2"]
-    mock_tokenizer.decode.side_effect = lambda x, skip_special_tokens: x
-    mock_classifier.side_effect = lambda x: [{"label": "happy", "score": 0.9}]
-    mock_predict.return_value = [[{"label": "happy", "score": 0.9}], [{"label": "sad", "score": 0.1}]]
+def test_analyze_emotion(mock_hybrid_aggregation, mock_predict, mock_chunk_text):
+    # Mock the behavior of the model
+    mock_chunk_text.return_value = ["longer chunk1", "chunk2"]
+    # The batcher reorders chunks by length, so the result follows the chunk, not the position
+    outputs = {"longer chunk1": [{"label": "happy", "score": 0.9}], "chunk2": [{"label": "sad", "score": 0.1}]}
+    mock_predict.side_effect = lambda chunks, model: [outputs[chunk] for chunk in chunks]
     mock_hybrid_aggregation.return_value = ({"happy": 0.9, "sad": 0.1}, [["happy", 1]])
 
     response = client.post("/emotion/analyze_emotion", json={"text": "I am happy today!"})
     
     assert response.status_code == 200
+    emotion_results, weights = mock_hybrid_aggregation.call_args[0]
+    assert emotion_results == [outputs["longer chunk1"], outputs["chunk2"]]
+    assert weights == [13, 6]
     assert response.json() == {
         "emotion_result": {
             "weighted_avg": {"happy": 0.9, "sad": 0.1},
             "majority_vote": [["happy", 1]]
         }
-    }
\ No newline at end of file
+    }
+def test_predict_uses_model_scores():
+    # One forward pass for all chunks, each chunk's emotions by descending score
+    model = MagicMock()
+    model.labels = ["joy", "anger"]
+    model.predict_batch.return_value = [[0.2, 0.7], [0.9, 0.1]]
+
+    results = predict(["chunk1", "chunk2"], model)
+
+    model.predict_batch.assert_called_once_with(["chunk1", "chunk2"])
+    assert results == [
+        [[{"label": "anger", "score": 0.7}, {"label": "joy", "score": 0.2}]],
+        [[{"label": "joy", "score": 0.9}, {"label": "anger", "score": 0.1}]],
+    ]
@@ -0,0 +1,5 @@
+"""
+Inference helpers shared by the model services (sentiment, emotion,
+propaganda). Each service image copies this package next to its own code,
+see the service dockerfiles.
+"""
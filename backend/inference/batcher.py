@@ -0,0 +1,220 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+batch_size = Histogram(
+    "model_batch_size", "Chunks per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+batch_requests = Histogram(
+    "model_batch_requests", "Requests sharing one forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+batch_tokens = Histogram(
+    "model_batch_padded_tokens", "Tokens per forward pass, padding included",
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768))
+batch_padding = Histogram(
+    "model_batch_padding_ratio", "Share of a forward pass spent on padding",
+    buckets=(0, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1))
+queue_time = Histogram(
+    "model_batch_queue_seconds", "Time a chunk waited for its forward pass",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+batch_failures = Counter(
+    "model_batch_failures_total", "Forward passes that raised")
+rejected_chunks = Counter(
+    "model_batch_rejected_chunks_total", "Chunks refused because the inference queue was full")
+
+
+class QueueFull(Exception):
+    """Raised by `submit` when accepting the chunks would exceed `max_queue`."""
+
+
+class _Item:
+    __slots__ = ("payload", "length", "future", "request", "enqueued")
+
+    def __init__(self, payload, length: int, request: object):
+        self.payload = payload
+        self.length = length
+        self.future = Future()
+        self.request = request
+        self.enqueued = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Runs the chunks of concurrent requests through the model together.
+
+    Chunks are queued and collected for at most `max_wait` seconds after the
+    first one arrives, or until `max_tokens` tokens are waiting. Collected
+    chunks are sorted by length and cut into forward passes of at most
+    `max_batch_size` chunks whose padded size stays within `max_tokens`, so
+    short chunks are not padded to the length of long ones.
+
+    `run_batch(chunks)` is called on one of `workers` inference threads with
+    the chunks of one pass and returns one result per chunk, in order; each
+    result goes back to the request that submitted the chunk. While every
+    worker is busy, new chunks keep queueing and make the next pass larger.
+    At most `max_queue` chunks wait; beyond that `submit` raises `QueueFull`.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], Sequence[Any]], length: Callable[[Any], int] = len,
+                 max_wait: float = 0.005, max_tokens: int = 4096, max_batch_size: int = 32,
+                 workers: int = 1, max_queue: int = 256):
+        self.run_batch = run_batch
+        self.length = length
+        self.max_wait = max_wait
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: "queue.Queue[_Item]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._free_workers = threading.Semaphore(workers)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+
+    @classmethod
+    def from_env(cls, run_batch: Callable[[List[Any]], Sequence[Any]], length: Callable[[Any], int] = len):
+        """
+        Settings from BATCH_MAX_WAIT_MS, BATCH_MAX_TOKENS, BATCH_MAX_SIZE,
+        INFERENCE_WORKERS and INFERENCE_QUEUE_SIZE.
+        """
+        return cls(
+            run_batch, length,
+            max_wait=float(os.getenv("BATCH_MAX_WAIT_MS") or 5) / 1000,
+            max_tokens=int(os.getenv("BATCH_MAX_TOKENS") or 4096),
+            max_batch_size=int(os.getenv("BATCH_MAX_SIZE") or 32),
+            workers=int(os.getenv("INFERENCE_WORKERS") or 1),
+            max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE") or 256),
+        )
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    # ------------------------ PUBLIC API ----------------------- #
+    def submit(self, chunks: Sequence[Any]) -> List[Future]:
+        """Queues `chunks`; returns one future per chunk. Raises `QueueFull`."""
+        self.start()
+        request = object()
+        items = [_Item(chunk, self.length(chunk), request) for chunk in chunks]
+        with self._lock:
+            # A request larger than the whole queue still gets in when nothing is waiting
+            if self._waiting and self._waiting + len(items) > self.max_queue:
+                rejected_chunks.inc(len(items))
+                raise QueueFull(f"{self._waiting} chunks already waiting for inference")
+            self._waiting += len(items)
+        for item in items:
+            self._queue.put(item)
+        return [item.future for item in items]
+
+    def run(self, chunks: Sequence[Any]) -> List[Any]:
+        """The results of `chunks`, in order, blocking until they are done."""
+        return [future.result() for future in self.submit(chunks)]
+
+    async def infer(self, chunks: Sequence[Any]) -> List[Any]:
+        """Like `run`, without blocking the event loop."""
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in self.submit(chunks))))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "waiting": self._waiting,
+                "running": self._running,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+            }
+
+    def ready(self) -> bool:
+        """False while the queue is full, i.e. new requests would get a 503."""
+        with self._lock:
+            return self._waiting < self.max_queue
+
+    # ------------------------ WORKER ----------------------- #
+    def _collect(self) -> List[_Item]:
+        items = [self._queue.get()]
+        tokens = items[0].length
+        deadline = time.monotonic() + self.max_wait
+        while tokens < self.max_tokens:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the deadline, still take whatever is already waiting
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            tokens += item.length
+        with self._lock:
+            self._waiting -= len(items)
+        return items
+
+    def _batches(self, items: List[_Item]):
+        batch = []
+        for item in sorted(items, key=lambda item: item.length):
+            # Sorted, so `item` is the longest chunk of the batch it joins
+            if batch and (len(batch) >= self.max_batch_size or item.length * (len(batch) + 1) > self.max_tokens):
+                yield batch
+                batch = []
+            batch.append(item)
+        if batch:
+            yield batch
+
+    def _run(self, batch: List[_Item]):
+        # Requests that went away (e.g. the client disconnected) cancel their futures
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        now = time.monotonic()
+        padded = max(item.length for item in batch) * len(batch)
+        batch_size.observe(len(batch))
+        batch_requests.observe(len({id(item.request) for item in batch}))
+        batch_tokens.observe(padded)
+        batch_padding.observe(1 - sum(item.length for item in batch) / padded if padded else 0)
+        for item in batch:
+            queue_time.observe(now - item.enqueued)
+
+        try:
+            results = list(self.run_batch([item.payload for item in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            logger.error(f"Forward pass of {len(batch)} chunks failed: {e}")
+            batch_failures.inc()
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+    def _run_on_worker(self, batch: List[_Item]):
+        try:
+            self._run(batch)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._free_workers.release()
+
+    def _loop(self):
+        while True:
+            # Only collect once a worker is free, so chunks arriving meanwhile join the next pass
+            self._free_workers.acquire()
+            self._free_workers.release()
+            for batch in self._batches(self._collect()):
+                self._free_workers.acquire()
+                with self._lock:
+                    self._running += 1
+                self._executor.submit(self._run_on_worker, batch)
@@ -0,0 +1,63 @@
+"""
+Compares the inference backends of a model service on the same articles.
+Each service's benchmark.py passes in how to load, prepare and run its model:
+
+    python export_onnx.py --quantize   # once, for the ONNX backends
+    python benchmark.py [--articles 8] [--repeat 5]
+
+Prints the mean time per article and the speedup over PyTorch of each
+backend whose model is available.
+"""
+from typing import Any, Callable, List
+
+import argparse
+import os
+import time
+
+from inference import onnx_backend
+
+PARAGRAPH = (
+    "The transport ministry said on Tuesday that the new rail line would open ahead of schedule, "
+    "although commuters and opposition lawmakers questioned whether the stations were ready. "
+    "Officials insisted the safety checks had been completed and that fares would not rise this year. "
+)
+
+
+def time_per_article(run: Callable[[Any], Any], articles: List[Any], repeat: int) -> float:
+    run(articles[0])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for article in articles:
+            run(article)
+    return (time.perf_counter() - start) / (repeat * len(articles))
+
+
+def main(name: str, load: Callable[..., Any], prepare: Callable[[Any, str], Any], run: Callable[[Any, Any], Any]):
+    """
+    Command line of a service's benchmark script. `load(**options)` builds the
+    model for a backend, `prepare(model, text)` turns an article into model
+    input (untimed) and `run(model, article)` is the timed inference.
+    """
+    parser = argparse.ArgumentParser(description=f"Benchmark the {name} inference backends")
+    parser.add_argument("--articles", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--paragraphs", type=int, default=25, help="paragraphs per article, ~50 tokens each")
+    parser.add_argument("--onnx-dir", default=onnx_backend.ONNX_DIR)
+    args = parser.parse_args()
+
+    texts = [PARAGRAPH * (args.paragraphs + i) for i in range(args.articles)]
+    backends = [("torch fp32", dict(backend="torch"))]
+    for label, quantized in (("onnx fp32", False), ("onnx int8", True)):
+        path = onnx_backend.model_path(quantized=quantized, onnx_dir=args.onnx_dir)
+        if os.path.exists(path):
+            backends.append((label, dict(backend="onnx", onnx_path=path)))
+        else:
+            print(f"Skipping {label}: {path} not found, run export_onnx.py{' --quantize' if quantized else ''}")
+
+    baseline = None
+    for label, options in backends:
+        model = load(**options)
+        articles = [prepare(model, text) for text in texts]
+        seconds = time_per_article(lambda article: run(model, article), articles, args.repeat)
+        baseline = baseline or seconds
+        print(f"{label:<12} {seconds * 1000:8.1f} ms/article  {baseline / seconds:5.2f}x")
@@ -0,0 +1,48 @@
+"""
+Exports a model service's model to ONNX for INFERENCE_BACKEND=onnx. Each
+service's export_onnx.py passes in its model, tokenizer and outputs:
+
+    python export_onnx.py [--quantize] [--output-dir onnx]
+
+Writes model.onnx, and with --quantize also model.int8.onnx (dynamic int8
+quantisation; select it with ONNX_QUANTIZED=1).
+"""
+from typing import Callable, Dict, List
+
+import argparse
+import os
+
+from inference import onnx_backend
+
+
+def export_model(module, tokenizer, outputs: Dict[str, Dict[int, str]], output_dir: str = onnx_backend.ONNX_DIR,
+                 quantize: bool = False) -> List[str]:
+    """
+    Traces `module` on a padded example batch from `tokenizer`. `outputs`
+    maps the output attributes to keep to their dynamic axes, e.g.
+    `{"logits": {0: "batch"}}`. Returns the paths written.
+    """
+    example = tokenizer(["An example sentence to trace the model with.", "A shorter one."],
+                        padding=True, return_tensors="pt")
+
+    path = onnx_backend.export(
+        module,
+        {"input_ids": example["input_ids"], "attention_mask": example["attention_mask"]},
+        outputs,
+        onnx_backend.model_path(quantized=False, onnx_dir=output_dir),
+    )
+    paths = [path]
+    if quantize:
+        paths.append(onnx_backend.quantize(path, onnx_backend.model_path(quantized=True, onnx_dir=output_dir)))
+    return paths
+
+
+def main(name: str, export: Callable[[str, bool], List[str]]):
+    """Command line of a service's export script; `export(output_dir, quantize)` writes the files."""
+    parser = argparse.ArgumentParser(description=f"Export the {name} model to ONNX")
+    parser.add_argument("--output-dir", default=onnx_backend.ONNX_DIR)
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamically quantised int8 model")
+    args = parser.parse_args()
+
+    for path in export(args.output_dir, args.quantize):
+        print(f"Wrote {path} ({os.path.getsize(path) / 2**20:.0f} MiB)")
@@ -0,0 +1,79 @@
+from typing import Dict
+
+import os
+
+import numpy as np
+
+# "torch" (default) or "onnx"; see export_onnx.py for creating the ONNX files
+BACKEND = (os.getenv("INFERENCE_BACKEND") or "torch").lower()
+QUANTIZED = os.getenv("ONNX_QUANTIZED") == "1"
+ONNX_DIR = os.getenv("ONNX_DIR") or "onnx"
+
+
+def model_path(quantized: bool = QUANTIZED, onnx_dir: str = ONNX_DIR) -> str:
+    return os.path.join(onnx_dir, "model.int8.onnx" if quantized else "model.onnx")
+
+
+def export(module, inputs: Dict[str, "torch.Tensor"], outputs: Dict[str, Dict[int, str]], path: str,
+           opset: int = 14) -> str:
+    """
+    Exports `module` to ONNX at `path`. `inputs` are example tensors, by
+    argument name, with batch and sequence as dimensions 0 and 1; `outputs`
+    maps the names of the output attributes to keep to their dynamic axes.
+    """
+    import torch
+
+    class Outputs(torch.nn.Module):
+        # Keyword arguments in, a tuple of the wanted outputs out, as the exporter expects
+        def __init__(self):
+            super().__init__()
+            self.module = module
+
+        def forward(self, *args):
+            result = self.module(**dict(zip(inputs, args)))
+            return tuple(getattr(result, name) for name in outputs)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            Outputs(), tuple(inputs.values()), path,
+            input_names=list(inputs),
+            output_names=list(outputs),
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in inputs}, **outputs},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    return path
+
+
+def quantize(path: str, quantized_path: str) -> str:
+    """Dynamic int8 quantisation of the weights of the model at `path`."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+class OnnxModel:
+    """
+    An exported model on ONNX Runtime's CPU provider. Called with the same
+    keyword arguments as the PyTorch model (tensors or arrays); returns the
+    outputs as NumPy arrays, by name.
+    """
+
+    def __init__(self, path: str = None, threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # Same thread budget as the PyTorch backend; 0 lets ONNX Runtime decide
+        options.intra_op_num_threads = threads if threads is not None else int(os.getenv("TORCH_THREADS") or 0)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = path or model_path()
+        self.session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def __call__(self, **inputs) -> Dict[str, np.ndarray]:
+        feed = {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names}
+        return dict(zip(self.output_names, self.session.run(None, feed)))
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from inference.batcher import MicroBatcher, QueueFull
+
+
+def test_micro_batcher_shares_forward_passes():
+    passes = []
+
+    def run_batch(chunks):
+        passes.append(list(chunks))
+        time.sleep(0.01)
+        return [chunk.upper() for chunk in chunks]
+
+    batcher = MicroBatcher(run_batch, max_wait=0.05, max_tokens=12, max_batch_size=8)
+    results = {}
+    requests = {"first": ["aa", "bbbbbb"], "second": ["c"], "third": ["dd"]}
+    threads = [threading.Thread(target=lambda name=name: results.update({name: batcher.run(requests[name])}))
+               for name in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    # results go back to the request that sent each chunk, in order
+    assert results == {"first": ["AA", "BBBBBB"], "second": ["C"], "third": ["DD"]}
+    # short chunks share a pass; the long one would pad it past the token budget
+    assert passes == [["c", "aa", "dd"], ["bbbbbb"]]
+
+
+def test_micro_batcher_returns_rows_to_their_chunks():
+    # Each result is computed from its chunk, so a mix-up between requests or positions shows
+    batcher = MicroBatcher(lambda chunks: [len(chunk) for chunk in chunks], max_wait=0.05, max_tokens=64)
+    requests = {"first": ["xxxxx", "x", "xxx"], "second": ["xx", "xxxxxxx"], "third": ["xxxx"]}
+    results = {}
+    threads = [threading.Thread(target=lambda name=name: results.update({name: batcher.run(requests[name])}))
+               for name in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {"first": [5, 1, 3], "second": [2, 7], "third": [4]}
+
+
+def test_micro_batcher_rejects_chunks_beyond_the_queue():
+    release = threading.Event()
+
+    def run_batch(chunks):
+        release.wait(5)
+        return chunks
+
+    batcher = MicroBatcher(run_batch, max_wait=0, max_batch_size=1, max_queue=2)
+    running = batcher.submit(["a"])
+    while batcher.stats()["running"] == 0:
+        time.sleep(0.01)
+    waiting = batcher.submit(["b", "c"])
+
+    assert not batcher.ready()
+    with pytest.raises(QueueFull):
+        batcher.submit(["d"])
+    release.set()
+    assert [future.result(5) for future in running + waiting] == ["a", "b", "c"]
+    assert batcher.ready()
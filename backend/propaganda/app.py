@@ -1,10 +1,15 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import os
 import torch
 import torch.nn.functional as F
 from transformers import BertTokenizerFast
 
 from api_models  import TextInput, PropagandaResponse
-from model import BertForTokenAndSequenceJointClassification
+from inference.batcher import MicroBatcher, QueueFull
+from model import chunk_ids, pad_chunks, propaganda_model
 
 app = FastAPI(
     title="Propaganda Analysis API",
@@ -12,11 +17,33 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# intra-op threads of each forward pass; keep uvicorn workers x INFERENCE_WORKERS x TORCH_THREADS <= cores
+if os.getenv("TORCH_THREADS"):
+    torch.set_num_threads(int(os.getenv("TORCH_THREADS")))
+
 tokenizer = BertTokenizerFast.from_pretrained('bert-base-cased')
-model = BertForTokenAndSequenceJointClassification.from_pretrained(
-    "QCRI/PropagandaTechniquesAnalysis-en-BERT",
-    revision="v0.1.0"
-)
+model = propaganda_model()
+
+def chunk_text(text):
+    return chunk_ids(tokenizer, text)
+
+def classify_chunks(chunks):
+    """
+    One padded forward pass over `chunks` (token ids with CLS/SEP). Returns,
+    per chunk, its sequence probabilities and the tag index of each token
+    between CLS and SEP.
+    """
+    with torch.inference_mode():
+        outputs = model(**pad_chunks(chunks, tokenizer.pad_token_id))
+    sequence_probs = F.softmax(outputs.sequence_logits, dim=-1)
+    token_class_index = torch.argmax(outputs.token_logits, dim=-1)
+    return [
+        (sequence_probs[i].tolist(), token_class_index[i].tolist()[1:len(chunk) - 1])
+        for i, chunk in enumerate(chunks)
+    ]
+
+# chunks of concurrent requests share forward passes
+batcher = MicroBatcher.from_env(classify_chunks)
 
 @app.get("/")
 async def health_check():
@@ -28,86 +55,83 @@ def health_check2():
     # return 200
     return {"status": "ok"}
 
+@app.get("/propaganda/ready")
+def readiness():
+    # 503 while the inference queue is full, so the load balancer sends requests elsewhere
+    stats = batcher.stats()
+    if not batcher.ready():
+        return JSONResponse(status_code=503, content={"status": "busy", **stats})
+    return {"status": "ready", **stats}
+
 @app.post("/propaganda/analyze_propaganda", 
           summary= "Analyze Propaganda", 
           description="Analyze the propaganda techniques in the provided text.",
-          response_model= PropagandaResponse
+          response_model= PropagandaResponse,
+          responses={503: {"description": "Inference queue full, retry later"}}
           )
 async def analyze_text(input: TextInput):
-    with torch.inference_mode():
-        # Tokenize text and get token IDs
-        tokenized_text = tokenizer.encode_plus(input.text, return_tensors="pt", truncation=False)
-        input_ids = tokenized_text.input_ids[0]  # Get token IDs (without truncation)
-        
-        max_chunk_size = 510  # BERT max token limit (512) - CLS/SEP tokens
-        chunks = [input_ids[i : i + max_chunk_size] for i in range(0, len(input_ids), max_chunk_size)]
-        
-        results = []
-        overall_probs = []
-        formatted_results = []
-        
-        for chunk in chunks:
-            # Add [CLS] and [SEP] tokens
-            chunk = torch.cat([torch.tensor([tokenizer.cls_token_id]), chunk, torch.tensor([tokenizer.sep_token_id])])
-            chunk = chunk.unsqueeze(0)  # Add batch dimension
-            
-            # Pass chunk to model
-            outputs = model(input_ids=chunk)
-            
-            # Get sequence-level classification
-            sequence_class_index = torch.argmax(outputs.sequence_logits, dim=-1)
-            sequence_class = model.sequence_tags[sequence_class_index[0]]
-            
-            # Get token-level classification
-            token_class_index = torch.argmax(outputs.token_logits, dim=-1)
-            tokens = tokenizer.convert_ids_to_tokens(chunk[0][1:-1])  # Skip CLS/SEP
-            tags = [model.token_tags[i] for i in token_class_index[0].tolist()[1:-1]]
-
-
-            # Store sequence probabilities
-            sequence_probs = F.softmax(outputs.sequence_logits, dim=-1)
-            overall_probs.append(sequence_probs[0].tolist())
-
-            # Format output
-            formatted_tokens = []
-            current_token_combination = []
-            current_tag = None
-            tolerance = 4
-            non_o_count = 0
-
-            for token, tag in zip(tokens, tags):
-
-                if tag != "O":
-                    if current_tag is None:
-                        current_tag = tag
-                        current_token_combination.append(token)
-                        non_o_count = 0
-                    
-                    elif (current_tag == tag) & (non_o_count < tolerance):
+    # tokenizing and inference run off the event loop, so health checks stay responsive
+    chunks = await run_in_threadpool(chunk_text, input.text)
+
+    # Pass the chunks to the model, in padded batches shared with concurrent requests
+    try:
+        chunk_results = await batcher.infer(chunks)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many texts waiting for inference, try again later",
+                            headers={"Retry-After": "1"})
+
+    results = []
+    overall_probs = []
+    formatted_results = []
+    
+    for chunk, (sequence_probs, token_class_index) in zip(chunks, chunk_results):
+        # Get token-level classification
+        tokens = tokenizer.convert_ids_to_tokens(chunk[1:-1])  # Skip CLS/SEP
+        tags = [model.token_tags[i] for i in token_class_index]
+
+        # Store sequence probabilities
+        overall_probs.append(sequence_probs)
+
+        # Format output
+        formatted_tokens = []
+        current_token_combination = []
+        current_tag = None
+        tolerance = 4
+        non_o_count = 0
+
+        for token, tag in zip(tokens, tags):
+
+            if tag != "O":
+                if current_tag is None:
+                    current_tag = tag
+                    current_token_combination.append(token)
+                    non_o_count = 0
+                
+                elif (current_tag == tag) & (non_o_count < tolerance):
+                    if token.startswith("##") & len(current_token_combination) > 0:
+                            current_token_combination[-1] += token[2:]
+                    else: current_token_combination.append(token.replace("##", ""))  
+
+            else:
+
+                if current_tag is not None:
+                    if non_o_count > tolerance:
+                        formatted_results.append([current_tag , " ".join(current_token_combination)])
+                        current_token_combination = []
+                        current_tag = None
+                    else:
+                        non_o_count += 1
                         if token.startswith("##") & len(current_token_combination) > 0:
-                                current_token_combination[-1] += token[2:]
+                            current_token_combination[-1] += token[2:]
                         else: current_token_combination.append(token.replace("##", ""))  
 
-                else:
-
-                    if current_tag is not None:
-                        if non_o_count > tolerance:
-                            formatted_results.append([current_tag , " ".join(current_token_combination)])
-                            current_token_combination = []
-                            current_tag = None
-                        else:
-                            non_o_count += 1
-                            if token.startswith("##") & len(current_token_combination) > 0:
-                                current_token_combination[-1] += token[2:]
-                            else: current_token_combination.append(token.replace("##", ""))  
+        results.append(" ".join(formatted_tokens))
 
-            results.append(" ".join(formatted_tokens))
+    # Average probabilities across chunks
+    non_propaganda_prob = sum(p[0] for p in overall_probs) / len(overall_probs)
+    propaganda_prob = sum(p[1] for p in overall_probs) / len(overall_probs)
 
-        # Average probabilities across chunks
-        non_propaganda_prob = sum(p[0] for p in overall_probs) / len(overall_probs)
-        propaganda_prob = sum(p[1] for p in overall_probs) / len(overall_probs)
-
-        # print(formatted_results)
+    # print(formatted_results)
     return { 
         "propaganda_result": {
             "non_propaganda_probability": non_propaganda_prob,
@@ -117,6 +141,12 @@ async def analyze_text(input: TextInput):
     }
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    # batch sizes, padding and queueing time of the micro-batcher
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
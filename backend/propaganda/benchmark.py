@@ -0,0 +1,32 @@
+"""
+Compares the inference backends of the propaganda model, see
+inference/benchmark.py.
+
+    python export_onnx.py --quantize   # once, for the ONNX backends
+    python benchmark.py [--articles 8] [--repeat 5]
+"""
+from transformers import BertTokenizerFast
+
+import torch
+
+from inference import benchmark
+from model import chunk_ids, pad_chunks, propaganda_model
+
+
+def article_batch(tokenizer, text):
+    ### all chunks of the article, padded into one batch with the service's own helpers
+    return pad_chunks(chunk_ids(tokenizer, text), tokenizer.pad_token_id)
+
+
+def forward(model, batch):
+    with torch.inference_mode():
+        return model(input_ids=batch["input_ids"], attention_mask=batch["attention_mask"])
+
+
+if __name__ == "__main__":
+    tokenizer = BertTokenizerFast.from_pretrained('bert-base-cased')
+    benchmark.main(
+        "propaganda", propaganda_model,
+        prepare=lambda model, text: article_batch(tokenizer, text),
+        run=forward,
+    )
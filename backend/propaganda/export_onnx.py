@@ -0,0 +1,23 @@
+"""
+Exports the propaganda model to ONNX for INFERENCE_BACKEND=onnx, see
+inference/export_onnx.py.
+
+    python export_onnx.py [--quantize] [--output-dir onnx]
+"""
+from transformers import BertTokenizerFast
+
+from inference import export_onnx, onnx_backend
+from model import BertForTokenAndSequenceJointClassification, MODEL_NAME, MODEL_REVISION
+
+
+def export_model(output_dir=onnx_backend.ONNX_DIR, quantize=False):
+    return export_onnx.export_model(
+        BertForTokenAndSequenceJointClassification.from_pretrained(MODEL_NAME, revision=MODEL_REVISION),
+        BertTokenizerFast.from_pretrained('bert-base-cased'),
+        {"token_logits": {0: "batch", 1: "sequence"}, "sequence_logits": {0: "batch"}},
+        output_dir, quantize,
+    )
+
+
+if __name__ == "__main__":
+    export_onnx.main("propaganda", export_model)
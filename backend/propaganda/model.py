@@ -3,9 +3,12 @@ from typing import Optional, Tuple
 import torch
 from torch import nn
 from torch.nn.functional import sigmoid
+from torch.nn.utils.rnn import pad_sequence
 from transformers import BertPreTrainedModel, BertModel
 from transformers.file_utils import ModelOutput
 
+from inference import onnx_backend
+
 
 TOKEN_TAGS = (
     "<PAD>", "O", 
@@ -19,6 +22,9 @@ TOKEN_TAGS = (
 
 SEQUENCE_TAGS = ("Non-prop", "Prop")
 
+MODEL_NAME = "QCRI/PropagandaTechniquesAnalysis-en-BERT"
+MODEL_REVISION = "v0.1.0"
+
 
 @dataclass
 class TokenAndSequenceJointClassifierOutput(ModelOutput):
@@ -120,3 +126,48 @@ class BertForTokenAndSequenceJointClassification(BertPreTrainedModel):
             hidden_states=outputs.hidden_states,
             attentions=outputs.attentions,
         )
+
+
+class propaganda_model:
+    """
+    The joint classifier on the PyTorch or ONNX Runtime backend
+    (INFERENCE_BACKEND, the ONNX file comes from export_onnx.py). Called like
+    the PyTorch model; only `token_logits` and `sequence_logits` are set on
+    the output.
+    """
+
+    def __init__(self, backend=None, onnx_path=None):
+        self.backend = backend or onnx_backend.BACKEND
+        self.token_tags = TOKEN_TAGS
+        self.sequence_tags = SEQUENCE_TAGS
+        if self.backend == "onnx":
+            self.model = onnx_backend.OnnxModel(onnx_path)
+        else:
+            self.model = BertForTokenAndSequenceJointClassification.from_pretrained(MODEL_NAME, revision=MODEL_REVISION)
+            self.model.eval()
+
+    def __call__(self, input_ids, attention_mask):
+        if self.backend == "onnx":
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+            return TokenAndSequenceJointClassifierOutput(
+                token_logits=torch.from_numpy(outputs["token_logits"]),
+                sequence_logits=torch.from_numpy(outputs["sequence_logits"]),
+            )
+        return self.model(input_ids=input_ids, attention_mask=attention_mask)
+
+
+def chunk_ids(tokenizer, text, max_chunk_size=510):
+    ### token ids of `text` in chunks of at most 512 tokens, each with one [CLS] and one [SEP]
+    input_ids = tokenizer.encode(text, add_special_tokens=False, truncation=False)
+    return [
+        torch.tensor([tokenizer.cls_token_id] + input_ids[i : i + max_chunk_size] + [tokenizer.sep_token_id])
+        for i in range(0, len(input_ids), max_chunk_size)
+    ]
+
+
+def pad_chunks(chunks, pad_token_id):
+    ### one padded batch of chunks, with the attention mask hiding the padding
+    input_ids = pad_sequence(chunks, batch_first=True, padding_value=pad_token_id)
+    attention_mask = pad_sequence([torch.ones(len(chunk), dtype=torch.long) for chunk in chunks],
+                                  batch_first=True, padding_value=0)
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
@@ -0,0 +1,60 @@
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+
+from transformers import BertTokenizerFast
+
+from benchmark import article_batch
+from export_onnx import export_model
+from model import propaganda_model
+
+TEXTS = [
+    "The corrupt elites will stop at nothing to destroy our great nation.",
+    "The committee will meet on Thursday to review the budget.",
+    "Only a fool would believe the lies they keep repeating, again and again. " * 60,  # several chunks
+]
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    return BertTokenizerFast.from_pretrained('bert-base-cased')
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    onnx_dir = str(tmp_path_factory.mktemp("onnx"))
+    fp32_path, int8_path = export_model(onnx_dir, quantize=True)
+    return {
+        "torch": propaganda_model(backend="torch"),
+        "onnx": propaganda_model(backend="onnx", onnx_path=fp32_path),
+        "int8": propaganda_model(backend="onnx", onnx_path=int8_path),
+    }
+
+
+def outputs(model, tokenizer):
+    ### (sequence probabilities, token tags, attention mask) of every text
+    results = []
+    with torch.inference_mode():
+        for text in TEXTS:
+            batch = article_batch(tokenizer, text)
+            output = model(input_ids=batch["input_ids"], attention_mask=batch["attention_mask"])
+            results.append((torch.softmax(output.sequence_logits, dim=-1),
+                            output.token_logits.argmax(dim=-1),
+                            batch["attention_mask"].bool()))
+    return results
+
+
+def test_onnx_matches_torch(models, tokenizer):
+    for (expected_probs, expected_tags, mask), (probs, tags, _) in zip(outputs(models["torch"], tokenizer),
+                                                                       outputs(models["onnx"], tokenizer)):
+        torch.testing.assert_close(probs, expected_probs, atol=1e-4, rtol=0)
+        assert torch.equal(tags[mask], expected_tags[mask])
+
+
+def test_int8_stays_close_to_torch(models, tokenizer):
+    for (expected_probs, expected_tags, mask), (probs, tags, _) in zip(outputs(models["torch"], tokenizer),
+                                                                       outputs(models["int8"], tokenizer)):
+        assert (probs - expected_probs).abs().max() < 0.1
+        # token tags may flip where two techniques score alike, but not often
+        assert (tags[mask] == expected_tags[mask]).float().mean() > 0.95
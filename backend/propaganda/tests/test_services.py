@@ -3,6 +3,7 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch
 import torch
 from app import app
+from model import TOKEN_TAGS
 
 
 @pytest.fixture
@@ -21,18 +22,30 @@ async def test_health_check2(client):
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+def test_chunk_text_adds_special_tokens_once():
+    import app as app_module
+    tokenizer = app_module.tokenizer
+    chunks = app_module.chunk_text("word " * 600)
+    assert len(chunks) == 2
+    for chunk in chunks:
+        assert len(chunk) <= 512
+        assert chunk[0] == tokenizer.cls_token_id and chunk[-1] == tokenizer.sep_token_id
+        assert (chunk == tokenizer.cls_token_id).sum() == 1 and (chunk == tokenizer.sep_token_id).sum() == 1
+
 @pytest.mark.asyncio
 async def test_analyze_propaganda(mocker, client):
     # Mock input text
     input_text = {"text": "This is an example propaganda statement."}
 
-    # Mock model output
-    mock_sequence_logits = torch.tensor([[0.2, 0.8]])  # Fake probabilities
-    mock_token_logits = torch.rand((1, 10, 2))  # Fake token logits (random values)
+    # Mock model output, one row per chunk of the batch it is given
+    def forward(input_ids, attention_mask):
+        output = mocker.Mock()
+        output.sequence_logits = torch.tensor([[0.2, 0.8]] * len(input_ids))  # Fake probabilities
+        output.token_logits = torch.rand((len(input_ids), input_ids.shape[1], 2))  # Fake token logits (random values)
+        return output
 
     mock_model = mocker.patch("app.model")
-    mock_model.return_value.sequence_logits = mock_sequence_logits
-    mock_model.return_value.token_logits = mock_token_logits
+    mock_model.side_effect = forward
 
     response = client.post("/propaganda/analyze_propaganda", json=input_text)
 
@@ -49,3 +62,37 @@ async def test_analyze_propaganda(mocker, client):
     assert isinstance(data["propaganda_result"]["propaganda_probability"], float)
     assert 0.0 <= data["propaganda_result"]["non_propaganda_probability"] <= 1.0
     assert 0.0 <= data["propaganda_result"]["propaganda_probability"] <= 1.0
+
+@pytest.mark.asyncio
+async def test_analyze_propaganda_keeps_chunk_results_in_order(mocker, client):
+    import app as app_module
+    tokenizer = app_module.tokenizer
+    loaded, calm = tokenizer.convert_tokens_to_ids(["war", "calm"])
+    cls, sep = tokenizer.cls_token_id, tokenizer.sep_token_id
+    # The long chunk comes first; the batcher runs the short one first
+    chunks = [torch.tensor([cls, loaded] + [calm] * 6 + [sep]), torch.tensor([cls, calm, sep])]
+    mocker.patch("app.chunk_text", return_value=chunks)
+
+    # Results keyed on the chunk: only the long one is propaganda, tagged on its first token
+    def forward(input_ids, attention_mask):
+        output = mocker.Mock()
+        is_loaded = input_ids[:, 1] == loaded
+        output.sequence_logits = torch.stack([torch.tensor([0.0, 10.0]) if row else torch.tensor([10.0, 0.0])
+                                              for row in is_loaded])
+        token_logits = torch.zeros((len(input_ids), input_ids.shape[1], len(TOKEN_TAGS)))
+        token_logits[:, :, 1] = 1  # "O"
+        token_logits[is_loaded, 1, 2] = 2  # "Name_Calling,Labeling"
+        output.token_logits = token_logits
+        return output
+
+    mock_model = mocker.patch("app.model")
+    mock_model.side_effect = forward
+    mock_model.token_tags = TOKEN_TAGS
+
+    response = client.post("/propaganda/analyze_propaganda", json={"text": "Two chunks."})
+
+    assert response.status_code == 200
+    result = response.json()["propaganda_result"]
+    assert result["propaganda_probability"] == pytest.approx(0.5, abs=1e-3)
+    # the tagged token, then the untagged ones within the tolerance of 4 (+1)
+    assert result["formatted_result"] == [["Name_Calling,Labeling", "war calm calm calm calm calm"]]
@@ -1,7 +1,14 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+import os
+import torch
 
 from api_models import TextInput, SentimentResponse
-from model import sentiment_model
+from inference.batcher import MicroBatcher, QueueFull
+from model import sentiment_model, weighted_average
 
 
 app = FastAPI(
@@ -10,7 +17,18 @@ app = FastAPI(
     version="1.0.0"
 )
 
-model = sentiment_model()
+# intra-op threads of each forward pass; keep uvicorn workers x INFERENCE_WORKERS x TORCH_THREADS <= cores
+if os.getenv("TORCH_THREADS"):
+    torch.set_num_threads(int(os.getenv("TORCH_THREADS")))
+
+# chunks of concurrent requests share forward passes
+batcher = MicroBatcher.from_env(
+    lambda chunks: model.predict_batch(chunks),
+    length=lambda chunk: len(chunk['input_ids'][0])
+)
+
+### one BATCH_MAX_SIZE caps both the batcher and the chunks of a long text sent to the model at once
+model = sentiment_model(max_batch_size=batcher.max_batch_size)
 
 
 @app.get("/")
@@ -25,53 +43,49 @@ def health_check2():
     return {"status": "ok"}
 
 
+@app.get("/sentiment/ready")
+def readiness():
+    # 503 while the inference queue is full, so the load balancer sends requests elsewhere
+    stats = batcher.stats()
+    if not batcher.ready():
+        return JSONResponse(status_code=503, content={"status": "busy", **stats})
+    return {"status": "ready", **stats}
+
 @app.post(
     "/sentiment/analyze_sentiment", 
     response_model= SentimentResponse, 
     summary= "Analyze Sentiment", 
-    description="Analyze the sentiment of the provided text."
+    description="Analyze the sentiment of the provided text.",
+    responses={503: {"description": "Inference queue full, retry later"}}
     )
 async def analyze_sentiment(input: TextInput):
-    text_chunks = model.chunk_text(input.text)
-    
-    results = []
-    weights = []
-    total_weight = 0
-
-    for chunk in text_chunks:
-        sentiment_result = model.predict_sentiment(chunk)
+    # tokenizing and inference run off the event loop, so health checks stay responsive
+    text_chunks = await run_in_threadpool(model.chunk_text, input.text)
 
-        results.append(sentiment_result)
-        
-        chunk_weight = len(chunk['input_ids'][0])
-        weights.append(chunk_weight)
-        total_weight += chunk_weight
-
-
-    # print("results", results)
-    # print("weights", weights)
-    # print("total_weight", total_weight)
-    
-    # sentiment_results = sum(weight/total_weight * output for weight, output in zip(weights, results))
-    # sentiment_results = sentiment_results.tolist()
-
-    sentiment_results = [0, 0, 0]
-
-    # Calculate weighted sentiment scores
-    for weight, output in zip(weights, results):
-        for i in range(len(sentiment_results)):
-            sentiment_results[i] += weight / total_weight * output[i]
+    # padded forward passes shared with the chunks of concurrent requests
+    try:
+        scores = await batcher.infer(text_chunks)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many texts waiting for inference, try again later",
+                            headers={"Retry-After": "1"})
+    weights = [len(chunk['input_ids'][0]) for chunk in text_chunks]
 
+    negative, neutral, positive = weighted_average(scores, weights).tolist()
 
     sentiment_dict = {
-        "positive": sentiment_results[2],
-        "negative": sentiment_results[0],
-        "neutral": sentiment_results[1]
+        "positive": positive,
+        "negative": negative,
+        "neutral": neutral
     }
 
     return {
         "sentiment_result": sentiment_dict
     }
 
+@app.get("/metrics")
+def prometheus_metrics():
+    # batch sizes, padding and queueing time of the micro-batcher
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
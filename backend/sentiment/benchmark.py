@@ -0,0 +1,17 @@
+"""
+Compares the inference backends of the sentiment model, see
+inference/benchmark.py.
+
+    python export_onnx.py --quantize   # once, for the ONNX backends
+    python benchmark.py [--articles 8] [--repeat 5]
+"""
+from inference import benchmark
+from model import sentiment_model
+
+
+if __name__ == "__main__":
+    benchmark.main(
+        "sentiment", sentiment_model,
+        prepare=lambda model, text: model.chunk_text(text),
+        run=lambda model, chunks: model.predict_batch(chunks),
+    )
@@ -1,15 +1,27 @@
 from transformers import AutoModelForSequenceClassification, AutoTokenizer, AutoConfig
 import numpy as np
-from scipy.special import softmax
 import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from inference import onnx_backend
+
+MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment-latest"
 
 
 class sentiment_model:
-    def __init__(self):
-        self.model_name = "cardiffnlp/twitter-roberta-base-sentiment-latest"
-        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+    def __init__(self, max_batch_size=None, backend=None, onnx_path=None):
+        self.model_name = MODEL_NAME
+        # "torch" or "onnx" (INFERENCE_BACKEND); the ONNX file comes from export_onnx.py
+        self.backend = backend or onnx_backend.BACKEND
+        if self.backend == "onnx":
+            self.model = onnx_backend.OnnxModel(onnx_path)
+        else:
+            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            self.model.eval()
         self.config = AutoConfig.from_pretrained(self.model_name)
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        # chunks per forward pass, None for all chunks of a text at once
+        self.max_batch_size = max_batch_size
     
     def chunk_text(self, text, max_length=500):
         tokens = self.tokenizer(text, return_tensors="pt", truncation=False)
@@ -38,9 +50,33 @@ class sentiment_model:
 
     #     return results
 
-    def predict_sentiment(self, chunk):
+    def pad_chunks(self, chunks):
+        ### pads the chunks to the longest one, the attention mask hides the padding
+        input_ids = pad_sequence([chunk['input_ids'][0] for chunk in chunks], batch_first=True,
+                                 padding_value=self.tokenizer.pad_token_id)
+        attention_mask = pad_sequence([chunk['attention_mask'][0] for chunk in chunks], batch_first=True,
+                                      padding_value=0)
+        return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+    def logits(self, batch):
+        if self.backend == "onnx":
+            return torch.from_numpy(self.model(**batch)['logits'])
+        return self.model(**batch).logits
+
+    def predict_batch(self, chunks):
+        ### returns the (negative, neutral, positive) probabilities of every chunk, one row each
+        batch_size = self.max_batch_size or len(chunks)
+        scores = []
         with torch.no_grad():
-            output = self.model(**chunk)
-            scores = output[0][0].detach().numpy()
-            scores = softmax(scores)
-            return scores
+            for i in range(0, len(chunks), batch_size):
+                logits = self.logits(self.pad_chunks(chunks[i:i+batch_size]))
+                scores.append(torch.softmax(logits, dim=-1))
+        return torch.cat(scores).numpy()
+
+    def predict_sentiment(self, chunk):
+        return self.predict_batch([chunk])[0]
+
+
+def weighted_average(scores, weights):
+    ### average of the per-chunk scores, weighted by chunk length
+    return np.average(np.asarray(scores, dtype=float), axis=0, weights=np.asarray(weights, dtype=float))
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from export_onnx import export_model
+from model import sentiment_model
+
+TEXTS = [
+    "The new rail line opened ahead of schedule and commuters were delighted.",
+    "Thousands were left without power after the storm, and officials blamed each other.",
+    "The committee will meet on Thursday to review the budget.",
+    "What a disaster. " * 300,  # several chunks of different lengths in one batch
+]
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    onnx_dir = str(tmp_path_factory.mktemp("onnx"))
+    fp32_path, int8_path = export_model(onnx_dir, quantize=True)
+    return {
+        "torch": sentiment_model(backend="torch"),
+        "onnx": sentiment_model(backend="onnx", onnx_path=fp32_path),
+        "int8": sentiment_model(backend="onnx", onnx_path=int8_path),
+    }
+
+
+def scores(model):
+    return [model.predict_batch(model.chunk_text(text)) for text in TEXTS]
+
+
+def test_onnx_matches_torch(models):
+    for expected, actual in zip(scores(models["torch"]), scores(models["onnx"])):
+        np.testing.assert_allclose(actual, expected, atol=1e-4)
+
+
+def test_int8_stays_close_to_torch(models):
+    for expected, actual in zip(scores(models["torch"]), scores(models["int8"])):
+        assert np.abs(actual - expected).max() < 0.1
+        assert (actual.argmax(axis=-1) == expected.argmax(axis=-1)).all()
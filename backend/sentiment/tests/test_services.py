@@ -1,7 +1,10 @@
 import pytest
+import threading
+import time
 from unittest.mock import patch
 from fastapi.testclient import TestClient
 from app import app
+from inference.batcher import QueueFull
 
 client = TestClient(app)
 
@@ -11,7 +14,7 @@ def mock_model():
         mock.chunk_text.return_value = [
             {"input_ids": [[1, 2, 3]], "attention_mask": [[1, 1, 1]]},
         ]
-        mock.predict_sentiment.side_effect = [
+        mock.predict_batch.return_value = [
             [0.2, 0.7, 0.1],  # Mocked sentiment scores for first chunk
         ]
         yield mock
@@ -26,6 +29,19 @@ def test_health_check2():
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+def test_readiness():
+    response = client.get("/sentiment/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+def test_analyze_sentiment_when_queue_full(mock_model):
+    with patch("app.batcher.submit", side_effect=QueueFull("full")):
+        response = client.post("/sentiment/analyze_sentiment", json={"text": "Busy."})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    with patch("app.batcher.ready", return_value=False):
+        assert client.get("/sentiment/ready").status_code == 503
+
 def test_analyze_sentiment(mock_model):
     payload = {"text": "This is a test sentence."}
     response = client.post("/sentiment/analyze_sentiment", json=payload)
@@ -39,7 +55,7 @@ def test_analyze_sentiment(mock_model):
 
     # Ensure the model methods were called
     mock_model.chunk_text.assert_called_once_with(payload["text"])
-    assert mock_model.predict_sentiment.call_count == 1
+    assert mock_model.predict_batch.call_count == 1
 
     # Check the values of the sentiment results
     total_weight = 3
@@ -49,4 +65,47 @@ def test_analyze_sentiment(mock_model):
 
     assert result["positive"] == pytest.approx(positive_score, rel=1e-2)
     assert result["negative"] == pytest.approx(negative_score, rel=1e-2)
-    assert result["neutral"] == pytest.approx(neutral_score, rel=1e-2)
\ No newline at end of file
+    assert result["neutral"] == pytest.approx(neutral_score, rel=1e-2)
+def test_analyze_sentiment_weights_chunks_by_length(mock_model):
+    mock_model.chunk_text.return_value = [
+        {"input_ids": [[1, 2, 3]], "attention_mask": [[1, 1, 1]]},
+        {"input_ids": [[4]], "attention_mask": [[1]]},
+    ]
+    # The batcher reorders chunks by length, so the scores follow the input ids, not the position
+    scores = {(1, 2, 3): [0.2, 0.7, 0.1], (4,): [0.6, 0.3, 0.1]}
+    mock_model.predict_batch.side_effect = lambda chunks: [scores[tuple(chunk["input_ids"][0])] for chunk in chunks]
+    response = client.post("/sentiment/analyze_sentiment", json={"text": "Two chunks."})
+
+    assert response.status_code == 200
+    result = response.json()["sentiment_result"]
+    # both chunks go through the model in one call
+    assert mock_model.predict_batch.call_count == 1
+    assert result["negative"] == pytest.approx(0.75 * 0.2 + 0.25 * 0.6)
+    assert result["neutral"] == pytest.approx(0.75 * 0.7 + 0.25 * 0.3)
+    assert result["positive"] == pytest.approx(0.1)
+
+def test_concurrent_requests_get_their_own_scores(mock_model):
+    chunks = {
+        "long": [{"input_ids": [[1, 2, 3, 4, 5]], "attention_mask": [[1] * 5]}],
+        "short": [{"input_ids": [[6]], "attention_mask": [[1]]}],
+        "mixed": [{"input_ids": [[7, 8, 9]], "attention_mask": [[1] * 3]}, {"input_ids": [[10]], "attention_mask": [[1]]}],
+    }
+    # negative, neutral, positive, keyed on the first token of the chunk
+    scores = {1: [1.0, 0.0, 0.0], 6: [0.0, 1.0, 0.0], 7: [0.0, 0.0, 1.0], 10: [1.0, 0.0, 0.0]}
+    mock_model.chunk_text.side_effect = lambda text: chunks[text]
+    mock_model.predict_batch.side_effect = lambda batch: [scores[chunk["input_ids"][0][0]] for chunk in batch]
+
+    results = {}
+    threads = [
+        threading.Thread(target=lambda text=text: results.update(
+            {text: client.post("/sentiment/analyze_sentiment", json={"text": text}).json()["sentiment_result"]}))
+        for text in chunks
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results["long"] == pytest.approx({"negative": 1.0, "neutral": 0.0, "positive": 0.0})
+    assert results["short"] == pytest.approx({"negative": 0.0, "neutral": 1.0, "positive": 0.0})
+    assert results["mixed"] == pytest.approx({"negative": 0.25, "neutral": 0.0, "positive": 0.75})
@@ -14,6 +14,9 @@ cd database
 start /B uvicorn db_app:app --reload --port 8011
 set DB_PID=%ERRORLEVEL%
 
+rem The model services import the shared inference package from backend\
+set PYTHONPATH=%CD%\..
+
 rem Start sentiment app
 cd ..\sentiment
 start /B uvicorn app:app --reload --port 8012
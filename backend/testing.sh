@@ -24,17 +24,17 @@ DB_PID=$!
 
 # Start sentiment app
 cd ../sentiment
-uvicorn app:app --reload --port 8012 &
+PYTHONPATH=.. uvicorn app:app --reload --port 8012 &
 SENTIMENT_PID=$!
 
 # Start emotion app
 cd ../emotion
-uvicorn app:app --reload --port 8013 &
+PYTHONPATH=.. uvicorn app:app --reload --port 8013 &
 EMOTION_PID=$!
 
 # Start propaganda app
 cd ../propaganda
-uvicorn app:app --reload --port 8014 &
+PYTHONPATH=.. uvicorn app:app --reload --port 8014 &
 PROPAGANDA_PID=$!
 
 # Start scraper app
@@ -1,22 +1,65 @@
-
+// The server sends the full document once (later, if the article could not
+// be loaded when the stream opened), then `patch` events holding
+// top-level JSON-patch operations for the fields that changed, and `stage`
+// events with the same operations as soon as an analysis stage completes.
+const applyPatch = (doc, operations) => {
+    const next = { ...doc };
+    for (const { op, path, value } of operations) {
+        const key = path.slice(1).replace(/~1/g, "/").replace(/~0/g, "~");
+        if (op === "remove") {
+            delete next[key];
+        } else {
+            next[key] = value;
+        }
+    }
+    return next;
+};
 
 const createSSEConnection = (API_URL, newsId, onMessage) => {
     if (!newsId) return null;
 
     const eventSource = new EventSource(`${API_URL}/application/stream_news?news_id=${newsId}`);
+    let current = null;
 
     eventSource.onmessage = (event) => {
         console.log("Update received:", event.data);
-        onMessage(JSON.parse(event.data));
+        current = JSON.parse(event.data);
+        onMessage(current);
     };
 
-    eventSource.onerror = () => {
-        console.error("SSE connection error");
+    eventSource.addEventListener("patch", (event) => {
+        console.log("Patch received:", event.data);
+        if (!current) return;
+        current = applyPatch(current, JSON.parse(event.data));
+        onMessage(current);
+    });
+
+    eventSource.addEventListener("stage", (event) => {
+        const { stage, patch } = JSON.parse(event.data);
+        console.log(`Stage ${stage} completed`);
+        if (!current) return;
+        current = applyPatch(current, patch);
+        onMessage(current);
+    });
+
+    // The server ends the stream with a `close` event; anything else is a dropped connection
+    eventSource.addEventListener("close", () => {
         eventSource.close();
+    });
+
+    eventSource.onerror = () => {
+        // On a transient error the browser reconnects by itself and sends
+        // Last-Event-ID, so the server only replays the patches we missed;
+        // `current` is kept so those patches apply to the document shown.
+        if (eventSource.readyState === EventSource.CLOSED) {
+            console.error("SSE connection closed");
+        } else {
+            console.warn("SSE connection lost, reconnecting");
+        }
     };
 
     return eventSource;
 };
 
 
-export default createSSEConnection;
\ No newline at end of file
+export default createSSEConnection;
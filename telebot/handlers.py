@@ -41,7 +41,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     url = update.message.text
 
-    data = {"url": url, "background": False}
+    # Only what the reply shows; the data summary is computed if someone opens the article on the web
+    data = {"url": url, "background": False, "analyses": ["sentiment", "emotion", "propaganda", "summary", "fact check"]}
     try:
         response = requests.post(vars.application_url + "/application/new_query", json=data)
         if response.status_code == 400 and ('detail' in response.json().keys()):